@@ -2,19 +2,26 @@
 FinTrack - Telegram Bot for Household Cash Flow Tracking
 """
 
-from .app.bot import FinTrackBot
 from .config import BOT_TOKEN, DB_DIR, CURRENCY, CURRENCY_SYMBOL
 
 __version__ = "1.0.0"
 __author__ = "Adib and DeepSeek"
 __all__ = ['FinTrackBot', 'main']
 
+def __getattr__(name):
+    # The bot (and with it telegram/SQLAlchemy) is only imported when actually used
+    if name == 'FinTrackBot':
+        from .app.bot import FinTrackBot
+        return FinTrackBot
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def main():
     """Main function to start the bot"""
     if BOT_TOKEN == "YOUR_BOT_TOKEN_HERE":
         print("❌ Please set your bot token in config.py")
         return
     
+    from .app.bot import FinTrackBot
     bot = FinTrackBot(BOT_TOKEN)
     bot.run()
 
@@ -3,9 +3,23 @@ FinTrack Application Package
 Telegram bot for household cash flow tracking
 """
 
-from .bot import FinTrackBot
-from .handlers import MessageHandler
-from .database import DatabaseManager
-from .models import Transaction, Base
+# Submodules are imported on first attribute access so that importing the
+# package (e.g. for the maintenance CLI) doesn't pull in telegram/SQLAlchemy
+_LAZY_ATTRIBUTES = {
+    'FinTrackBot': '.bot',
+    'MessageHandler': '.handlers',
+    'DatabaseManager': '.database',
+    'Transaction': '.models',
+    'Base': '.models',
+}
 
-__all__ = ['FinTrackBot', 'MessageHandler', 'DatabaseManager', 'Transaction', 'Base']
\ No newline at end of file
+__all__ = ['FinTrackBot', 'MessageHandler', 'DatabaseManager', 'Transaction', 'Base']
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,62 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from .registry import registry
+from .metrics import metrics
+from ..config import DB_WORKER_THREADS, DATA_VERSION_REFRESH_INTERVAL
+
+# Bounded pool that runs all blocking SQLite work off the event loop
+executor = ThreadPoolExecutor(max_workers=DB_WORKER_THREADS, thread_name_prefix='fintrack-db')
+
+metrics.gauge('fintrack_db_executor_queue', 'Database calls waiting for a worker thread', func=lambda: executor._work_queue.qsize())
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Run a blocking database call on the DB worker pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+class AsyncDatabaseManager:
+    """Awaitable facade over a DatabaseManager.
+
+    Every public method of the wrapped manager is exposed as a coroutine
+    function with the same signature, e.g. `await db.get_balance()`.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.chat_id = manager.chat_id
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        attr = getattr(self.manager, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await run_in_db_thread(attr, *args, **kwargs)
+
+        return method
+
+def _open_database(chat_id):
+    manager = registry.get(chat_id)
+    # The maintenance CLI writes from its own process; its changes must
+    # invalidate the caches keyed on data_version too, within the interval
+    manager.refresh_data_version(DATA_VERSION_REFRESH_INTERVAL)
+    return manager
+
+async def get_async_database(chat_id):
+    """Get the shared database for a chat wrapped in an awaitable API
+
+    Its data_version includes other processes' writes up to
+    DATA_VERSION_REFRESH_INTERVAL seconds old.
+    """
+    # Opening a chat database touches the disk too, so do it on the pool
+    manager = await run_in_db_thread(_open_database, chat_id)
+    return AsyncDatabaseManager(manager)
+
+def shutdown_executor(wait=True):
+    """Stop the DB worker pool (used on bot shutdown)"""
+    executor.shutdown(wait=wait)
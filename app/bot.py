@@ -1,7 +1,22 @@
+import asyncio
 import logging
-from telegram import Update
-from telegram.ext import Application, MessageHandler, filters, CommandHandler, ContextTypes
-from .handlers import MessageHandler as FinTrackMessageHandler
+import secrets
+import signal
+from urllib.parse import urlsplit
+from telegram.request import BaseRequest
+from telegram.ext import Application, MessageHandler, filters, CallbackQueryHandler
+from .handlers import MessageHandler as FinTrackMessageHandler, active_imports
+from .registry import registry
+from .router import CommandRequest
+from .async_database import shutdown_executor
+from .charts import renderer as chart_renderer
+from .write_queue import write_queues
+from .metrics import start_http_server as start_metrics_server
+from .updates import update_processor
+from .webhook import WebhookServer
+from ..config import (
+    METRICS_HOST, METRICS_PORT, BOT_MODE, WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET
+)
 
 # Set up logging
 logging.basicConfig(
@@ -12,30 +27,35 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class FinTrackBot:
-    def __init__(self, token: str):
+    def __init__(self, token: str, request: BaseRequest = None):
         self.token = token
-        self.application = Application.builder().token(token).build()
+        builder = Application.builder()\
+            .token(token)\
+            .concurrent_updates(update_processor)\
+            .post_shutdown(self._post_shutdown)
+        if request is not None:
+            # Custom transport for Bot API calls, e.g. the offline stand-in in benchmarks/stub.py
+            builder = builder.request(request).get_updates_request(request)
+        self.application = builder.build()
         self.message_handler = FinTrackMessageHandler()
+        self.metrics_server = None
+        self.webhook_server = None
         
-        # Add command handlers
-        self.application.add_handler(CommandHandler("start", self._start_command))
-        self.application.add_handler(CommandHandler("help", self._help_command))
-        self.application.add_handler(CommandHandler("balance", self._balance_command))
-        self.application.add_handler(CommandHandler("history", self._history_command))
-        self.application.add_handler(CommandHandler("summary", self._summary_command))
-        self.application.add_handler(CommandHandler("delete", self._delete_command))
-        self.application.add_handler(CommandHandler("category", self._category_command))
-        self.application.add_handler(CommandHandler("edit", self._edit_command))
-        self.application.add_handler(CommandHandler("search", self._search_command))
-        self.application.add_handler(CommandHandler("chart", self._chart_command))
-
-        
-        # Add message handler for all text messages (should be after command handlers)
-        self.application.add_handler(
-            MessageHandler(filters.TEXT & ~filters.COMMAND, self.message_handler.handle_message)
-        )
+        # Commands, aliases and transactions all go through the handler's router
+        router = self.message_handler.router
+        router.add('start', self._start_command, database=False)
+        router.add('help', self._help_command, database=False)
+        self.application.add_handler(CallbackQueryHandler(
+            router.route('history_callback', self.message_handler.handle_history_callback).handle_update,
+            pattern=r'^hist:'
+        ))
+        # The import opens the chat's database itself, in the background
+        self.application.add_handler(MessageHandler(
+            filters.Document.ALL, router.route('document', self.message_handler.handle_document, database=False).handle_update
+        ))
+        self.application.add_handler(MessageHandler(filters.TEXT, router.handle_text))
     
-    async def _start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def _start_command(self, request: CommandRequest):
         """Send welcome message when command /start is issued."""
         welcome_text = """
 🤖 **FinTrack Bot - Pelacak Keuangan Rumah Tangga**
@@ -66,13 +86,16 @@ belanja 300k
 - `/search <kata>` - Cari transaksi
 - `/edit <id> <field> <value>` - Edit transaksi
 - `/category <nama>` - Lihat transaksi per kategori
-- `/chart` - Lihat grafik pengeluaran 30 hari terakhir
+- `/chart [hari | YYYY-MM]` - Grafik pengeluaran (default 30 hari terakhir)
+- `/report [YYYY-MM | YYYY]` - Laporan bulanan atau tahunan
+- `/export [csv | jsonl]` - Unduh semua transaksi
+- Kirim file .csv/.txt untuk import riwayat transaksi
 
 Saldo akan otomatis terhitung! 💰
         """
-        await update.message.reply_text(welcome_text)
+        await request.update.message.reply_text(welcome_text)
     
-    async def _help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def _help_command(self, request: CommandRequest):
         """Send help message when command /help is issued."""
         help_text = """
 📖 **Bantuan FinTrack Bot**
@@ -84,13 +107,15 @@ Saldo akan otomatis terhitung! 💰
 - `/start` - Memulai bot
 - `/help` - Menampilkan bantuan ini
 - `/balance` - Cek saldo saat ini
-- `/history` - Lihat 5 transaksi terakhir
+- `/history` - Lihat transaksi terakhir (geser dengan tombol)
 - `/edit <id> <field> <value>` - Edit transaksi
 - `/search <kata>` - Cari transaksi
 - `/delete <id>` - Hapus transaksi
 - `/summary` - Ringkasan per kategori
 - `/category <nama>` - Lihat transaksi per kategori
-- `/chart` - Lihat grafik pengeluaran 30 hari terakhir
+- `/chart [hari | YYYY-MM]` - Grafik pengeluaran (default 30 hari terakhir)
+- `/report [YYYY-MM | YYYY]` - Laporan bulanan atau tahunan (default bulan ini)
+- `/export [csv | jsonl]` - Unduh semua transaksi sebagai file .gz (default CSV)
 
 
 **Contoh Transaksi:**
@@ -107,6 +132,14 @@ Saldo akan otomatis terhitung! 💰
 - `/search makan` - Cari semua transaksi makanan
 - `/search gaji` - Cari transaksi gaji
 - `/search transport` - Cari transaksi transportasi
+- `/search mak*` - Cari kata yang diawali "mak"
+
+**Import Riwayat:**
+Kirim file sebagai dokumen:
+- `.txt` - satu transaksi per baris, format sama dengan pesan chat
+- `.csv` - dengan header, misalnya `tanggal,kategori,deskripsi,jumlah`
+  (juga `jenis`, atau kolom `debit`/`kredit` dari mutasi rekening)
+- File hasil `/export` bisa langsung dikirim balik
 
 **Edit Transaksi:**
 - `/edit 1 amount 75000` - Ubah jumlah
@@ -114,55 +147,67 @@ Saldo akan otomatis terhitung! 💰
 - `/edit 1 description lunch` - Ubah deskripsi
 - `/edit 1 type income` - Ubah jenis
         """
-        await update.message.reply_text(help_text)
-    
-    async def _balance_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /balance command"""
-        chat_id = update.message.chat_id
-        handler = FinTrackMessageHandler()
-        await handler._show_balance(update, context, chat_id)
-    
-    async def _history_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /history command"""
-        chat_id = update.message.chat_id
-        handler = FinTrackMessageHandler()
-        await handler._show_history(update, context, chat_id)
-    
-    async def _summary_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /summary command"""
-        chat_id = update.message.chat_id
-        handler = FinTrackMessageHandler()
-        await handler._show_summary(update, context, chat_id)
-    
-    async def _delete_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /delete command"""
-        chat_id = update.message.chat_id
-        handler = FinTrackMessageHandler()
-        await handler._delete_transaction(update, context, chat_id)
+        await request.update.message.reply_text(help_text)
     
-    async def _category_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /category command"""
-        chat_id = update.message.chat_id
-        handler = FinTrackMessageHandler()
-        await handler._show_category(update, context, chat_id)
-    
-    async def _edit_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /edit command"""
-        chat_id = update.message.chat_id
-        handler = FinTrackMessageHandler()
-        await handler._edit_transaction(update, context, chat_id)
-    
-    async def _search_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /search command"""
-        chat_id = update.message.chat_id
-        await self.message_handler._search_transactions(update, context, chat_id)
-    
-    async def _chart_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /search command"""
-        chat_id = update.message.chat_id
-        await self.message_handler._show_chart(update, context, chat_id)
+    async def _post_shutdown(self, application: Application):
+        """Flush queued writes, stop worker pools and close all open chat databases"""
+        # Imports commit chunk by chunk, so stopping one midway loses nothing already saved
+        imports = list(active_imports.values())
+        for task in imports:
+            task.cancel()
+        await asyncio.gather(*imports, return_exceptions=True)
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server = None
+        await write_queues.flush_all()
+        chart_renderer.shutdown()
+        shutdown_executor()
+        registry.close_all()
     
     def run(self):
         """Start the bot"""
         print("Bot FinTrack sedang berjalan...")
-        self.application.run_polling()
\ No newline at end of file
+        if METRICS_PORT:
+            self.metrics_server = start_metrics_server(METRICS_PORT, METRICS_HOST)
+            logger.info("Metrics available at http://%s:%d/metrics", METRICS_HOST, METRICS_PORT)
+        if BOT_MODE == 'webhook':
+            asyncio.run(self.run_webhook())
+        elif BOT_MODE == 'polling':
+            self.application.run_polling()
+        else:
+            raise ValueError(f"Unknown BOT_MODE: {BOT_MODE!r}")
+    
+    async def run_webhook(self, url=WEBHOOK_URL, host=WEBHOOK_HOST, port=WEBHOOK_PORT,
+                          secret_token=WEBHOOK_SECRET, stop_event=None):
+        """Receive updates on our own webhook server until SIGINT/SIGTERM (or `stop_event`)
+        
+        Registers `url` with Telegram; the server listens on host:port at the
+        URL's path. Startup and shutdown mirror run_polling, including post_shutdown.
+        """
+        if not url:
+            raise ValueError("WEBHOOK_URL is required in webhook mode")
+        secret_token = secret_token or secrets.token_urlsafe(32)
+        stop_event = stop_event or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                # Not supported on this platform or outside the main thread
+                pass
+        
+        self.webhook_server = WebhookServer(self.application, host, port, urlsplit(url).path or '/', secret_token)
+        await self.application.initialize()
+        try:
+            await self.application.start()
+            try:
+                await self.webhook_server.start()
+                # Only now that updates can be handled, point Telegram at us
+                await self.application.bot.set_webhook(url=url, secret_token=secret_token)
+                await stop_event.wait()
+            finally:
+                await self.webhook_server.stop()
+                await self.application.stop()
+        finally:
+            await self.application.shutdown()
+            await self.application.post_shutdown(self.application)
\ No newline at end of file
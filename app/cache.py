@@ -0,0 +1,190 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """In-memory LRU cache bounded by the total size of its values
+
+    `sizeof` returns the size in bytes charged for a value. When `disk_dir` is
+    set, entries evicted from memory are kept in a second, larger on-disk tier
+    (bounded by `disk_max_bytes`) and promoted back to memory on a hit.
+    """
+
+    def __init__(self, max_bytes, sizeof=len, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk = DiskCache(disk_dir, disk_max_bytes) if disk_dir else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value = self._disk.get(key) if self._disk else None
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self._store(key, value, write_through=False)
+        return value
+
+    def set(self, key, value):
+        """Cache a value, evicting least recently used entries to stay within max_bytes"""
+        self._store(key, value, write_through=True)
+
+    def _store(self, key, value, write_through):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            if self._disk and write_through:
+                self._disk.set(key, value)
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+
+            self._entries[key] = (value, size)
+            self._size += size
+
+            evicted = []
+            while self._size > self.max_bytes:
+                old_key, (old_value, old_size) = self._entries.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+
+        # Spill evicted entries to disk outside the lock
+        if self._disk:
+            for old_key, old_value in evicted:
+                self._disk.set(old_key, old_value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self._disk:
+            self._disk.clear()
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+        if self._disk:
+            stats['disk_entries'], stats['disk_bytes'] = self._disk.usage()
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+class DiskCache:
+    """Pickled values in a directory, evicted least recently used by total file size"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._files = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        # Pick up entries left by a previous run, oldest first
+        existing = []
+        for filename in os.listdir(directory):
+            if filename.endswith('.cache'):
+                stat = os.stat(os.path.join(directory, filename))
+                existing.append((stat.st_mtime, filename, stat.st_size))
+        for _, filename, size in sorted(existing):
+            self._files[filename] = size
+            self._size += size
+
+    def _filename(self, key):
+        return hashlib.sha1(repr(key).encode()).hexdigest() + '.cache'
+
+    def get(self, key):
+        filename = self._filename(key)
+        with self._lock:
+            if filename not in self._files:
+                return None
+            self._files.move_to_end(filename)
+
+        try:
+            with open(os.path.join(self.directory, filename), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            self._remove(filename)
+            return None
+
+    def set(self, key, value):
+        filename = self._filename(key)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+
+        path = os.path.join(self.directory, filename)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._size -= self._files.pop(filename, 0)
+            self._files[filename] = len(data)
+            self._size += len(data)
+
+            evicted = []
+            while self._size > self.max_bytes:
+                old_filename, old_size = self._files.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_filename)
+
+        for old_filename in evicted:
+            self._unlink(old_filename)
+
+    def _remove(self, filename):
+        with self._lock:
+            self._size -= self._files.pop(filename, 0)
+        self._unlink(filename)
+
+    def _unlink(self, filename):
+        try:
+            os.remove(os.path.join(self.directory, filename))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            filenames = list(self._files)
+            self._files.clear()
+            self._size = 0
+        for filename in filenames:
+            self._unlink(filename)
+
+    def usage(self):
+        with self._lock:
+            return len(self._files), self._size
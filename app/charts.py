@@ -0,0 +1,159 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .cache import LRUCache
+from .metrics import metrics, chart_render_latency, chart_renders
+from ..config import (
+    CHART_WORKERS, CHART_MAX_PENDING, CHART_RENDER_TIMEOUT,
+    CHART_CACHE_MAX_BYTES, CHART_CACHE_DIR, CHART_CACHE_DISK_MAX_BYTES
+)
+
+CHART_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
+
+class ChartQueueFull(Exception):
+    """Raised when too many charts are already waiting to be rendered"""
+
+def render_pie_chart(labels, values, text_labels, title):
+    """Render a donut chart to PNG bytes (runs inside a worker process)"""
+    # Imported here so only the worker processes pay for Plotly
+    import plotly.graph_objects as go
+
+    fig = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=values,
+        text=text_labels,
+        textinfo='text',
+        textposition='inside',
+        hole=0.4,  # Makes it a donut chart
+        marker=dict(colors=CHART_COLORS)
+    )])
+
+    fig.update_layout(
+        title={
+            'text': title,
+            'x': 0.5,
+            'xanchor': 'center',
+            'font': {'size': 16}
+        },
+        showlegend=True,
+        legend=dict(
+            orientation="v",
+            yanchor="top",
+            y=1,
+            xanchor="left",
+            x=1.1
+        ),
+        width=800,
+        height=600,
+        margin=dict(t=100, b=50, l=50, r=150)
+    )
+
+    return fig.to_image(format='png')
+
+class ChartRenderer:
+    """Renders charts on a small process pool so the event loop never blocks on Kaleido"""
+
+    def __init__(self, max_workers=CHART_WORKERS, max_pending=CHART_MAX_PENDING, timeout=CHART_RENDER_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+
+        # Renders submitted to the pool that haven't finished yet (including timed out ones)
+        self.pending = 0
+        self.rendered = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.total_render_time = 0.0
+        self.max_render_time = 0.0
+        self.last_render_time = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: forking a process that runs DB worker threads is not safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def _release(self, future):
+        self.pending -= 1
+        # Retrieve the outcome so abandoned (timed out) renders don't log "never retrieved"
+        if not future.cancelled():
+            future.exception()
+
+    async def render(self, func, *args):
+        """Run `func(*args)` in the pool and return its PNG bytes"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            chart_renders.inc(outcome='rejected')
+            raise ChartQueueFull(f"{self.pending} charts already queued")
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        future = loop.run_in_executor(self._get_executor(), func, *args)
+
+        # A timed out render keeps its worker busy until it finishes, so it keeps
+        # counting against the queue limit until then
+        self.pending += 1
+        future.add_done_callback(self._release)
+
+        try:
+            png = await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            chart_renders.inc(outcome='timed_out')
+            raise
+        except Exception:
+            self.failed += 1
+            chart_renders.inc(outcome='failed')
+            raise
+
+        elapsed = time.perf_counter() - start
+        self.rendered += 1
+        self.total_render_time += elapsed
+        self.max_render_time = max(self.max_render_time, elapsed)
+        self.last_render_time = elapsed
+        chart_renders.inc(outcome='rendered')
+        chart_render_latency.observe(elapsed)
+        return png
+
+    def stats(self):
+        """Return render counters and timings (seconds)"""
+        return {
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'rendered': self.rendered,
+            'failed': self.failed,
+            'timed_out': self.timed_out,
+            'rejected': self.rejected,
+            'avg_render_time': self.total_render_time / self.rendered if self.rendered else 0.0,
+            'max_render_time': self.max_render_time,
+            'last_render_time': self.last_render_time,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+def _chart_entry_size(entry):
+    png, caption = entry
+    return len(png) + len(caption.encode())
+
+# Shared renderer used by the /chart handler
+renderer = ChartRenderer()
+
+# Rendered (png, caption) pairs keyed by (chat_id, window, day, data_version)
+chart_cache = LRUCache(
+    CHART_CACHE_MAX_BYTES,
+    sizeof=_chart_entry_size,
+    disk_dir=CHART_CACHE_DIR,
+    disk_max_bytes=CHART_CACHE_DISK_MAX_BYTES
+)
+
+metrics.gauge('fintrack_chart_pending', 'Charts submitted to the render pool and not finished yet', func=lambda: renderer.pending)
+metrics.gauge('fintrack_chart_cache_bytes', 'Bytes of rendered charts held in memory', func=lambda: chart_cache.stats()['bytes'])
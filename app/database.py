@@ -1,36 +1,539 @@
+import heapq
 import os
-from sqlalchemy import create_engine, func
+import threading
+import time
+import weakref
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import event, create_engine, func, insert, select, update, delete, table, column, literal_column, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.orm import sessionmaker, scoped_session
-from .models import Base, Transaction
-from ..config import DB_DIR, DB_FILE_PATTERN
+from .models import Transaction, Balance, DailyTotal, MAX_AMOUNT, amount_in_range, quantize_amount
+from .migrations import migrate, create_search_index, fts5_trigram_available, rebuild_daily_totals
+from .metrics import db_query_latency, db_query_errors, statement_kind
+from ..config import (
+    DB_DIR, DB_FILE_PATTERN, SHARED_DB_FILE, STORAGE_MODE, STORAGE_PROFILE, STORAGE_PROFILES, EXPORT_BATCH_SIZE,
+    ARCHIVE_FILE_PATTERN, ARCHIVE_BATCH_SIZE, CURRENCY_SYMBOL, ensure_db_dir
+)
+
+def amount_error(amount):
+    """User-facing message if `amount` is too large to store, else None"""
+    if amount_in_range(amount):
+        return None
+    return f"Jumlah terlalu besar (maks {CURRENCY_SYMBOL} {MAX_AMOUNT:,})"
+
+# FTS5 shadow index created by migration 4 (not part of the ORM metadata)
+transactions_fts = table('transactions_fts', column('rowid'), column('rank'))
+
+def instrument_engine(engine):
+    """Time every SQL statement the engine executes"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        db_query_latency.observe(elapsed, statement=statement_kind(statement))
+    
+    @event.listens_for(engine, 'handle_error')
+    def _execute_failed(context):
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+        db_query_errors.inc(statement=statement_kind(context.statement or ''))
+
+# busy_timeout goes first so switching the journal mode waits for other connections
+STORAGE_PRAGMAS = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store')
+
+def apply_storage_profile(engine, profile):
+    """Run the profile's PRAGMAs on every connection the engine opens"""
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile!r}")
+    settings = STORAGE_PROFILES[profile]
+    pragmas = [f"PRAGMA {name} = {settings[name]}" for name in STORAGE_PRAGMAS if name in settings]
+    
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def create_sqlite_engine(path, profile=None):
+    """Engine for a database file, instrumented and tuned with a storage profile"""
+    engine = create_engine(f'sqlite:///{path}', echo=False)
+    apply_storage_profile(engine, profile or STORAGE_PROFILE)
+    instrument_engine(engine)
+    return engine
+
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+def get_shared_engine():
+    """Engine for the database every chat shares in STORAGE_MODE = 'shared'"""
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is None:
+            ensure_db_dir()
+            engine = create_sqlite_engine(os.path.join(DB_DIR, SHARED_DB_FILE))
+            migrate(engine)
+            _shared_engine = engine
+        return _shared_engine
+
+def dispose_shared_engine():
+    """Close the shared engine's connections (used on shutdown)"""
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is not None:
+            _shared_engine.dispose()
+            _shared_engine = None
+
+def compact_database(engine):
+    """Give space freed by deleted rows back to the filesystem; returns the file size (before, after)
+    
+    The first run switches the file to incremental auto-vacuum, which takes a
+    full VACUUM (rewriting the whole file); later runs only release free pages.
+    """
+    path = engine.url.database
+    size_before = os.path.getsize(path)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            # executescript steps the pragma to completion; execute() would free a single page
+            conn.connection.driver_connection.executescript("PRAGMA incremental_vacuum;")
+        else:
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+        # In WAL mode the file only shrinks once the log is checkpointed
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return size_before, os.path.getsize(path)
+
+def _dispose_engines(engines):
+    while engines:
+        engines.pop().dispose()
 
 class DatabaseManager:
-    def __init__(self, chat_id):
+    def __init__(self, chat_id, storage_mode=None, storage_profile=None):
         self.chat_id = chat_id
-        self.db_path = os.path.join(DB_DIR, DB_FILE_PATTERN.format(chat_id=chat_id))
-        self.engine = create_engine(f'sqlite:///{self.db_path}', echo=False)
+        self.storage_mode = storage_mode or STORAGE_MODE
+        if self.storage_mode == 'shared':
+            # One engine for all chats, already migrated when it was created
+            self.engine = get_shared_engine()
+        elif self.storage_mode == 'per_chat':
+            ensure_db_dir()
+            db_path = os.path.join(DB_DIR, DB_FILE_PATTERN.format(chat_id=chat_id))
+            self.engine = create_sqlite_engine(db_path, storage_profile)
+        else:
+            raise ValueError(f"Unknown storage mode: {self.storage_mode!r}")
+        self.db_path = self.engine.url.database
         self.Session = scoped_session(sessionmaker(bind=self.engine))
+        # Opened on first use (see _archive_session)
+        self.archive_path = os.path.join(DB_DIR, ARCHIVE_FILE_PATTERN.format(chat_id=chat_id))
+        self._archive_engine = None
+        self._archive_lock = threading.Lock()
+        # Engines disposed on close; the shared engine outlives any one chat (see dispose_shared_engine)
+        self._owned_engines = [self.engine] if self.storage_mode == 'per_chat' else []
+        self._data_version = 0
+        self._version_lock = threading.Lock()
+        self._data_version_read_at = time.monotonic()
         self._init_db()
     
     def _init_db(self):
-        """Initialize database with required tables"""
-        Base.metadata.create_all(self.engine)
+        """Bring the database schema up to date"""
+        if self.storage_mode == 'per_chat':
+            migrate(self.engine, chat_id=self.chat_id)
+        self._init_balance()
+        self.has_search_index = self._search_index_exists(self.engine)
+    
+    def _search_index_exists(self, engine):
+        with engine.connect() as conn:
+            return conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+            ).first() is not None
+    
+    def _init_balance(self):
+        """Create the balance ledger row, computing it from existing transactions"""
+        session = self.Session()
+        
+        try:
+            ledger = session.get(Balance, self.chat_id)
+            if ledger is None:
+                try:
+                    ledger = self._rebuild_balance(session)
+                    ledger.data_version = 0
+                    session.commit()
+                except IntegrityError:
+                    # Another connection opened the same chat and created the row first
+                    session.rollback()
+                    ledger = session.get(Balance, self.chat_id)
+            self._data_version = ledger.data_version
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
+    def _compute_totals(self, session):
+        """Aggregate income/expense totals straight from the transactions table (and the archive)"""
+        totals = {
+            'total_income': 0,
+            'total_expense': 0,
+            'income_count': 0,
+            'expense_count': 0
+        }
+        sessions = [session]
+        if self._archive_horizon(session) is not None:
+            sessions.append(self._archive_session())
+        
+        try:
+            for source in sessions:
+                rows = source.query(
+                    Transaction.type,
+                    func.coalesce(func.sum(Transaction.amount), 0),
+                    func.count(Transaction.id)
+                )\
+                .filter(Transaction.chat_id == self.chat_id)\
+                .group_by(Transaction.type)\
+                .all()
+                
+                for transaction_type, total, count in rows:
+                    if transaction_type in ('income', 'expense'):
+                        totals[f'total_{transaction_type}'] += total
+                        totals[f'{transaction_type}_count'] += count
+        finally:
+            for source in sessions[1:]:
+                source.close()
+        return totals
+    
+    def _rebuild_balance(self, session):
+        """Overwrite the ledger row with freshly computed totals"""
+        ledger = session.get(Balance, self.chat_id)
+        if ledger is None:
+            ledger = Balance(chat_id=self.chat_id)
+            session.add(ledger)
+        
+        for column, value in self._compute_totals(session).items():
+            setattr(ledger, column, value)
+        
+        # Never hand out an id that is already taken, archived ones included
+        max_id = session.query(func.max(Transaction.id))\
+            .filter(Transaction.chat_id == self.chat_id)\
+            .scalar()
+        if ledger.archived_before is not None:
+            archive = self._archive_session()
+            try:
+                archived_max_id = archive.query(func.max(Transaction.id))\
+                    .filter(Transaction.chat_id == self.chat_id)\
+                    .scalar()
+            finally:
+                archive.close()
+            max_id = max(max_id or 0, archived_max_id or 0)
+        ledger.next_transaction_id = max(ledger.next_transaction_id or 1, (max_id or 0) + 1)
+        return ledger
+    
+    def _apply_balance_delta(self, executor, transaction_type, amount, count=1):
+        """Add (or with negative values, remove) amounts from the ledger row
+        
+        `executor` is the session or connection whose transaction the change belongs to.
+        """
+        if transaction_type not in ('income', 'expense'):
+            return
+        
+        total_column = getattr(Balance, f'total_{transaction_type}')
+        count_column = getattr(Balance, f'{transaction_type}_count')
+        executor.execute(
+            update(Balance)
+            .where(Balance.chat_id == self.chat_id)
+            .values({
+                total_column: total_column + amount,
+                count_column: count_column + count
+            })
+            .execution_options(synchronize_session=False)
+        )
+    
+    def _bump_data_version(self, executor):
+        """Increment the chat's data version inside the caller's transaction"""
+        return executor.execute(
+            update(Balance)
+            .where(Balance.chat_id == self.chat_id)
+            .values(data_version=Balance.data_version + 1)
+            .returning(Balance.data_version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+    
+    def _apply_rollup_deltas(self, executor, deltas):
+        """Add amounts and counts to the daily rollup
+        
+        `deltas` maps (created_at, category, type) to (amount, count); negative
+        values take transactions out, and days left empty are removed.
+        """
+        rows = {}
+        for (created_at, category, transaction_type), (amount, count) in deltas.items():
+            if created_at is None:
+                # Not in the rollup either (see rebuild_daily_totals)
+                continue
+            key = (created_at.date(), category or '', transaction_type)
+            total, total_count = rows.get(key, (0, 0))
+            rows[key] = (total + amount, total_count + count)
+        
+        params = [
+            {'chat_id': self.chat_id, 'day': day, 'category': category, 'type': transaction_type,
+             'total': amount, 'count': count}
+            for (day, category, transaction_type), (amount, count) in rows.items()
+            if amount or count
+        ]
+        if not params:
+            return
+        
+        daily_totals = DailyTotal.__table__
+        statement = sqlite_insert(daily_totals)
+        statement = statement.on_conflict_do_update(
+            index_elements=[daily_totals.c.chat_id, daily_totals.c.day, daily_totals.c.category, daily_totals.c.type],
+            set_={
+                'total': daily_totals.c.total + statement.excluded.total,
+                'count': daily_totals.c.count + statement.excluded.count
+            }
+        )
+        executor.execute(statement, params)
+        
+        if any(row['count'] < 0 for row in params):
+            executor.execute(
+                delete(daily_totals)
+                .where(daily_totals.c.chat_id == self.chat_id, daily_totals.c.count <= 0)
+            )
+    
+    def _allocate_ids(self, executor, count):
+        """Reserve `count` consecutive transaction ids, returning the first one
+        
+        Runs inside the caller's transaction, so ids of a rolled back insert are
+        handed out again.
+        """
+        next_id = executor.execute(
+            update(Balance)
+            .where(Balance.chat_id == self.chat_id)
+            .values(next_transaction_id=Balance.next_transaction_id + count)
+            .returning(Balance.next_transaction_id)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+        return next_id - count
+    
+    def _committed_data_version(self, version):
+        """Record a version bump once its transaction has committed"""
+        if version is None:
+            return
+        with self._version_lock:
+            self._data_version = max(self._data_version, version)
+    
+    @property
+    def data_version(self):
+        """Counter that changes whenever this chat's transactions change
+        
+        Counts this process's writes as they commit, and other processes'
+        (e.g. the maintenance CLI) as of the last refresh_data_version().
+        """
+        return self._data_version
+    
+    def refresh_data_version(self, max_age=0):
+        """Pick up data version bumps committed by other processes
+        
+        Skips the read if the version was read from disk less than `max_age`
+        seconds ago.
+        """
+        now = time.monotonic()
+        if now - self._data_version_read_at < max_age:
+            return self._data_version
+        self._data_version_read_at = now
+        with self.engine.connect() as conn:
+            version = conn.exec_driver_sql(
+                "SELECT data_version FROM balances WHERE chat_id = ?", (self.chat_id,)
+            ).scalar()
+        self._committed_data_version(version)
+        return self._data_version
+    
+    def close(self):
+        """Release sessions and dispose the engine's connection pool"""
+        self.Session.remove()
+        with self._archive_lock:
+            self._archive_engine = None
+            _dispose_engines(self._owned_engines)
+    
+    def close_when_unused(self):
+        """Dispose the engines once the last reference to this manager is dropped
+        
+        For managers a handler may still be using, e.g. one evicted from the
+        registry while its query runs. Without this their pools would stay open
+        until a full garbage collection, as engines are reference cycles.
+        """
+        weakref.finalize(self, _dispose_engines, self._owned_engines)
+    
+    def _archive_horizon(self, session):
+        """Creation time before which the chat's transactions were archived, None without an archive"""
+        # Not flushing: the ledger row may be pending creation in this session
+        with session.no_autoflush:
+            ledger = session.get(Balance, self.chat_id)
+        return ledger.archived_before if ledger else None
+    
+    def _archive_session(self):
+        """New session on the chat's archive database, opening (and creating) it on first use"""
+        with self._archive_lock:
+            if self._archive_engine is None:
+                ensure_db_dir()
+                engine = create_sqlite_engine(self.archive_path)
+                # Same schema as a chat database, so every query here works on it unchanged
+                migrate(engine, chat_id=self.chat_id)
+                self.archive_has_search_index = self._search_index_exists(engine)
+                self._archive_sessions = sessionmaker(bind=engine)
+                self._archive_engine = engine
+                self._owned_engines.append(engine)
+            return self._archive_sessions()
+    
+    def _archived_dicts(self, transactions):
+        return [dict(trans.to_dict(), archived=True) for trans in transactions]
+    
+    def _merge_newest_first(self, rows, archived_rows, limit):
+        """Merge two newest-first lists of transaction dicts, keeping the first `limit`"""
+        seen = {row['id'] for row in rows}
+        # A row can briefly be in both databases if an archive run was interrupted
+        merged = rows + [row for row in archived_rows if row['id'] not in seen]
+        merged.sort(key=lambda row: (row['created_at'] or datetime.min, row['id']), reverse=True)
+        return merged[:limit]
+    
+    def archive_transactions(self, before, batch_size=ARCHIVE_BATCH_SIZE):
+        """Move transactions created before `before` into the chat's archive database
+        
+        The ledger and the daily rollup keep counting archived transactions, so
+        balances, summaries and reports stay the same, and ids are never
+        reused. Reads that can reach past the archive horizon (history, search,
+        category lists, export) look in the archive as well. Rows move
+        `batch_size` at a time with the archive ATTACHed. SQLite doesn't commit
+        atomically across attached WAL databases, so each batch is first
+        committed into the archive and only then deleted from the chat database,
+        in a second transaction that also moves the horizon; a crash in between
+        leaves rows in both, which reads skip and a repeated run cleans up.
+        Returns the number of rows moved.
+        """
+        # Creates the archive file with the current schema if needed
+        self._archive_session().close()
+        # The same text format SQLAlchemy stores DATETIME columns in, so it compares as a string
+        cutoff = before.strftime('%Y-%m-%d %H:%M:%S.%f')
+        moved = 0
+        
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (self.archive_path,))
+            try:
+                while True:
+                    batch = self._archive_batch_bounds(conn, cutoff, batch_size)
+                    copied = self._in_transaction(conn, self._copy_to_archive, batch)
+                    count, version = self._in_transaction(conn, self._delete_archived, batch, cutoff)
+                    self._committed_data_version(version)
+                    moved += count
+                    # Nothing deleted: the rest changed since the copy, leave them for the next run
+                    if copied < batch_size or not count:
+                        break
+            finally:
+                conn.exec_driver_sql("DETACH DATABASE archive")
+        
+        return moved
+    
+    def _in_transaction(self, conn, work, *args):
+        """Run `work(conn, *args)` in its own write transaction on an AUTOCOMMIT connection"""
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            result = work(conn, *args)
+            conn.exec_driver_sql("COMMIT")
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        return result
+    
+    def _archive_batch_bounds(self, conn, cutoff, batch_size):
+        """WHERE clause and parameters for up to `batch_size` of the oldest rows before `cutoff`"""
+        # The batch ends at the batch_size-th oldest row, a short walk along (chat_id, created_at, id)
+        last = conn.exec_driver_sql(
+            "SELECT created_at, id FROM main.transactions WHERE chat_id = ? AND created_at < ? "
+            "ORDER BY created_at, id LIMIT 1 OFFSET ?",
+            (self.chat_id, cutoff, batch_size - 1)
+        ).first()
+        where = "t.chat_id = ? AND t.created_at < ?"
+        parameters = (self.chat_id, cutoff)
+        if last is not None:
+            where += " AND (t.created_at, t.id) <= (?, ?)"
+            parameters += tuple(last)
+        return where, parameters
+    
+    def _copy_to_archive(self, conn, batch):
+        """Copy the batch into the archive (only the archive is written); returns the row count"""
+        where, parameters = batch
+        # A copy left by an interrupted run may predate an edit of the row. An
+        # upsert rather than REPLACE, whose implicit delete wouldn't fire the
+        # search index triggers (recursive_triggers is off)
+        return conn.exec_driver_sql(f"""
+            INSERT INTO archive.transactions
+                (chat_id, id, amount, type, category, description, created_at, message_id)
+            SELECT chat_id, id, amount, type, category, description, created_at, message_id
+            FROM main.transactions AS t
+            WHERE {where}
+            ON CONFLICT (chat_id, id) DO UPDATE SET
+                amount = excluded.amount, type = excluded.type, category = excluded.category,
+                description = excluded.description, created_at = excluded.created_at,
+                message_id = excluded.message_id
+        """, parameters).rowcount
+    
+    def _delete_archived(self, conn, batch, cutoff):
+        """Delete the batch's rows whose archive copy is identical; returns (rows deleted, new data version)"""
+        where, parameters = batch
+        # Rows inserted or edited since the copy stay until the next run
+        moved = conn.exec_driver_sql(f"""
+            DELETE FROM main.transactions AS t
+            WHERE {where} AND EXISTS (
+                SELECT 1 FROM archive.transactions AS a
+                WHERE a.chat_id = t.chat_id AND a.id = t.id AND a.amount = t.amount AND a.type = t.type
+                  AND a.category IS t.category AND a.description IS t.description
+                  AND a.created_at IS t.created_at AND a.message_id IS t.message_id
+            )
+        """, parameters).rowcount
+        if not moved:
+            return 0, None
+        
+        version = conn.exec_driver_sql("""
+            UPDATE main.balances
+            SET archived_before = MAX(COALESCE(archived_before, ''), ?), data_version = data_version + 1
+            WHERE chat_id = ?
+            RETURNING data_version
+        """, (cutoff, self.chat_id)).scalar()
+        return moved, version
     
     def add_transaction(self, amount, transaction_type, category=None, description=None, message_id=None):
         """Add a new transaction to the database"""
+        error = amount_error(amount)
+        if error:
+            raise ValueError(error)
+        # Round once up front so the row and the ledger get exactly the same value
+        amount = quantize_amount(amount)
+        created_at = datetime.utcnow()
         session = self.Session()
         
         try:
             transaction = Transaction(
+                chat_id=self.chat_id,
+                id=self._allocate_ids(session, 1),
                 amount=amount,
                 type=transaction_type,
                 category=category,
                 description=description,
+                created_at=created_at,
                 message_id=message_id
             )
             
             session.add(transaction)
+            self._apply_balance_delta(session, transaction_type, amount)
+            self._apply_rollup_deltas(session, {(created_at, category, transaction_type): (amount, 1)})
+            version = self._bump_data_version(session)
             session.commit()
+            self._committed_data_version(version)
             return transaction.id
         except Exception as e:
             session.rollback()
@@ -38,12 +541,105 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def add_transactions_bulk(self, transactions, message_id=None):
+        """Add many transactions in a single database transaction
+        
+        `transactions` is a list of dicts with 'amount', 'type' and optionally
+        'category', 'description', 'created_at' (defaulting to now) and a
+        per-row 'message_id' (defaulting to the `message_id` argument). Returns `(ids, failures)`: the new ids in
+        input order (None for rows that were not saved) and a list of
+        `(index, error message)` for those rows.
+        """
+        ids = [None] * len(transactions)
+        failures = []
+        rows = []
+        now = datetime.utcnow()
+        
+        for index, data in enumerate(transactions):
+            error = self._validate_transaction(data.get('amount'), data.get('type'))
+            if error:
+                failures.append((index, error))
+                continue
+            
+            rows.append((index, {
+                'chat_id': self.chat_id,
+                'amount': quantize_amount(data['amount']),
+                'type': data['type'],
+                'category': data.get('category'),
+                'description': data.get('description'),
+                'created_at': data.get('created_at') or now,
+                'message_id': data.get('message_id', message_id)
+            }))
+        
+        if not rows:
+            return ids, failures
+        
+        try:
+            with self.engine.begin() as conn:
+                first_id = self._allocate_ids(conn, len(rows))
+                inserted = [(index, dict(params, id=first_id + offset), first_id + offset)
+                            for offset, (index, params) in enumerate(rows)]
+                conn.execute(insert(Transaction), [params for _, params, _ in inserted])
+                self._apply_bulk_balance_delta(conn, inserted)
+                version = self._bump_data_version(conn)
+        except (SQLAlchemyError, OverflowError):
+            # The whole batch was rolled back (sqlite3 raises OverflowError for
+            # integers it can't bind, unwrapped); retry one statement per row in a new
+            # transaction. SQLite only undoes the failing statement, so every other
+            # row still lands in the same commit
+            with self.engine.begin() as conn:
+                first_id = self._allocate_ids(conn, len(rows))
+                inserted = []
+                for offset, (index, params) in enumerate(rows):
+                    params = dict(params, id=first_id + offset)
+                    try:
+                        conn.execute(insert(Transaction), params)
+                        inserted.append((index, params, params['id']))
+                    except (SQLAlchemyError, OverflowError) as e:
+                        failures.append((index, str(getattr(e, 'orig', None) or e)))
+                self._apply_bulk_balance_delta(conn, inserted)
+                version = self._bump_data_version(conn) if inserted else None
+        
+        self._committed_data_version(version)
+        for index, params, new_id in inserted:
+            ids[index] = new_id
+        
+        failures.sort()
+        return ids, failures
+    
+    def _apply_bulk_balance_delta(self, conn, inserted):
+        """Apply one ledger delta per transaction type, and the rollup deltas, for a batch of new rows"""
+        totals = {}
+        rollup = {}
+        for _, params, _ in inserted:
+            amount, count = totals.get(params['type'], (0, 0))
+            totals[params['type']] = (amount + params['amount'], count + 1)
+            key = (params['created_at'], params['category'], params['type'])
+            amount, count = rollup.get(key, (0, 0))
+            rollup[key] = (amount + params['amount'], count + 1)
+        
+        for transaction_type, (amount, count) in totals.items():
+            self._apply_balance_delta(conn, transaction_type, amount, count)
+        self._apply_rollup_deltas(conn, rollup)
+    
+    def _validate_transaction(self, amount, transaction_type):
+        """Return an error message for values that can't be stored, else None"""
+        if isinstance(amount, bool) or not isinstance(amount, (int, float, Decimal)):
+            return f"Jumlah tidak valid: {amount!r}"
+        error = amount_error(amount)
+        if error:
+            return error
+        if transaction_type not in ('income', 'expense'):
+            return f"Jenis transaksi tidak valid: {transaction_type!r}"
+        return None
+    
     def get_transactions(self, limit=10, offset=0):
         """Get recent transactions"""
         session = self.Session()
         
         try:
             transactions = session.query(Transaction)\
+                .filter(Transaction.chat_id == self.chat_id)\
                 .order_by(Transaction.created_at.desc())\
                 .offset(offset)\
                 .limit(limit)\
@@ -53,22 +649,163 @@ class DatabaseManager:
         finally:
             session.close()
     
-    def get_balance(self):
-        """Calculate current balance in IDR"""
+    def iter_transactions(self, batch_size=EXPORT_BATCH_SIZE):
+        """Yield every transaction of the chat, archived ones included, in id order
+        
+        Rows are (id, created_at, category, description, amount, type) tuples
+        fetched `batch_size` at a time from one read transaction per database,
+        so memory use doesn't depend on the size of the chat. Iterate on a
+        single thread and close the generator if stopping early.
+        """
+        session = self.Session()
+        archive = None
+        
+        try:
+            streams = [self._stream_transactions(session, batch_size)]
+            if self._archive_horizon(session) is not None:
+                archive = self._archive_session()
+                streams.append(self._stream_transactions(archive, batch_size))
+            
+            previous_id = None
+            for row in heapq.merge(*streams, key=lambda row: row[0]):
+                # A row can briefly be in both databases if an archive run was interrupted
+                if row[0] != previous_id:
+                    yield row
+                previous_id = row[0]
+        finally:
+            if archive is not None:
+                archive.close()
+            session.close()
+    
+    def _stream_transactions(self, session, batch_size):
+        rows = session.query(
+            Transaction.id,
+            Transaction.created_at,
+            Transaction.category,
+            Transaction.description,
+            Transaction.amount,
+            Transaction.type
+        )\
+        .filter(Transaction.chat_id == self.chat_id)\
+        .order_by(Transaction.id)\
+        .yield_per(batch_size)
+        
+        for row in rows:
+            yield tuple(row)
+    
+    def get_transactions_page(self, limit=5, before=None, after=None):
+        """Get one page of transactions, newest first, using keyset pagination
+        
+        `before`/`after` are (created_at, id) cursors taken from the last/first
+        row of the previous page; each page is a single index range scan no
+        matter how far back it is. Returns a dict with 'transactions',
+        'has_older' and 'has_newer'.
+        """
         session = self.Session()
         
         try:
-            # Get total income
-            total_income = session.query(func.coalesce(func.sum(Transaction.amount), 0))\
-                .filter(Transaction.type == 'income')\
-                .scalar()
+            rows = [trans.to_dict() for trans in self._page_query(session, limit + 1, before, after)]
             
-            # Get total expenses
-            total_expense = session.query(func.coalesce(func.sum(Transaction.amount), 0))\
-                .filter(Transaction.type == 'expense')\
-                .scalar()
+            # Archived rows all predate the horizon, so the archive only matters
+            # when the page reaches back that far
+            horizon = self._archive_horizon(session)
+            if horizon is not None:
+                if after is not None:
+                    needed = (after[0] or datetime.min) < horizon
+                else:
+                    needed = len(rows) <= limit or (rows[-1]['created_at'] or datetime.min) < horizon
+                if needed:
+                    archive = self._archive_session()
+                    try:
+                        archived = self._archived_dicts(self._page_query(archive, limit + 1, before, after))
+                    finally:
+                        archive.close()
+                    rows = self._merge_newest_first(rows, archived, len(rows) + len(archived))
+                    # Both lists are in page order; keep the limit + 1 rows nearest the cursor
+                    rows = rows[-(limit + 1):] if after is not None else rows[:limit + 1]
             
-            return total_income - total_expense
+            if after is not None:
+                has_newer = len(rows) > limit
+                rows = rows[-limit:]
+                has_older = True
+            else:
+                has_older = len(rows) > limit
+                rows = rows[:limit]
+                has_newer = before is not None
+            
+            return {
+                'transactions': rows,
+                'has_older': has_older,
+                'has_newer': has_newer
+            }
+        finally:
+            session.close()
+    
+    def _page_query(self, session, limit, before=None, after=None):
+        """Up to `limit` transactions next to a keyset cursor, newest first"""
+        key = tuple_(Transaction.created_at, Transaction.id)
+        query = session.query(Transaction).filter(Transaction.chat_id == self.chat_id)
+        
+        if after is not None:
+            # Walk forward in time from the cursor, then flip back to newest first
+            rows = query\
+                .filter(key > tuple_(*after))\
+                .order_by(Transaction.created_at.asc(), Transaction.id.asc())\
+                .limit(limit)\
+                .all()
+            return list(reversed(rows))
+        
+        if before is not None:
+            query = query.filter(key < tuple_(*before))
+        return query\
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())\
+            .limit(limit)\
+            .all()
+    
+    def get_balance(self):
+        """Get current balance in IDR from the ledger"""
+        session = self.Session()
+        
+        try:
+            ledger = session.get(Balance, self.chat_id)
+            return ledger.balance if ledger else 0
+        finally:
+            session.close()
+    
+    def rebuild_balance(self):
+        """Recompute the ledger from the transactions table"""
+        session = self.Session()
+        
+        try:
+            ledger = self._rebuild_balance(session)
+            version = self._bump_data_version(session)
+            session.commit()
+            self._committed_data_version(version)
+            return ledger.to_dict()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
+    def verify_balance(self):
+        """Compare the ledger against the transactions table"""
+        session = self.Session()
+        
+        try:
+            ledger = session.get(Balance, self.chat_id)
+            expected = self._compute_totals(session)
+            actual = {column: getattr(ledger, column) if ledger else None for column in expected}
+            mismatches = {
+                column: {'ledger': actual[column], 'expected': expected[column]}
+                for column in expected
+                if actual[column] != expected[column]
+            }
+            return {
+                'ok': not mismatches,
+                'balance': expected['total_income'] - expected['total_expense'],
+                'mismatches': mismatches
+            }
         finally:
             session.close()
     
@@ -77,12 +814,19 @@ class DatabaseManager:
         session = self.Session()
         
         try:
-            deleted_count = session.query(Transaction)\
-                .filter(Transaction.id == transaction_id)\
-                .delete()
+            transaction = session.get(Transaction, (self.chat_id, transaction_id))
+            if not transaction:
+                return False
             
+            self._apply_balance_delta(session, transaction.type, -transaction.amount, -1)
+            self._apply_rollup_deltas(session, {
+                (transaction.created_at, transaction.category, transaction.type): (-transaction.amount, -1)
+            })
+            session.delete(transaction)
+            version = self._bump_data_version(session)
             session.commit()
-            return deleted_count > 0
+            self._committed_data_version(version)
+            return True
         except Exception as e:
             session.rollback()
             raise e
@@ -91,15 +835,23 @@ class DatabaseManager:
     
     def update_transaction(self, transaction_id, amount=None, transaction_type=None, category=None, description=None):
         """Update an existing transaction"""
+        error = amount_error(amount) if amount is not None else None
+        if error:
+            raise ValueError(error)
         session = self.Session()
         
         try:
-            transaction = session.query(Transaction).filter(Transaction.id == transaction_id).first()
+            transaction = session.get(Transaction, (self.chat_id, transaction_id))
             if not transaction:
                 return False
             
+            # Take the old values out of the ledger and rollup and put the new ones back in
+            self._apply_balance_delta(session, transaction.type, -transaction.amount, -1)
+            old_key = (transaction.created_at, transaction.category, transaction.type)
+            old_amount = transaction.amount
+            
             if amount is not None:
-                transaction.amount = amount
+                transaction.amount = quantize_amount(amount)
             if transaction_type is not None:
                 transaction.type = transaction_type
             if category is not None:
@@ -107,7 +859,16 @@ class DatabaseManager:
             if description is not None:
                 transaction.description = description
             
+            self._apply_balance_delta(session, transaction.type, transaction.amount)
+            new_key = (transaction.created_at, transaction.category, transaction.type)
+            if new_key == old_key:
+                deltas = {new_key: (transaction.amount - old_amount, 0)}
+            else:
+                deltas = {old_key: (-old_amount, -1), new_key: (transaction.amount, 1)}
+            self._apply_rollup_deltas(session, deltas)
+            version = self._bump_data_version(session)
             session.commit()
+            self._committed_data_version(version)
             return True
         except Exception as e:
             session.rollback()
@@ -116,68 +877,236 @@ class DatabaseManager:
             session.close()
 
     def get_transaction_by_id(self, transaction_id):
-        """Get a specific transaction by ID"""
+        """Get a specific transaction by ID
+        
+        Archived transactions are found too, marked with 'archived': True;
+        they can't be updated or deleted.
+        """
         session = self.Session()
         
         try:
-            transaction = session.query(Transaction)\
-                .filter(Transaction.id == transaction_id)\
-                .first()
+            transaction = session.get(Transaction, (self.chat_id, transaction_id))
+            if transaction:
+                return transaction.to_dict()
+            if self._archive_horizon(session) is None:
+                return None
             
-            return transaction.to_dict() if transaction else None
+            archive = self._archive_session()
+            try:
+                transaction = archive.get(Transaction, (self.chat_id, transaction_id))
+                return self._archived_dicts([transaction])[0] if transaction else None
+            finally:
+                archive.close()
         finally:
             session.close()
     
     def get_transactions_by_category(self, category, limit=10):
-        """Get transactions by category"""
+        """Get the newest transactions of a category, reading the archive when needed"""
         session = self.Session()
         
         try:
-            transactions = session.query(Transaction)\
-                .filter(Transaction.category == category)\
-                .order_by(Transaction.created_at.desc())\
-                .limit(limit)\
-                .all()
+            transactions = [trans.to_dict() for trans in self._category_query(session, category, limit)]
             
-            return [trans.to_dict() for trans in transactions]
+            horizon = self._archive_horizon(session)
+            if horizon is not None and (
+                len(transactions) < limit or (transactions[-1]['created_at'] or datetime.min) < horizon
+            ):
+                archive = self._archive_session()
+                try:
+                    archived = self._archived_dicts(self._category_query(archive, category, limit))
+                finally:
+                    archive.close()
+                transactions = self._merge_newest_first(transactions, archived, limit)
+            
+            return transactions
         finally:
             session.close()
     
+    def _category_query(self, session, category, limit):
+        return session.query(Transaction)\
+            .filter(Transaction.chat_id == self.chat_id, Transaction.category == category)\
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())\
+            .limit(limit)\
+            .all()
+    
     def get_category_summary(self):
         """Get summary of expenses/income by category"""
         session = self.Session()
         
         try:
             result = session.query(
-                Transaction.category,
-                Transaction.type,
-                func.sum(Transaction.amount).label('total_amount')
+                DailyTotal.category,
+                DailyTotal.type,
+                func.sum(DailyTotal.total).label('total_amount')
             )\
-            .filter(Transaction.category.isnot(None))\
-            .group_by(Transaction.category, Transaction.type)\
+            .filter(DailyTotal.chat_id == self.chat_id, DailyTotal.category != '')\
+            .group_by(DailyTotal.category, DailyTotal.type)\
             .all()
             
             return result
         finally:
             session.close()
             
-    def search_transactions(self, search_term, limit=20):
-        """Search transactions by category or description"""
+    def get_category_totals(self, start, end, transaction_type=None):
+        """Aggregate transactions from the days [start, end) per category and type
+        
+        Reads the daily rollup, so `start` and `end` (dates or datetimes) count
+        by whole UTC days. `end` may be None for an open-ended window. Returns
+        a list of (category, type, total, count), category None for
+        uncategorized transactions.
+        """
         session = self.Session()
         
         try:
-            # Use ILIKE for case-insensitive search and % for partial matches
-            search_pattern = f'%{search_term}%'
+            query = self._rollup_query(session, start, end, transaction_type, DailyTotal.category)
+            rows = query\
+                .order_by(func.sum(DailyTotal.total).desc())\
+                .all()
             
-            transactions = session.query(Transaction)\
-                .filter(
-                    (Transaction.category.ilike(search_pattern)) | 
-                    (Transaction.description.ilike(search_pattern))
-                )\
-                .order_by(Transaction.created_at.desc())\
-                .limit(limit)\
+            return [(category or None, type_, total, count) for category, type_, total, count in rows]
+        finally:
+            session.close()
+    
+    def get_monthly_totals(self, start, end, transaction_type=None):
+        """Aggregate transactions from the days [start, end) per month ('YYYY-MM') and type"""
+        session = self.Session()
+        
+        try:
+            month = func.strftime('%Y-%m', DailyTotal.day)
+            rows = self._rollup_query(session, start, end, transaction_type, month)\
+                .order_by(month)\
                 .all()
             
-            return [trans.to_dict() for trans in transactions]
+            return [tuple(row) for row in rows]
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+    
+    def _rollup_query(self, session, start, end, transaction_type, group):
+        """(group, type, total, count) over the chat's daily rollup rows in [start, end)"""
+        query = session.query(
+            group,
+            DailyTotal.type,
+            func.sum(DailyTotal.total).label('total_amount'),
+            func.sum(DailyTotal.count).label('transaction_count')
+        )\
+        .filter(DailyTotal.chat_id == self.chat_id, DailyTotal.day >= self._as_day(start))
+        
+        if end is not None:
+            query = query.filter(DailyTotal.day < self._as_day(end))
+        if transaction_type is not None:
+            query = query.filter(DailyTotal.type == transaction_type)
+        
+        return query.group_by(group, DailyTotal.type)
+    
+    def _as_day(self, value):
+        return value.date() if isinstance(value, datetime) else value
+    
+    def rebuild_rollups(self):
+        """Recompute the chat's daily rollup from the transactions table and the archive"""
+        with self.engine.begin() as conn:
+            rebuild_daily_totals(conn, self.chat_id)
+            archived_before = conn.execute(
+                select(Balance.archived_before).where(Balance.chat_id == self.chat_id)
+            ).scalar()
+            if archived_before is not None:
+                self._apply_rollup_deltas(conn, self._archived_daily_totals())
+            version = self._bump_data_version(conn)
+        self._committed_data_version(version)
+    
+    def _archived_daily_totals(self):
+        """Rollup deltas {(day, category, type): (total, count)} for the archived transactions"""
+        archive = self._archive_session()
+        
+        try:
+            day = func.date(Transaction.created_at)
+            rows = archive.query(
+                day,
+                Transaction.category,
+                Transaction.type,
+                func.sum(Transaction.amount),
+                func.count(Transaction.id)
+            )\
+            .filter(Transaction.chat_id == self.chat_id, Transaction.created_at.isnot(None))\
+            .group_by(day, Transaction.category, Transaction.type)\
+            .all()
+            
+            return {
+                (datetime.strptime(day_text, '%Y-%m-%d'), category, transaction_type): (total, count)
+                for day_text, category, transaction_type, total, count in rows
+            }
+        finally:
+            archive.close()
+    
+    def search_transactions(self, search_term, limit=20):
+        """Search transactions by category or description
+        
+        Uses the trigram full-text index (ranked by relevance) when it exists.
+        A trailing '*' (e.g. 'mak*') only matches words starting with the term.
+        Archived matches fill up the results when there are fewer than `limit`
+        other ones.
+        """
+        term = search_term.strip()
+        prefix = term.endswith('*')
+        term = term.rstrip('*').strip()
+        if not term:
+            return []
+        
+        session = self.Session()
+        
+        try:
+            transactions = [
+                trans.to_dict() for trans in self._search_query(session, term, prefix, self.has_search_index, limit)
+            ]
+            if len(transactions) < limit and self._archive_horizon(session) is not None:
+                archive = self._archive_session()
+                try:
+                    archived = self._search_query(
+                        archive, term, prefix, self.archive_has_search_index, limit - len(transactions)
+                    )
+                    transactions += self._archived_dicts(archived)
+                finally:
+                    archive.close()
+            return transactions
+        finally:
+            session.close()
+    
+    def _search_query(self, session, term, prefix, has_search_index, limit):
+        query = session.query(Transaction).filter(Transaction.chat_id == self.chat_id)
+        
+        # Trigrams need at least 3 characters; shorter terms use a LIKE scan
+        if has_search_index and len(term) >= 3:
+            match_query = '"' + term.replace('"', '""') + '"'
+            query = query\
+                .join(transactions_fts, transactions_fts.c.rowid == literal_column('transactions.rowid'))\
+                .filter(literal_column('transactions_fts').op('MATCH')(match_query))\
+                .order_by(transactions_fts.c.rank, Transaction.created_at.desc())
+        else:
+            # Use ILIKE for case-insensitive search and % for partial matches
+            search_pattern = f'%{self._escape_like(term)}%'
+            query = query\
+                .filter(
+                    (Transaction.category.ilike(search_pattern, escape='\\')) | 
+                    (Transaction.description.ilike(search_pattern, escape='\\'))
+                )\
+                .order_by(Transaction.created_at.desc())
+        
+        if prefix:
+            word_start = self._escape_like(term)
+            query = query.filter(
+                (Transaction.category.ilike(f'{word_start}%', escape='\\')) |
+                (Transaction.description.ilike(f'{word_start}%', escape='\\')) |
+                (Transaction.description.ilike(f'% {word_start}%', escape='\\'))
+            )
+        
+        return query.limit(limit).all()
+    
+    def _escape_like(self, term):
+        return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    
+    def rebuild_search_index(self):
+        """Create the full-text index if missing and repopulate it from the transactions table"""
+        with self.engine.begin() as conn:
+            if not fts5_trigram_available(conn):
+                raise RuntimeError("SQLite build does not support FTS5 with the trigram tokenizer")
+            create_search_index(conn)
+        self.has_search_index = True
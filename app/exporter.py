@@ -0,0 +1,70 @@
+"""
+Transaction export to compressed files
+
+Rows are streamed from DatabaseManager.iter_transactions straight into a
+gzip file, so memory use doesn't depend on the size of the chat. Two formats:
+
+- csv: header `id,date,category,description,amount,type`; the columns the
+  importer recognizes, so an export can be sent back to the bot as is.
+- jsonl: one JSON object per line with the same fields.
+
+Both write amounts as plain numbers (`150001`, or `1500.01` with minor units)
+and a missing date, category or description as an empty CSV field and as null
+in JSONL.
+"""
+import csv
+import gzip
+import json
+from decimal import Decimal
+from ..config import EXPORT_COMPRESS_LEVEL
+
+EXPORT_COLUMNS = ('id', 'date', 'category', 'description', 'amount', 'type')
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+def write_export(manager, path, export_format='csv'):
+    """Write all transactions of `manager`'s chat to a gzip file at `path`; returns the row count
+
+    Blocking: run it on the DB worker pool.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+    count = 0
+    rows = manager.iter_transactions()
+    try:
+        with gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=EXPORT_COMPRESS_LEVEL) as f:
+            if export_format == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(EXPORT_COLUMNS)
+                for row in rows:
+                    writer.writerow(_export_row(*row))
+                    count += 1
+            else:
+                for row in rows:
+                    f.write(json.dumps(dict(zip(EXPORT_COLUMNS, _export_row(*row))), ensure_ascii=False, default=_json_amount))
+                    f.write('\n')
+                    count += 1
+    finally:
+        rows.close()
+    return count
+
+def _export_row(transaction_id, created_at, category, description, amount, transaction_type):
+    # The csv writer turns None into an empty field
+    return (
+        transaction_id,
+        created_at.isoformat(sep=' ') if created_at else None,
+        category,
+        description,
+        amount,
+        transaction_type,
+    )
+
+def _json_amount(amount):
+    """Decimal amounts (currencies with minor units) as JSON numbers
+
+    Exact: amounts are at most MAX_AMOUNT_MINOR_UNITS, 15 significant digits,
+    which a float reproduces digit for digit.
+    """
+    if not isinstance(amount, Decimal):
+        raise TypeError(f"Object of type {type(amount).__name__} is not JSON serializable")
+    return float(amount)
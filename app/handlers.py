@@ -1,199 +1,248 @@
-import re
-from telegram import Update
-from telegram.ext import ContextTypes
-from tabulate import tabulate
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+import asyncio
 import os
-from .database import DatabaseManager
-from ..config import CURRENCY_SYMBOL, DEFAULT_TRANSACTION_TYPE
+import tempfile
+import time
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
+from datetime import datetime, timedelta
+from .async_database import get_async_database, run_in_db_thread
+from .database import amount_error
+from .exporter import EXPORT_FORMATS, write_export
+from .importer import iter_import_chunks
+from .parser import parse_amount, parse_line, parse_lines
+from .write_queue import write_queues
+from .charts import renderer as chart_renderer, chart_cache, render_pie_chart, ChartQueueFull
+from .cache import LRUCache
+from .metrics import metrics, handler_latency, handler_errors, db_query_latency
+from .registry import registry
+from .router import CommandRequest, CommandRouter
+from .updates import update_processor, release_chat_slot
+from ..config import (
+    CURRENCY_SYMBOL, HISTORY_PAGE_SIZE, ADMIN_USER_IDS, RESPONSE_CACHE_MAX_BYTES,
+    IMPORT_EXTENSIONS, IMPORT_MAX_FILE_BYTES, IMPORT_PROGRESS_INTERVAL, EXPORT_MAX_FILE_BYTES
+)
+
+def _response_size(response):
+    text, reply_markup = response
+    size = len(text.encode())
+    if reply_markup is not None:
+        size += sum(
+            len(button.text.encode()) + len((button.callback_data or '').encode())
+            for row in reply_markup.inline_keyboard for button in row
+        )
+    return size
+
+# Rendered (text, reply_markup) of read-only commands keyed by (chat_id, command,
+# data_version); every write bumps the chat's data version, so stale replies are
+# never looked up again and age out of the LRU
+response_cache = LRUCache(RESPONSE_CACHE_MAX_BYTES, sizeof=_response_size)
+
+response_cache_lookups = metrics.counter(
+    'fintrack_response_cache_lookups_total', 'Cached command reply lookups by outcome', ['command', 'outcome']
+)
+metrics.gauge('fintrack_response_cache_bytes', 'Bytes of cached command replies', func=lambda: response_cache.stats()['bytes'])
+
+# File imports running in the background, by chat id (at most one per chat)
+active_imports = {}
+
+# Unparsable lines listed in the import summary
+IMPORT_ERROR_SAMPLES = 10
 
 class MessageHandler:
     def __init__(self):
-        # New pattern: [category] [description] [sign][amount]
-        # Examples: "makan lunch +50k" or "gaji bulanan +2jt"
-        self.transaction_pattern = re.compile(r'^(\S+)\s+(.+?)\s+([+-]?)(\d+(?:[.,]\d+)*(?:\s*(?:k|rb|jt|m))?)$', re.IGNORECASE)
-        
-        # Fallback pattern for when description is optional
-        self.fallback_pattern = re.compile(r'^(\S+)\s+([+-]?)(\d+(?:[.,]\d+)*(?:\s*(?:k|rb|jt|m))?)$', re.IGNORECASE)
+        # One router for every chat: commands and their aliases, each wrapped
+        # once in the timing, error and database middleware
+        self.router = CommandRouter()
+        self.router.add('balance', self._show_balance, aliases=['balance', 'saldo'])
+        self.router.add('history', self._show_history, aliases=['history', 'riwayat'])
+        self.router.add('summary', self._show_summary, aliases=['summary', 'ringkasan'])
+        self.router.add('chart', self._show_chart, aliases=['chart'])
+        self.router.add('delete', self._delete_transaction)
+        self.router.add('category', self._show_category)
+        self.router.add('edit', self._edit_transaction)
+        self.router.add('search', self._search_transactions)
+        self.router.add('report', self._show_report)
+        self.router.add('export', self._export_transactions)
+        self.router.add('stats', self._show_stats, database=False)
+        # Everything else is read as transactions; most group chatter isn't one,
+        # so the chat's database is only opened once a line parses
+        self.router.set_default('message', self.handle_message, database=False)
     
-    async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process every message in the group"""
-        if not update.message or not update.message.text:
-            return
-        
-        message_text = update.message.text.strip()
-        chat_id = update.message.chat_id
-        
+    async def handle_message(self, request: CommandRequest):
+        """Record the transactions in a message that isn't a command"""
         # Check if message contains multiple transactions (multiple lines)
-        lines = message_text.split('\n')
+        lines = request.text.split('\n')
         
         if len(lines) > 1:
             # Process as multiple transactions
-            await self._process_multiple_transactions(update, context, lines, chat_id)
+            await self._process_multiple_transactions(request, lines)
         else:
-            # Process as single transaction or command
-            await self._process_single_transaction(update, context, message_text, chat_id)
+            # Process as single transaction
+            await self._process_single_transaction(request)
     
-    async def _process_multiple_transactions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, lines: list, chat_id: int):
+    async def handle_document(self, request: CommandRequest):
+        """Import transactions from an uploaded CSV or text file"""
+        update, chat_id = request.update, request.chat_id
+        document = update.message.document
+        
+        if not (document.file_name or '').lower().endswith(IMPORT_EXTENSIONS):
+            await update.message.reply_text(
+                "❌ Kirim file .csv atau .txt (boleh dikompres .gz) untuk import transaksi\n"
+                "CSV butuh header, misalnya: tanggal,kategori,deskripsi,jumlah"
+            )
+            return
+        if document.file_size and document.file_size > IMPORT_MAX_FILE_BYTES:
+            await update.message.reply_text(f"❌ File terlalu besar (maks {IMPORT_MAX_FILE_BYTES // (1024 * 1024)} MB)")
+            return
+        if chat_id in active_imports:
+            await update.message.reply_text("⏳ Import lain masih berjalan di chat ini, tunggu sampai selesai")
+            return
+        
+        status = await update.message.reply_text(f"📥 Mengunduh {document.file_name}...")
+        # Runs in the background: this chat's updates are handled in order, and
+        # a long import shouldn't hold up the messages sent after it
+        task = asyncio.create_task(self._run_import(document, status, chat_id))
+        active_imports[chat_id] = task
+        task.add_done_callback(lambda _: active_imports.pop(chat_id, None))
+    
+    async def _run_import(self, document, status, chat_id: int):
+        try:
+            with tempfile.TemporaryDirectory(prefix='fintrack-import-') as directory:
+                path = os.path.join(directory, 'upload')
+                telegram_file = await document.get_file()
+                await telegram_file.download_to_drive(path)
+                await self._import_file(path, status, chat_id)
+        except asyncio.CancelledError:
+            await self._edit_status(status, "⚠️ Import dihentikan; transaksi yang sudah tersimpan tetap ada")
+            raise
+        except Exception as e:
+            await self._edit_status(status, f"❌ Import gagal: {str(e)}")
+    
+    async def _import_file(self, path, status, chat_id: int):
+        """Parse and insert the file one chunk (one database transaction) at a time"""
+        db = await get_async_database(chat_id)
+        chunks = iter_import_chunks(path)
+        saved = 0
+        skipped = 0
+        samples = []
+        last_progress = time.monotonic()
+        
+        try:
+            while True:
+                # Reading and parsing the file is blocking work too
+                chunk = await run_in_db_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                transactions, errors = chunk
+                
+                if transactions:
+                    _, failures = await db.add_transactions_bulk(transactions)
+                    saved += len(transactions) - len(failures)
+                    errors += [(transactions[index]['line'], message) for index, message in failures]
+                
+                skipped += len(errors)
+                samples.extend(sorted(errors)[:IMPORT_ERROR_SAMPLES - len(samples)])
+                
+                if time.monotonic() - last_progress >= IMPORT_PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    await self._edit_status(status, f"📥 Mengimpor... {saved:,} tersimpan, {skipped:,} dilewati")
+        finally:
+            await run_in_db_thread(chunks.close)
+        
+        balance = await db.get_balance()
+        response = f"✅ Import selesai: {saved:,} transaksi tersimpan"
+        if skipped:
+            response += f", {skipped:,} baris dilewati"
+        response += f"\n💳 Saldo: {CURRENCY_SYMBOL} {balance:+,.0f}"
+        if samples:
+            response += "\n\n⚠️ Baris yang dilewati:\n"
+            response += "\n".join(f"Baris {line}: {message}" for line, message in samples)
+            if skipped > len(samples):
+                response += f"\n... dan {skipped - len(samples):,} lainnya"
+        await self._edit_status(status, response)
+    
+    async def _edit_status(self, status, text):
+        try:
+            await status.edit_text(text)
+        except TelegramError:
+            # e.g. the status message was deleted; the import itself is unaffected
+            pass
+    
+    async def _process_multiple_transactions(self, request: CommandRequest, lines: list):
         """Process multiple transactions in a single message"""
-        transactions = []
+        update = request.update
+        transactions, unparsed = parse_lines(lines)
         errors = []
         
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:  # Skip empty lines
-                continue
-                
-            # Try to parse the line as a transaction
-            transaction_data = self._parse_transaction_line(line)
-            
-            if transaction_data:
-                try:
-                    transactions.append({
-                        'category': transaction_data['category'],
-                        'description': transaction_data['description'],
-                        'amount': transaction_data['amount'],
-                        'type': transaction_data['type'],
-                        'line': line_num
-                    })
-                except Exception as e:
-                    errors.append(f"Line {line_num}: Error - {str(e)}")
-            else:
-                # Check if it's a command instead of transaction
-                if await self._process_command(update, context, line, chat_id):
-                    return  # If it's a command, stop processing transactions
-                else:
-                    errors.append(f"Line {line_num}: Format transaksi tidak dikenali: {line}")
+        for error in unparsed:
+            # Check if it's a command instead of transaction
+            if await self.router.dispatch(update, request.context, error['text'].strip()):
+                return  # If it's a command, stop processing transactions
+            errors.append(f"Line {error['line']}: Format transaksi tidak dikenali: {error['text']}")
         
         # Process all valid transactions
         if transactions:
-            await self._save_transactions(update, context, chat_id, transactions, errors)
+            await self._save_transactions(request, transactions, errors)
         else:
             # No valid transactions found
             if errors:
                 error_response = "❌ Tidak ada transaksi yang valid:\n\n" + "\n".join(errors[:10])
                 await update.message.reply_text(error_response)
     
-    def _parse_transaction_line(self, line: str):
-        """Parse a single transaction line in the format [category] [description] [sign][amount]"""
-        # Try the main pattern first: category description sign amount
-        match = self.transaction_pattern.match(line)
-        if match:
-            category = match.group(1).lower()
-            description = match.group(2).strip()
-            sign = match.group(3)
-            amount_str = match.group(4).strip()
-        else:
-            # Try fallback pattern: category sign amount (no description)
-            match = self.fallback_pattern.match(line)
-            if match:
-                category = match.group(1).lower()
-                description = ""
-                sign = match.group(2)
-                amount_str = match.group(3).strip()
-            else:
-                return None
-        
-        try:
-            amount = self._parse_amount(amount_str)
-            transaction_type = 'income' if sign == '+' else DEFAULT_TRANSACTION_TYPE
-            
-            return {
-                'category': category,
-                'description': description,
-                'amount': amount,
-                'type': transaction_type,
-                'sign': sign
-            }
-        except ValueError as e:
-            print(f"DEBUG: Error parsing amount '{amount_str}': {e}")
-            return None
-    
-    async def _process_single_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str, chat_id: int):
-        """Process single transaction or command"""
-        # Check if it's a command first
-        if await self._process_command(update, context, message_text, chat_id):
-            return
-        
-        # Try to parse as transaction
-        transaction_data = self._parse_transaction_line(message_text)
+    async def _process_single_transaction(self, request: CommandRequest):
+        """Process single transaction"""
+        transaction_data = parse_line(request.text)
         if transaction_data:
-            print(f"DEBUG: Parsed transaction - Category: {transaction_data['category']}, Amount: {transaction_data['amount']}")
-            await self._save_single_transaction(update, context, chat_id, transaction_data)
+            await self._save_single_transaction(request, transaction_data)
         else:
-            print(f"DEBUG: Failed to parse: '{message_text}'")
-            await update.message.reply_text("❌ Format transaksi tidak dikenali. Gunakan: [kategori] [deskripsi] [+-][jumlah]")
-    
-    async def _process_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str, chat_id: int):
-        """Process commands and return True if it's a command"""
-        message_lower = message_text.lower()
-        
-        if message_lower in ['/balance', 'balance', 'saldo']:
-            await self._show_balance(update, context, chat_id)
-            return True
-        elif message_lower in ['/history', 'history', 'riwayat']:
-            await self._show_history(update, context, chat_id)
-            return True
-        elif message_lower.startswith('/delete'):
-            await self._delete_transaction(update, context, chat_id)
-            return True
-        elif message_lower in ['/summary', 'summary', 'ringkasan']:
-            await self._show_summary(update, context, chat_id)
-            return True
-        elif message_lower.startswith('/category'):
-            await self._show_category(update, context, chat_id)
-            return True
-        elif message_lower.startswith('/edit'):
-            await self._edit_transaction(update, context, chat_id)
-            return True
-        elif message_lower.startswith('/search'):
-            await self._search_transactions(update, context, chat_id)
-            return True
-        elif message_lower in ['/chart', 'chart']:
-            await self._show_chart(update, context, chat_id)
-            return True
-        
-        return False
+            await request.update.message.reply_text("❌ Format transaksi tidak dikenali. Gunakan: [kategori] [deskripsi] [+-][jumlah]")
     
-    async def _save_single_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int, transaction_data: dict):
+    async def _save_single_transaction(self, request: CommandRequest, transaction_data: dict):
         """Save a single transaction"""
+        update = request.update
         try:
-            db = DatabaseManager(chat_id)
-            transaction_id = db.add_transaction(
-                amount=transaction_data['amount'],
-                transaction_type=transaction_data['type'],
-                category=transaction_data['category'],
-                description=transaction_data['description'],
-                message_id=update.message.message_id
-            )
+            # Goes through the chat's write queue so bursts share one commit
+            future = write_queues.enqueue(request.chat_id, {
+                'amount': transaction_data['amount'],
+                'type': transaction_data['type'],
+                'category': transaction_data['category'],
+                'description': transaction_data['description']
+            }, message_id=update.message.message_id)
+            # The queue keeps the chat's order from here, so its next messages
+            # can be handled (and queued into the same commit) meanwhile
+            release_chat_slot()
+            transaction_id = await future
             
-            balance = db.get_balance()
+            db = await get_async_database(request.chat_id)
+            balance = await db.get_balance()
             await self._send_transaction_confirmation(update, transaction_id, transaction_data, balance)
             
         except Exception as e:
             await update.message.reply_text(f"❌ Error menyimpan transaksi: {str(e)}")
     
-    async def _save_transactions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int, transactions: list, errors: list):
+    async def _save_transactions(self, request: CommandRequest, transactions: list, errors: list):
         """Save multiple transactions"""
-        db = DatabaseManager(chat_id)
+        update = request.update
+        db = await get_async_database(request.chat_id)
         successful_transactions = []
         failed_transactions = []
         
-        for transaction in transactions:
-            try:
-                transaction_id = db.add_transaction(
-                    amount=transaction['amount'],
-                    transaction_type=transaction['type'],
-                    category=transaction['category'],
-                    description=transaction['description'],
-                    message_id=update.message.message_id
-                )
-                successful_transactions.append(transaction)
-            except Exception as e:
-                failed_transactions.append(f"Line {transaction['line']}: {str(e)}")
+        try:
+            # Single-line transactions queued before this message commit first
+            await write_queues.flush(request.chat_id)
+            _, failures = await db.add_transactions_bulk(transactions, message_id=update.message.message_id)
+            
+            failed_indexes = set()
+            for index, error in failures:
+                failed_indexes.add(index)
+                failed_transactions.append(f"Line {transactions[index]['line']}: {error}")
+            successful_transactions = [
+                transaction for index, transaction in enumerate(transactions) if index not in failed_indexes
+            ]
+        except Exception as e:
+            failed_transactions = [f"Line {transaction['line']}: {str(e)}" for transaction in transactions]
         
-        balance = db.get_balance()
+        balance = await db.get_balance()
         
         # Prepare response
         response = f"📊 Multiple transactions processed!\n\n"
@@ -232,9 +281,10 @@ class MessageHandler:
         
         await update.message.reply_text(response)
     
-    async def _edit_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    async def _edit_transaction(self, request: CommandRequest):
         """Edit an existing transaction"""
-        message_text = update.message.text.strip()
+        update, db = request.update, request.db
+        message_text = request.text.strip()
         parts = message_text.split()
         
         if len(parts) < 3:
@@ -260,22 +310,27 @@ class MessageHandler:
             field = parts[2].lower()
             value = ' '.join(parts[3:]) if len(parts) > 3 else ""
             
-            db = DatabaseManager(chat_id)
-            
             # Get current transaction for validation
-            current_transaction = db.get_transaction_by_id(transaction_id)
+            current_transaction = await db.get_transaction_by_id(transaction_id)
             if not current_transaction:
                 await update.message.reply_text(f"❌ Transaksi dengan ID {transaction_id} tidak ditemukan")
                 return
+            if current_transaction.get('archived'):
+                await update.message.reply_text(f"🗄️ Transaksi {transaction_id} sudah diarsipkan dan tidak bisa diubah")
+                return
             
             update_data = {}
             
             if field == 'amount':
                 try:
-                    amount = self._parse_amount(value)
+                    amount = parse_amount(value)
                     if amount <= 0:
                         await update.message.reply_text("❌ Jumlah harus positif")
                         return
+                    error = amount_error(amount)
+                    if error:
+                        await update.message.reply_text(f"❌ {error}")
+                        return
                     update_data['amount'] = amount
                 except ValueError:
                     await update.message.reply_text(f"❌ Format jumlah tidak valid: {value}")
@@ -303,15 +358,15 @@ class MessageHandler:
                 return
             
             # Update the transaction
-            success = db.update_transaction(
+            success = await db.update_transaction(
                 transaction_id=transaction_id,
                 **update_data
             )
             
             if success:
                 # Get updated transaction and balance
-                updated_transaction = db.get_transaction_by_id(transaction_id)
-                balance = db.get_balance()
+                updated_transaction = await db.get_transaction_by_id(transaction_id)
+                balance = await db.get_balance()
                 
                 response = f"✅ Transaksi {transaction_id} berhasil diupdate!\n\n"
                 response += f"📊 **Detail Transaksi:**\n"
@@ -331,69 +386,80 @@ class MessageHandler:
         except Exception as e:
             await update.message.reply_text(f"❌ Error mengedit transaksi: {str(e)}")
 
-    def _parse_amount(self, amount_str):
-        """Parse amount string with Indonesian abbreviations"""
-        amount_str_clean = amount_str.lower().strip()
-        
-        # Remove spaces for better parsing
-        amount_str_clean = amount_str_clean.replace(' ', '')
-        
-        # Handle different suffixes and their multipliers
-        multiplier = 1
-        suffix = None
-        
-        # Check for suffixes in order (longer first to avoid partial matches)
-        if amount_str_clean.endswith('jt'):
-            multiplier = 1000000
-            suffix = 'jt'
-        elif amount_str_clean.endswith('rb'):
-            multiplier = 1000
-            suffix = 'rb'
-        elif amount_str_clean.endswith('k'):
-            multiplier = 1000
-            suffix = 'k'
-        elif amount_str_clean.endswith('m'):
-            multiplier = 1000000
-            suffix = 'm'
-        
-        # Remove the suffix if found
-        if suffix:
-            amount_str_clean = amount_str_clean[:-len(suffix)]
-        
-        # Replace comma with dot for decimal parsing, but remove dots used as thousand separators
-        # First, check if it's a decimal number with comma
-        if ',' in amount_str_clean and '.' not in amount_str_clean:
-            # Comma is decimal separator (European format)
-            amount_str_clean = amount_str_clean.replace(',', '.')
-        else:
-            # Comma and dot are thousand separators, remove them
-            amount_str_clean = amount_str_clean.replace('.', '').replace(',', '')
-        
-        try:
-            amount = float(amount_str_clean) * multiplier
-            # Convert to integer since IDR doesn't use decimals
-            return int(amount)
-        except ValueError as e:
-            raise ValueError(f"Tidak bisa parse jumlah: '{amount_str}' (cleaned: '{amount_str_clean}')")
+    async def _reply_cached(self, request: CommandRequest, build):
+        """Reply with a read-only command's response, rebuilding it only after the chat changed
+        
+        `build(db)` is a coroutine function returning (text, reply_markup); the
+        route's name is the command the response is cached under.
+        """
+        db, command = request.db, request.route.name
+        # Read the version before querying: a write racing the query can only
+        # leave its newer data under an older key, which is never asked for again
+        cache_key = (request.chat_id, command, db.data_version)
+        response = response_cache.get(cache_key)
+        response_cache_lookups.inc(command=command, outcome='miss' if response is None else 'hit')
+        if response is None:
+            response = await build(db)
+            response_cache.set(cache_key, response)
+        
+        text, reply_markup = response
+        await request.update.message.reply_text(text, reply_markup=reply_markup)
     
-    async def _show_balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    async def _show_balance(self, request: CommandRequest):
         """Show current balance in IDR"""
-        db = DatabaseManager(chat_id)
-        balance = db.get_balance()
-        
-        response = f"💳 Saldo saat ini: {CURRENCY_SYMBOL} {balance:+,.0f}"
-        await update.message.reply_text(response)
+        await self._reply_cached(request, self._build_balance)
     
-    async def _show_history(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    async def _build_balance(self, db):
+        balance = await db.get_balance()
+        return f"💳 Saldo saat ini: {CURRENCY_SYMBOL} {balance:+,.0f}", None
+    
+    async def _show_history(self, request: CommandRequest):
         """Show recent transactions"""
-        db = DatabaseManager(chat_id)
-        transactions = db.get_transactions(limit=5)
+        await self._reply_cached(request, self._build_history)
+    
+    async def _build_history(self, db):
+        page = await db.get_transactions_page(limit=HISTORY_PAGE_SIZE)
         
-        if not transactions:
-            await update.message.reply_text("📝 Belum ada transaksi yang dicatat")
+        if not page['transactions']:
+            return "📝 Belum ada transaksi yang dicatat", None
+        
+        balance = await db.get_balance()
+        return self._format_history_page(page, balance, title="📋 Transaksi terbaru:")
+    
+    async def handle_history_callback(self, request: CommandRequest):
+        """Load the older/newer /history page for an inline button press"""
+        query = request.update.callback_query
+        
+        try:
+            # hist:<direction>:<created_at isoformat>:<id> (the timestamp contains colons)
+            _, direction, cursor_data = query.data.split(':', 2)
+            created_at, transaction_id = cursor_data.rsplit(':', 1)
+            cursor = (datetime.fromisoformat(created_at), int(transaction_id))
+        except ValueError:
+            await query.answer("❌ Tombol tidak valid")
+            return
+        
+        db = request.db
+        if direction == 'older':
+            page = await db.get_transactions_page(limit=HISTORY_PAGE_SIZE, before=cursor)
+        else:
+            page = await db.get_transactions_page(limit=HISTORY_PAGE_SIZE, after=cursor)
+        
+        if not page['transactions']:
+            await query.answer("📝 Tidak ada transaksi lagi")
             return
         
-        response = "📋 Transaksi terbaru:\n\n"
+        balance = await db.get_balance()
+        response, keyboard = self._format_history_page(page, balance, title="📋 Riwayat transaksi:")
+        
+        await query.answer()
+        await query.edit_message_text(response, reply_markup=keyboard)
+    
+    def _format_history_page(self, page: dict, balance: float, title: str):
+        """Format a page of transactions plus the newer/older navigation buttons"""
+        transactions = page['transactions']
+        
+        response = f"{title}\n\n"
         for trans in transactions:
             sign = "+" if trans['type'] == 'income' else "-"
             type_emoji = "💰" if trans['type'] == 'income' else "💸"
@@ -403,14 +469,30 @@ class MessageHandler:
                 response += f"   📝 {trans['description']}\n"
             response += f"   ⏰ {trans['created_at'].strftime('%d/%m/%Y %H:%M')}\n\n"
         
-        balance = db.get_balance()
         response += f"💳 Saldo total: {CURRENCY_SYMBOL} {balance:+,.0f}"
         
-        await update.message.reply_text(response)
+        # Buttons carry the (created_at, id) cursor of the page edge they continue from
+        buttons = []
+        if page['has_newer']:
+            first = transactions[0]
+            buttons.append(InlineKeyboardButton(
+                "⬅️ Lebih baru",
+                callback_data=f"hist:newer:{first['created_at'].isoformat()}:{first['id']}"
+            ))
+        if page['has_older']:
+            last = transactions[-1]
+            buttons.append(InlineKeyboardButton(
+                "Lebih lama ➡️",
+                callback_data=f"hist:older:{last['created_at'].isoformat()}:{last['id']}"
+            ))
+        
+        keyboard = InlineKeyboardMarkup([buttons]) if buttons else None
+        return response, keyboard
     
-    async def _delete_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    async def _delete_transaction(self, request: CommandRequest):
         """Delete a transaction by ID"""
-        message_text = update.message.text.strip()
+        update, db = request.update, request.db
+        message_text = request.text.strip()
         parts = message_text.split()
         
         if len(parts) != 2:
@@ -419,16 +501,18 @@ class MessageHandler:
         
         try:
             transaction_id = int(parts[1])
-            db = DatabaseManager(chat_id)
             
             # Get transaction details before deleting
-            transaction = db.get_transaction_by_id(transaction_id)
+            transaction = await db.get_transaction_by_id(transaction_id)
             if not transaction:
                 await update.message.reply_text("❌ Transaksi tidak ditemukan")
                 return
+            if transaction.get('archived'):
+                await update.message.reply_text(f"🗄️ Transaksi {transaction_id} sudah diarsipkan dan tidak bisa dihapus")
+                return
             
-            if db.delete_transaction(transaction_id):
-                balance = db.get_balance()
+            if await db.delete_transaction(transaction_id):
+                balance = await db.get_balance()
                 type_text = "Pemasukan" if transaction['type'] == 'income' else "Pengeluaran"
                 await update.message.reply_text(
                     f"✅ Transaksi {transaction_id} ({type_text}) dihapus\n"
@@ -440,14 +524,15 @@ class MessageHandler:
         except ValueError:
             await update.message.reply_text("❌ ID transaksi tidak valid")
     
-    async def _show_summary(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    async def _show_summary(self, request: CommandRequest):
         """Show category summary"""
-        db = DatabaseManager(chat_id)
-        summary = db.get_category_summary()
+        await self._reply_cached(request, self._build_summary)
+    
+    async def _build_summary(self, db):
+        summary = await db.get_category_summary()
         
         if not summary:
-            await update.message.reply_text("📊 Belum ada data transaksi untuk ringkasan")
-            return
+            return "📊 Belum ada data transaksi untuk ringkasan", None
         
         response = "📊 Ringkasan per Kategori:\n\n"
         
@@ -466,14 +551,15 @@ class MessageHandler:
             for category, amount in expense_data:
                 response += f"  🏷️ {category}: {CURRENCY_SYMBOL} {amount:,.0f}\n"
         
-        balance = db.get_balance()
+        balance = await db.get_balance()
         response += f"\n💳 Saldo total: {CURRENCY_SYMBOL} {balance:+,.0f}"
         
-        await update.message.reply_text(response)
+        return response, None
     
-    async def _show_category(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    async def _show_category(self, request: CommandRequest):
         """Show transactions for a specific category"""
-        message_text = update.message.text.strip()
+        update, db = request.update, request.db
+        message_text = request.text.strip()
         parts = message_text.split(maxsplit=1)
         
         if len(parts) < 2:
@@ -481,8 +567,7 @@ class MessageHandler:
             return
         
         category = parts[1].lower()
-        db = DatabaseManager(chat_id)
-        transactions = db.get_transactions_by_category(category, limit=5)
+        transactions = await db.get_transactions_by_category(category, limit=5)
         
         if not transactions:
             await update.message.reply_text(f"📝 Tidak ada transaksi untuk kategori '{category}'")
@@ -499,9 +584,10 @@ class MessageHandler:
         
         await update.message.reply_text(response)
 
-    async def _search_transactions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+    async def _search_transactions(self, request: CommandRequest):
         """Search transactions by category or description"""
-        message_text = update.message.text.strip()
+        update, db = request.update, request.db
+        message_text = request.text.strip()
         parts = message_text.split(maxsplit=1)
         
         if len(parts) < 2:
@@ -512,8 +598,9 @@ class MessageHandler:
                 "**Contoh:**\n"
                 "`/search makan` - Cari 'makan' di kategori atau deskripsi\n"
                 "`/search gaji` - Cari 'gaji'\n"
-                "`/search siang` - Cari 'siang' di deskripsi\n\n"
-                "Pencarian bersifat case-insensitive dan partial match."
+                "`/search siang` - Cari 'siang' di deskripsi\n"
+                "`/search mak*` - Cari kata yang diawali 'mak'\n\n"
+                "Pencarian bersifat case-insensitive dan partial match, hasil paling relevan di atas."
             )
             return
         
@@ -524,8 +611,7 @@ class MessageHandler:
             return
         
         try:
-            db = DatabaseManager(chat_id)
-            transactions = db.search_transactions(search_term, limit=15)
+            transactions = await db.search_transactions(search_term, limit=15)
             
             if not transactions:
                 await update.message.reply_text(
@@ -542,6 +628,9 @@ class MessageHandler:
 
     def _format_search_results(self, transactions, search_term):
         """Format search results as a properly aligned table using tabulate"""
+        # Only /search needs tabulate, so don't load it at startup
+        from tabulate import tabulate
+        
         response = f"🔍 **Hasil Pencarian: '{search_term}'**\n\n"
         
         # Prepare data for tabulate
@@ -590,42 +679,73 @@ class MessageHandler:
         
         return response
     
-    # Add this method to your MessageHandler class
-    async def _show_chart(self, update: Update, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-        """Simple chart command - just show expenses for current month"""
+    def _parse_chart_period(self, message_text: str):
+        """Parse the /chart argument into (start, end, label, cache window)
+        
+        No argument means the last 30 days, a number N the last N days (end is
+        None, i.e. up to now) and YYYY-MM a calendar month. Returns None for
+        anything else.
+        """
+        parts = message_text.split()
+        argument = parts[1] if len(parts) > 1 else '30'
+        now = datetime.utcnow()
+        
+        if argument.isdigit():
+            days = int(argument)
+            if not 1 <= days <= 3650:
+                return None
+            start = now - timedelta(days=days)
+            label = f"{days} Hari Terakhir"
+            # Rolling windows move every day, so the day is part of the cache key;
+            # a UTC day, like created_at and the daily rollups the chart is built from
+            return start, None, label, (f'{days}d', now.date().isoformat())
+        
         try:
-            await update.message.reply_text("🔄 Membuat grafik sederhana...")
+            start = datetime.strptime(argument, '%Y-%m')
+        except ValueError:
+            return None
+        
+        end = (start + timedelta(days=32)).replace(day=1)
+        label = start.strftime('%B %Y')
+        return start, end, label, (argument, None)
+    
+    async def _show_chart(self, request: CommandRequest):
+        """Chart command - expenses per category for the last N days or a given month"""
+        update, chat_id, db = request.update, request.chat_id, request.db
+        try:
+            period = self._parse_chart_period(request.text.strip())
+            if period is None:
+                await update.message.reply_text(
+                    "❌ Cara pakai: /chart [jumlah_hari | YYYY-MM]\n"
+                    "Contoh: `/chart`, `/chart 90`, `/chart 2026-09`"
+                )
+                return
+            start, end, label, window = period
             
-            # Get current month expenses
-            db = DatabaseManager(chat_id)
-            all_transactions = db.get_transactions(limit=1000)
+            # Same chat, same window and no changes since the last render: reuse it
+            cache_key = (chat_id, *window, db.data_version)
+            cached = chart_cache.get(cache_key)
+            if cached:
+                png, caption = cached
+                await update.message.reply_photo(photo=png, caption=caption)
+                return
             
-            thirty_days_ago = datetime.now() - timedelta(days=30)
+            await update.message.reply_text("🔄 Membuat grafik sederhana...")
             
-            expenses = []
-            total_amount = 0
-            for trans in all_transactions:
-                if trans['type'] != 'expense':
-                    continue
-                    
-                trans_date = trans['created_at']
-                if isinstance(trans_date, str):
-                    # Parse the date string
-                    trans_date = datetime.strptime(trans_date, '%Y-%m-%d %H:%M:%S')
-                
-                if trans_date >= thirty_days_ago: #trans_date.month == current_month and trans_date.year == current_year:
-                    expenses.append(trans)
-                    total_amount += trans['amount']
+            # Totals per category computed by SQLite over the whole window
+            totals = await db.get_category_totals(start, end, transaction_type='expense')
             
-            if not expenses:
-                await update.message.reply_text("❌ Tidak ada data pengeluaran dalam 30 hari terakhir")
+            if not totals:
+                await update.message.reply_text(f"❌ Tidak ada data pengeluaran untuk periode {label}")
                 return
             
-            # Simple data grouping
+            # Transactions without a category are shown together
             category_totals = {}
-            for exp in expenses:
-                category = exp['category'] or 'Lainnya'
-                category_totals[category] = category_totals.get(category, 0) + exp['amount']
+            total_amount = 0
+            for category, _, amount, _ in totals:
+                category = category or 'Lainnya'
+                category_totals[category] = category_totals.get(category, 0) + amount
+                total_amount += amount
             
             # Create pie chart with amount labels
             labels = []
@@ -639,54 +759,186 @@ class MessageHandler:
                 formatted_amount = self._format_amount_idr(amount)
                 text_labels.append(f"{percentage:.1f}%\n({formatted_amount})")
             
-            fig = go.Figure(data=[go.Pie(
-                labels=labels, 
-                values=values,
-                text=text_labels,
-                textinfo='text',
-                textposition='inside',
-                hole=0.4,  # Makes it a donut chart
-                marker=dict(colors=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7'])
-            )])
-        
             # Format total amount for title
             total_formatted = self._format_amount_idr(total_amount)
+            title = f'📊 Pengeluaran {label}<br>Total: Rp {total_amount:,} ({total_formatted})'
             
-            fig.update_layout(
-                title={
-                    'text': f'📊 Pengeluaran 30 Hari Terakhir<br>Total: Rp {total_amount:,} ({total_formatted})',
-                    'x': 0.5,
-                    'xanchor': 'center',
-                    'font': {'size': 16}
-                },
-                showlegend=True,
-                legend=dict(
-                    orientation="v",
-                    yanchor="top", 
-                    y=1,
-                    xanchor="left",
-                    x=1.1
-                ),
-                width=800,
-                height=600,
-                margin=dict(t=100, b=50, l=50, r=150)
-            )
-            
-            # Save and send
-            os.makedirs('temp_charts', exist_ok=True)
-            filename = f"temp_charts/chart_{chat_id}.png"
-            fig.write_image(filename)
+            # Render off the event loop; the PNG comes back in memory
+            png = await chart_renderer.render(render_pie_chart, labels, values, text_labels, title)
             
-            with open(filename, 'rb') as photo:
-                await update.message.reply_photo(photo=photo, 
-                      caption=f"📊 Pengeluaran {thirty_days_ago.strftime('%d %b %Y')} - sekarang\nTotal: Rp {total_amount:,} ({total_formatted})")
+            if window[1] is not None:
+                period_text = f"{start.strftime('%d %b %Y')} - sekarang"
+            else:
+                period_text = label
+            caption = f"📊 Pengeluaran {period_text}\nTotal: Rp {total_amount:,} ({total_formatted})"
+            chart_cache.set(cache_key, (png, caption))
             
-            # Clean up
-            os.remove(filename)
+            await update.message.reply_photo(photo=png, caption=caption)
             
+        except ChartQueueFull:
+            await update.message.reply_text("⏳ Terlalu banyak grafik sedang dibuat, coba lagi sebentar lagi")
+        except asyncio.TimeoutError:
+            await update.message.reply_text("❌ Waktu membuat grafik habis, coba lagi nanti")
         except Exception as e:
             await update.message.reply_text(f"❌ Error membuat grafik: {str(e)}")
 
+    def _parse_report_period(self, message_text: str):
+        """Parse the /report argument into (start, end, label, yearly)
+        
+        No argument means the current month, YYYY-MM a month and YYYY a whole
+        year. `end` is exclusive. Returns None for anything else.
+        """
+        parts = message_text.split()
+        argument = parts[1] if len(parts) > 1 else datetime.utcnow().strftime('%Y-%m')
+        
+        try:
+            if len(argument) == 4:
+                start = datetime.strptime(argument, '%Y').date()
+                return start, start.replace(year=start.year + 1), f"Tahun {start.year}", True
+            start = datetime.strptime(argument, '%Y-%m').date()
+        except ValueError:
+            return None
+        
+        end = (start + timedelta(days=32)).replace(day=1)
+        return start, end, start.strftime('%B %Y'), False
+    
+    async def _show_report(self, request: CommandRequest):
+        """Income and expenses of a month or year, per category (and per month for a year)"""
+        update, db = request.update, request.db
+        period = self._parse_report_period(request.text.strip())
+        if period is None:
+            await update.message.reply_text(
+                "❌ Cara pakai: /report [YYYY-MM | YYYY]\n"
+                "Contoh: `/report`, `/report 2026-09`, `/report 2026`"
+            )
+            return
+        start, end, label, yearly = period
+        
+        totals = await db.get_category_totals(start, end)
+        
+        if not totals:
+            await update.message.reply_text(f"📑 Tidak ada transaksi untuk periode {label}")
+            return
+        
+        income = sum(total for _, type_, total, _ in totals if type_ == 'income')
+        expense = sum(total for _, type_, total, _ in totals if type_ == 'expense')
+        income_count = sum(count for _, type_, _, count in totals if type_ == 'income')
+        expense_count = sum(count for _, type_, _, count in totals if type_ == 'expense')
+        
+        response = f"📑 Laporan {label}\n\n"
+        response += f"💰 Pemasukan: {CURRENCY_SYMBOL} {income:,.0f} ({income_count} transaksi)\n"
+        response += f"💸 Pengeluaran: {CURRENCY_SYMBOL} {expense:,.0f} ({expense_count} transaksi)\n"
+        response += f"💳 Selisih: {CURRENCY_SYMBOL} {income - expense:+,.0f}\n"
+        
+        if yearly:
+            months = {}
+            for month, type_, total, _ in await db.get_monthly_totals(start, end):
+                months.setdefault(month, {'income': 0, 'expense': 0})[type_] = total
+            response += "\n📅 Per bulan:\n"
+            for month, month_totals in months.items():
+                response += (f"  {month}: +{self._format_amount_idr(month_totals['income'])} / "
+                             f"-{self._format_amount_idr(month_totals['expense'])}\n")
+        
+        for transaction_type, title, period_total in (('expense', "💸 Pengeluaran per kategori:", expense),
+                                                      ('income', "💰 Pemasukan per kategori:", income)):
+            rows = [(category, total) for category, type_, total, _ in totals if type_ == transaction_type]
+            if not rows:
+                continue
+            response += f"\n{title}\n"
+            # Already sorted by total, largest first
+            for category, total in rows:
+                share = total / period_total * 100 if period_total else 0
+                response += f"  🏷️ {category or 'Lainnya'}: {CURRENCY_SYMBOL} {total:,.0f} ({share:.1f}%)\n"
+        
+        await update.message.reply_text(response)
+    
+    async def _export_transactions(self, request: CommandRequest):
+        """Send the chat's whole transaction history as a gzip-compressed CSV or JSON Lines file"""
+        update, db = request.update, request.db
+        parts = request.text.split()
+        export_format = parts[1].lower() if len(parts) > 1 else 'csv'
+        if export_format not in EXPORT_FORMATS:
+            await update.message.reply_text(
+                "❌ Cara pakai: /export [csv | jsonl]\n"
+                "Contoh: `/export`, `/export jsonl`"
+            )
+            return
+        
+        try:
+            file_name = f"fintrack-{datetime.utcnow():%Y%m%d}.{export_format}.gz"
+            with tempfile.TemporaryDirectory(prefix='fintrack-export-') as directory:
+                path = os.path.join(directory, file_name)
+                # Streams rows into the file on the DB pool; the event loop stays free meanwhile
+                count = await run_in_db_thread(write_export, db.manager, path, export_format)
+                if not count:
+                    await update.message.reply_text("📤 Belum ada transaksi untuk diekspor")
+                    return
+                
+                size = os.path.getsize(path)
+                if size > EXPORT_MAX_FILE_BYTES:
+                    await update.message.reply_text(
+                        f"❌ File ekspor terlalu besar ({size / (1024 * 1024):.0f} MB, "
+                        f"maks {EXPORT_MAX_FILE_BYTES // (1024 * 1024)} MB)"
+                    )
+                    return
+                
+                with open(path, 'rb') as f:
+                    await update.message.reply_document(
+                        document=f, filename=file_name,
+                        caption=f"📤 {count:,} transaksi ({export_format.upper()}, gzip)"
+                    )
+        except Exception as e:
+            await update.message.reply_text(f"❌ Error ekspor: {str(e)}")
+    
+    async def _show_stats(self, request: CommandRequest):
+        """Admin-only runtime statistics: handler latency, SQL timing, queues and caches"""
+        update = request.update
+        user = update.effective_user
+        if user is None or user.id not in ADMIN_USER_IDS:
+            await update.message.reply_text("❌ Perintah ini hanya untuk admin")
+            return
+        
+        response = "📈 **Statistik FinTrack**\n\n"
+        
+        response += "⏱️ **Latensi handler:**\n"
+        for labels in handler_latency.label_sets():
+            snapshot = handler_latency.snapshot(**labels)
+            errors = handler_errors.value(**labels)
+            response += f"• {labels['handler']}: {snapshot['count']}x, rata-rata {snapshot['avg'] * 1000:.1f} ms, "
+            response += f"p95 ≤ {snapshot['p95'] * 1000:.0f} ms"
+            response += f", {errors} error\n" if errors else "\n"
+        
+        response += "\n🗄️ **Query database:**\n"
+        for labels in db_query_latency.label_sets():
+            snapshot = db_query_latency.snapshot(**labels)
+            response += f"• {labels['statement']}: {snapshot['count']}x, rata-rata {snapshot['avg'] * 1000:.2f} ms\n"
+        
+        databases = registry.stats()
+        writes = write_queues.stats()
+        charts = chart_renderer.stats()
+        cache = chart_cache.stats()
+        response += f"\n💾 Database chat terbuka: {databases['open']}/{databases['max_size']} "
+        response += f"({databases['evictions']} ditutup)\n"
+        updates = update_processor.stats()
+        response += f"⚙️ Update: {updates['running']}/{updates['workers']} diproses, "
+        response += f"{updates['in_flight']} diterima, {updates['chats']} chat aktif\n"
+        response += f"📝 Antrian tulis: {writes['pending']} menunggu, {writes['batches']} commit, "
+        response += f"rata-rata {writes['avg_batch_size']:.1f} transaksi/commit\n"
+        response += f"📊 Grafik: {charts['pending']} antri, {charts['rendered']} dibuat, {charts['failed']} gagal, "
+        response += f"{charts['timed_out']} timeout, {charts['rejected']} ditolak, "
+        response += f"rata-rata {charts['avg_render_time']:.2f} s\n"
+        response += f"🖼️ Cache grafik: {cache['entries']} entri, hit rate {cache['hit_rate'] * 100:.0f}%\n"
+        replies = response_cache.stats()
+        response += f"💬 Cache balasan: {replies['entries']} entri, {replies['bytes'] / 1024:.0f} KB, "
+        response += f"hit rate {replies['hit_rate'] * 100:.0f}%"
+        for command in ('balance', 'history', 'summary'):
+            hits = response_cache_lookups.value(command=command, outcome='hit')
+            lookups = hits + response_cache_lookups.value(command=command, outcome='miss')
+            if lookups:
+                response += f"\n• {command}: {hits}/{lookups} dari cache"
+        
+        await update.message.reply_text(response)
+    
     def _format_amount_idr(self, amount):
         """Format amount with Indonesian abbreviations"""
         if amount >= 1000000:
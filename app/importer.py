@@ -0,0 +1,214 @@
+"""
+Transaction import from uploaded files
+
+Files are read line by line and turned into transactions a chunk at a time,
+so memory use depends on the chunk size, not the file size. Two formats:
+
+- CSV with a header row, columns matched by name in English or Indonesian:
+  tanggal/date, kategori/category, deskripsi/keterangan/description,
+  jumlah/nominal/amount and jenis/type, or separate debit/kredit columns as
+  in bank statement exports. The delimiter (, ; tab |) is taken from the header.
+  Amounts with more decimals than the currency has (cents of a rupiah
+  statement) are reported as errors rather than rounded.
+- Text: one `[kategori] [deskripsi] [+-][jumlah]` line per transaction, the
+  same format as chat messages.
+
+Either may be gzip-compressed, as /export writes them.
+"""
+import csv
+import gzip
+import itertools
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from .models import quantize_amount
+from .parser import parse_amount, parse_lines
+from ..config import CURRENCY_DECIMALS, DEFAULT_TRANSACTION_TYPE, IMPORT_CHUNK_SIZE
+
+# Header name -> field, compared lowercased with surrounding whitespace removed
+COLUMN_NAMES = {
+    'date': 'date', 'tanggal': 'date', 'tgl': 'date', 'waktu': 'date', 'created_at': 'date',
+    'category': 'category', 'kategori': 'category',
+    'description': 'description', 'deskripsi': 'description', 'keterangan': 'description',
+    'catatan': 'description', 'note': 'description',
+    'amount': 'amount', 'jumlah': 'amount', 'nominal': 'amount',
+    'type': 'type', 'jenis': 'type', 'tipe': 'type',
+    'debit': 'debit', 'keluar': 'debit', 'pengeluaran': 'debit',
+    'credit': 'credit', 'kredit': 'credit', 'masuk': 'credit', 'pemasukan': 'credit',
+}
+
+TYPE_NAMES = {
+    'income': 'income', 'pemasukan': 'income', 'masuk': 'income', 'kredit': 'income', 'credit': 'income', 'cr': 'income',
+    'expense': 'expense', 'pengeluaran': 'expense', 'keluar': 'expense', 'debit': 'expense', 'db': 'expense', 'dr': 'expense',
+}
+
+DATE_FORMATS = (
+    '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d',
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y',
+    '%d-%m-%Y %H:%M', '%d-%m-%Y', '%d/%m/%y',
+)
+
+CSV_DELIMITERS = (',', ';', '\t', '|')
+
+# Bank exports write cents as `150000.00` / `150.000,50`: one or two digits after the last separator
+_DECIMAL_AMOUNT = re.compile(r'^(\d[\d.,]*?)[.,](\d{1,2})$')
+
+def iter_import_chunks(path, chunk_size=IMPORT_CHUNK_SIZE):
+    """Yield `(transactions, errors)` for every `chunk_size` lines of the file
+
+    Transactions are dicts for DatabaseManager.add_transactions_bulk with the
+    1-based 'line' they came from; errors are `(line, message)` tuples.
+    """
+    with _open_text(path) as f:
+        header = _find_csv_header(f.readline())
+        f.seek(0)
+        if header is not None:
+            yield from _csv_chunks(f, *header, chunk_size)
+        else:
+            yield from _text_chunks(f, chunk_size)
+
+def _open_text(path):
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    opener = gzip.open if compressed else open
+    return opener(path, 'rt', newline='', encoding='utf-8-sig', errors='replace')
+
+def _find_csv_header(first_line):
+    """Return (delimiter, column index per field) if the line is a CSV header with an amount column"""
+    for delimiter in CSV_DELIMITERS:
+        if delimiter not in first_line:
+            continue
+        names = next(csv.reader([first_line], delimiter=delimiter))
+        columns = {}
+        for index, name in enumerate(names):
+            field = COLUMN_NAMES.get(name.strip().lower())
+            if field and field not in columns:
+                columns[field] = index
+        if 'amount' in columns or 'debit' in columns or 'credit' in columns:
+            return delimiter, columns
+    return None
+
+def _text_chunks(f, chunk_size):
+    offset = 0
+    while True:
+        lines = list(itertools.islice(f, chunk_size))
+        if not lines:
+            return
+        transactions, unparsed = parse_lines(lines)
+        for transaction in transactions:
+            transaction['line'] += offset
+        errors = [(error['line'] + offset, f"Format tidak dikenali: {error['text'][:80]}") for error in unparsed]
+        offset += len(lines)
+        yield transactions, errors
+
+def _csv_chunks(f, delimiter, columns, chunk_size):
+    reader = csv.reader(f, delimiter=delimiter)
+    next(reader)  # header
+    # An export uses one date format throughout; the last one that matched is tried first
+    date_formats = list(DATE_FORMATS)
+    transactions = []
+    errors = []
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            transaction = _csv_transaction(row, columns, date_formats)
+            transaction['line'] = reader.line_num
+            transactions.append(transaction)
+        except ValueError as e:
+            errors.append((reader.line_num, str(e)))
+
+        if len(transactions) + len(errors) >= chunk_size:
+            yield transactions, errors
+            transactions, errors = [], []
+
+    if transactions or errors:
+        yield transactions, errors
+
+def _cell(row, columns, field):
+    index = columns.get(field)
+    if index is None or index >= len(row):
+        return ''
+    return row[index].strip()
+
+def _csv_transaction(row, columns, date_formats):
+    """Build a transaction dict from one CSV row, raising ValueError with a user-facing message"""
+    sign = ''
+    amount_text = _cell(row, columns, 'amount')
+    if amount_text:
+        amount_text, sign = _split_sign(amount_text)
+        amount = _parse_csv_amount(amount_text)
+    else:
+        # Bank statements: money out in one column, money in in another
+        debit = _cell(row, columns, 'debit')
+        credit = _cell(row, columns, 'credit')
+        debit_amount = _parse_csv_amount(_split_sign(debit)[0]) if debit else 0
+        credit_amount = _parse_csv_amount(_split_sign(credit)[0]) if credit else 0
+        if debit_amount and credit_amount:
+            raise ValueError("Debit dan kredit terisi keduanya")
+        amount, sign = (credit_amount, '+') if credit_amount else (debit_amount, '-')
+
+    if not amount:
+        raise ValueError("Jumlah kosong atau nol")
+
+    type_text = _cell(row, columns, 'type').lower()
+    if type_text:
+        if type_text not in TYPE_NAMES:
+            raise ValueError(f"Jenis tidak dikenali: {type_text[:20]}")
+        transaction_type = TYPE_NAMES[type_text]
+    elif sign:
+        transaction_type = 'income' if sign == '+' else 'expense'
+    else:
+        transaction_type = DEFAULT_TRANSACTION_TYPE
+
+    transaction = {
+        'amount': amount,
+        'type': transaction_type,
+        'category': _cell(row, columns, 'category').lower()[:50] or None,
+        'description': _cell(row, columns, 'description') or None,
+    }
+    date_text = _cell(row, columns, 'date')
+    if date_text:
+        transaction['created_at'] = _parse_date(date_text, date_formats)
+    return transaction
+
+def _split_sign(text):
+    """Split a leading +/- (or accounting parentheses) off an amount"""
+    text = text.replace('Rp', '').replace('IDR', '').strip()
+    if text.startswith('(') and text.endswith(')'):
+        return text[1:-1].strip(), '-'
+    if text and text[0] in '+-':
+        return text[1:].strip(), text[0]
+    return text, ''
+
+def _parse_csv_amount(text):
+    if not text:
+        return 0
+    match = _DECIMAL_AMOUNT.match(text.replace(' ', ''))
+    if match:
+        try:
+            amount = Decimal(re.sub(r'[.,]', '', match.group(1)) + '.' + match.group(2))
+        except InvalidOperation:
+            pass
+        else:
+            # Storing it would round it, e.g. cents of a rupiah statement
+            if amount != quantize_amount(amount):
+                raise ValueError(f"Jumlah lebih dari {CURRENCY_DECIMALS} angka desimal: {text[:30]}")
+            return amount
+    try:
+        return parse_amount(text)
+    except ValueError:
+        raise ValueError(f"Jumlah tidak valid: {text[:30]}")
+
+def _parse_date(text, date_formats):
+    text = text.replace('T', ' ').rstrip('Z')
+    for index, date_format in enumerate(date_formats):
+        try:
+            parsed = datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+        if index:
+            date_formats.insert(0, date_formats.pop(index))
+        return parsed
+    raise ValueError(f"Tanggal tidak dikenali: {text[:30]}")
@@ -0,0 +1,227 @@
+"""
+FinTrack maintenance commands
+
+Run from the directory that contains the fintrack package, e.g.
+`python -m fintrack.app.maintenance verify-balance`.
+"""
+import argparse
+import os
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from .database import DatabaseManager, compact_database, get_shared_engine, dispose_shared_engine
+from .migrations import LATEST_VERSION, get_schema_version
+from .models import Transaction, Balance, DailyTotal
+from ..config import ARCHIVE_AFTER_DAYS, DB_DIR, DB_FILE_PATTERN, STORAGE_MODE, ensure_db_dir
+
+# Rows copied per INSERT when merging chats into the shared database
+MERGE_BATCH_SIZE = 1000
+
+def iter_chat_ids():
+    """Yield the chat id of every chat in the configured storage"""
+    if STORAGE_MODE == 'shared':
+        with get_shared_engine().connect() as conn:
+            yield from conn.execute(select(Balance.chat_id).order_by(Balance.chat_id)).scalars()
+    else:
+        yield from iter_chat_files()
+
+def iter_chat_files():
+    """Yield the chat id of every per-chat database file found in DB_DIR"""
+    prefix, _, suffix = DB_FILE_PATTERN.partition('{chat_id}')
+    file_pattern = re.compile(rf'^{re.escape(prefix)}(-?\d+){re.escape(suffix)}$')
+    ensure_db_dir()
+
+    for filename in sorted(os.listdir(DB_DIR)):
+        match = file_pattern.match(filename)
+        if match:
+            yield int(match.group(1))
+
+def _selected_chats(args):
+    return args.chat if args.chat else list(iter_chat_ids())
+
+def verify_balance(args):
+    """Check every ledger against its transactions, optionally fixing it"""
+    failures = 0
+
+    for chat_id in _selected_chats(args):
+        db = DatabaseManager(chat_id)
+        try:
+            result = db.verify_balance()
+            if result['ok']:
+                print(f"✅ {chat_id}: balance {result['balance']:+,}")
+                continue
+
+            failures += 1
+            print(f"❌ {chat_id}: ledger out of sync")
+            for column, values in result['mismatches'].items():
+                print(f"   {column}: ledger={values['ledger']} expected={values['expected']}")
+
+            if args.fix:
+                ledger = db.rebuild_balance()
+                print(f"   🔧 rebuilt, balance {ledger['balance']:+,}")
+        finally:
+            db.close()
+
+    # Non-zero exit status when something was out of sync and left unfixed
+    return 1 if failures and not args.fix else 0
+
+def rebuild_balance(args):
+    """Recompute ledgers from scratch"""
+    for chat_id in _selected_chats(args):
+        db = DatabaseManager(chat_id)
+        try:
+            ledger = db.rebuild_balance()
+            print(f"🔧 {chat_id}: balance {ledger['balance']:+,}")
+        finally:
+            db.close()
+    return 0
+
+def migrate(args):
+    """Upgrade chat databases to the latest schema version"""
+    for chat_id in _selected_chats(args):
+        # Opening a DatabaseManager applies any pending migrations
+        db = DatabaseManager(chat_id)
+        try:
+            with db.engine.connect() as conn:
+                version = get_schema_version(conn)
+            print(f"✅ {chat_id}: schema version {version}/{LATEST_VERSION}")
+        finally:
+            db.close()
+    return 0
+
+def rebuild_rollups(args):
+    """Recompute the daily category rollups from the transactions table"""
+    for chat_id in _selected_chats(args):
+        db = DatabaseManager(chat_id)
+        try:
+            db.rebuild_rollups()
+            print(f"📊 {chat_id}: daily totals rebuilt")
+        finally:
+            db.close()
+    return 0
+
+def rebuild_search(args):
+    """Create or repopulate the full-text search index"""
+    for chat_id in _selected_chats(args):
+        db = DatabaseManager(chat_id)
+        try:
+            db.rebuild_search_index()
+            if db.storage_mode == 'shared':
+                # One index covers every chat in the shared database
+                print("🔍 shared database: search index rebuilt")
+                break
+            print(f"🔍 {chat_id}: search index rebuilt")
+        finally:
+            db.close()
+    return 0
+
+def archive(args):
+    """Move old transactions into per-chat archive databases and compact what's left"""
+    # Whole days, so every day of the rollup is either archived or not
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    before = today - timedelta(days=args.older_than_days)
+    total_moved = 0
+
+    for chat_id in _selected_chats(args):
+        db = DatabaseManager(chat_id)
+        try:
+            moved = db.archive_transactions(before)
+            total_moved += moved
+            if not moved:
+                print(f"⏭️  {chat_id}: nothing before {before:%Y-%m-%d}")
+                continue
+            print(f"🗄️ {chat_id}: {moved} transactions before {before:%Y-%m-%d} archived")
+            if db.storage_mode == 'per_chat' and not args.no_vacuum:
+                size_before, size_after = compact_database(db.engine)
+                print(f"   🧹 {size_before / 2**20:.1f} MB -> {size_after / 2**20:.1f} MB")
+        finally:
+            db.close()
+
+    if STORAGE_MODE == 'shared' and total_moved and not args.no_vacuum:
+        # One file for every chat: compact it once at the end
+        size_before, size_after = compact_database(get_shared_engine())
+        print(f"🧹 shared database: {size_before / 2**20:.1f} MB -> {size_after / 2**20:.1f} MB")
+    return 0
+
+def merge_shared(args):
+    """Copy per-chat database files into the shared database"""
+    shared_engine = get_shared_engine()
+    chat_ids = args.chat if args.chat else list(iter_chat_files())
+
+    for chat_id in chat_ids:
+        # Opening the file brings it to the latest schema, so rows copy over as is
+        source = DatabaseManager(chat_id, storage_mode='per_chat')
+        try:
+            with shared_engine.begin() as target:
+                if target.execute(select(Balance.chat_id).where(Balance.chat_id == chat_id)).first():
+                    print(f"⏭️  {chat_id}: already in the shared database, skipped")
+                    continue
+
+                copied = 0
+                with source.engine.connect() as conn:
+                    # Ids are per chat in the (chat_id, id) key, so they are kept unchanged
+                    result = conn.execution_options(yield_per=MERGE_BATCH_SIZE).execute(
+                        select(Transaction.__table__).where(Transaction.chat_id == chat_id)
+                    )
+                    for rows in result.mappings().partitions():
+                        target.execute(insert(Transaction.__table__), [dict(row) for row in rows])
+                        copied += len(rows)
+
+                    rollup = conn.execute(
+                        select(DailyTotal.__table__).where(DailyTotal.chat_id == chat_id)
+                    ).mappings().all()
+                    if rollup:
+                        target.execute(insert(DailyTotal.__table__), [dict(row) for row in rollup])
+
+                    ledger = conn.execute(
+                        select(Balance.__table__).where(Balance.chat_id == chat_id)
+                    ).mappings().one()
+                target.execute(insert(Balance.__table__), dict(ledger))
+            print(f"✅ {chat_id}: {copied} transactions merged")
+        finally:
+            source.close()
+
+    dispose_shared_engine()
+    print("Per-chat files were left in place; set STORAGE_MODE=shared to use the merged database")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="FinTrack database maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    verify = subparsers.add_parser('verify-balance', help="Compare balance ledgers with the transactions table")
+    verify.add_argument('--fix', action='store_true', help="Rebuild ledgers that are out of sync")
+    verify.set_defaults(func=verify_balance)
+
+    rebuild = subparsers.add_parser('rebuild-balance', help="Recompute balance ledgers from the transactions table")
+    rebuild.set_defaults(func=rebuild_balance)
+
+    upgrade = subparsers.add_parser('migrate', help="Upgrade chat databases to the latest schema version")
+    upgrade.set_defaults(func=migrate)
+
+    rollups = subparsers.add_parser('rebuild-rollups', help="Recompute daily category totals from the transactions table")
+    rollups.set_defaults(func=rebuild_rollups)
+
+    search = subparsers.add_parser('rebuild-search', help="Create or repopulate the full-text search index")
+    search.set_defaults(func=rebuild_search)
+
+    merge = subparsers.add_parser('merge-shared', help="Copy per-chat database files into the shared database")
+    merge.set_defaults(func=merge_shared)
+
+    archiving = subparsers.add_parser('archive', help="Move old transactions to per-chat archive databases")
+    archiving.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS,
+                           help=f"Archive transactions older than this many days (default {ARCHIVE_AFTER_DAYS})")
+    archiving.add_argument('--no-vacuum', action='store_true', help="Skip compacting the database afterwards")
+    archiving.set_defaults(func=archive)
+
+    for subparser in (verify, rebuild, upgrade, rollups, search, merge, archiving):
+        subparser.add_argument('--chat', type=int, action='append', help="Only this chat id (repeatable)")
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,272 @@
+"""
+In-process metrics
+
+Counters, gauges and histograms with a Prometheus text exposition, served by
+a small HTTP server on a background thread (see start_http_server). Safe to
+update from the event loop and from DB worker threads.
+"""
+import bisect
+import functools
+import threading
+import time
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base class: a named metric with optional labels"""
+
+    type = 'untyped'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        return _format_labels(list(zip(self.labelnames, key)) + list(extra))
+
+    def samples(self):
+        """Return (suffix, labels, value) tuples for the exposition"""
+        with self._lock:
+            return [('', self._labels(key), value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    """Current value, either set directly or read from `func` at collection time"""
+
+    type = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), func=None):
+        super().__init__(name, help, labelnames)
+        self.func = func
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.func is None:
+            return super().samples()
+        return [('', '', self.func())]
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, plus their sum and count"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts, sum, count]
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels):
+        """Return count, sum, average and an estimated p50/p95 (bucket upper bounds)"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return {'count': 0, 'sum': 0.0, 'avg': 0.0, 'p50': 0.0, 'p95': 0.0}
+            counts, total, count = list(state[0]), state[1], state[2]
+
+        return {
+            'count': count,
+            'sum': total,
+            'avg': total / count,
+            'p50': self._quantile(counts, count, 0.50),
+            'p95': self._quantile(counts, count, 0.95),
+        }
+
+    def _quantile(self, counts, count, q):
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            if cumulative >= q * count:
+                return bound
+        return self.buckets[-1]
+
+    def label_sets(self):
+        """Return the label dicts observed so far"""
+        with self._lock:
+            return [dict(zip(self.labelnames, key)) for key in sorted(self._values)]
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+
+        samples = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', self._labels(key, [('le', _format_value(bound))]), cumulative))
+            samples.append(('_sum', self._labels(key), total))
+            samples.append(('_count', self._labels(key), count))
+        return samples
+
+    def time(self, **labels):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=(), func=None):
+        return self._register(Gauge(name, help, labelnames, func))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+# Shared registry for the bot process
+metrics = MetricsRegistry()
+
+handler_latency = metrics.histogram(
+    'fintrack_handler_seconds', 'Time spent handling one Telegram update', ['handler']
+)
+handler_errors = metrics.counter(
+    'fintrack_handler_errors_total', 'Updates whose handler raised an exception', ['handler']
+)
+db_query_latency = metrics.histogram(
+    'fintrack_db_query_seconds', 'SQL statement execution time', ['statement']
+)
+db_query_errors = metrics.counter(
+    'fintrack_db_query_errors_total', 'SQL statements that raised an error', ['statement']
+)
+chart_render_latency = metrics.histogram(
+    'fintrack_chart_render_seconds', 'Chart render time, including time queued for a worker'
+)
+chart_renders = metrics.counter(
+    'fintrack_chart_renders_total', 'Chart render attempts by outcome', ['outcome']
+)
+
+def instrument_handler(name):
+    """Decorator recording latency and errors of an async update handler"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                handler_errors.inc(handler=name)
+                raise
+            finally:
+                handler_latency.observe(time.perf_counter() - start, handler=name)
+        return wrapper
+    return decorator
+
+SQL_STATEMENT_KINDS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK'}
+
+def statement_kind(statement):
+    """First keyword of a SQL statement, used as a low-cardinality label"""
+    keyword = statement.lstrip()[:8].split(None, 1)
+    keyword = keyword[0].upper() if keyword else ''
+    return keyword if keyword in SQL_STATEMENT_KINDS else 'OTHER'
+
+def start_http_server(port, host='127.0.0.1', registry=metrics):
+    """Serve `registry` at http://host:port/metrics from a daemon thread; returns the server"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would drown the bot's own log
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='fintrack-metrics', daemon=True)
+    thread.start()
+    return server
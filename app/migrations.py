@@ -0,0 +1,301 @@
+"""
+Schema migrations for chat databases
+
+Each database file records the schema version it is at in SQLite's
+`PRAGMA user_version`. Opening a database applies every migration newer than
+that version, each in its own transaction, so existing `expenses_{chat_id}.db`
+files (and the shared database in STORAGE_MODE = 'shared') are upgraded in place.
+
+Migrations are written as plain DDL snapshots rather than derived from the
+models so they keep producing the same schema when the models change later.
+"""
+from ..config import CURRENCY_DECIMALS
+
+def _create_transactions(conn, chat_id):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER NOT NULL,
+            amount FLOAT NOT NULL,
+            type VARCHAR(10) NOT NULL,
+            category VARCHAR(50),
+            description TEXT,
+            created_at DATETIME,
+            message_id INTEGER,
+            PRIMARY KEY (id)
+        )
+    """)
+
+def _create_balances(conn, chat_id):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS balances (
+            chat_id INTEGER NOT NULL,
+            total_income FLOAT NOT NULL,
+            total_expense FLOAT NOT NULL,
+            income_count INTEGER NOT NULL,
+            expense_count INTEGER NOT NULL,
+            updated_at DATETIME,
+            PRIMARY KEY (chat_id)
+        )
+    """)
+
+def _create_transaction_indexes(conn, chat_id):
+    # created_at alone also serves keyset ordering on (created_at, id): the rowid is part of every index
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_transactions_created_at ON transactions (created_at)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_transactions_category_created_at ON transactions (category, created_at)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_transactions_type_created_at ON transactions (type, created_at)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_transactions_message_id ON transactions (message_id)")
+    conn.exec_driver_sql("ANALYZE transactions")
+
+def fts5_trigram_available(conn):
+    """Check whether this SQLite build has FTS5 with the trigram tokenizer (3.34+)"""
+    try:
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize='trigram')")
+    except Exception:
+        return False
+    conn.exec_driver_sql("DROP TABLE temp.fts5_probe")
+    return True
+
+def _create_search_triggers(conn):
+    # Keyed by the table's rowid, which was also `id` until migration 7 made the
+    # primary key (chat_id, id)
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts (rowid, category, description)
+            VALUES (new.rowid, new.category, new.description);
+        END
+    """)
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, category, description)
+            VALUES ('delete', old.rowid, old.category, old.description);
+        END
+    """)
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF category, description ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, category, description)
+            VALUES ('delete', old.rowid, old.category, old.description);
+            INSERT INTO transactions_fts (rowid, category, description)
+            VALUES (new.rowid, new.category, new.description);
+        END
+    """)
+
+def create_search_index(conn):
+    """Create the full-text index over category/description plus the triggers keeping it in sync"""
+    conn.exec_driver_sql("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+            category, description,
+            content='transactions', tokenize='trigram'
+        )
+    """)
+    _create_search_triggers(conn)
+    # Backfill rows that existed before the index
+    conn.exec_driver_sql("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+def _create_search_index(conn, chat_id):
+    # Older SQLite builds keep using LIKE search; `maintenance rebuild-search` adds the index later
+    if fts5_trigram_available(conn):
+        create_search_index(conn)
+
+def _add_data_version(conn, chat_id):
+    conn.exec_driver_sql("ALTER TABLE balances ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+
+def _search_index_exists(conn):
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+    ).first() is not None
+
+def _integer_amounts(conn, chat_id):
+    # SQLite can't change a column's type, so copy into new tables with INTEGER
+    # amounts (in minor units) and swap them in; ids are kept as they are
+    scale = 10 ** CURRENCY_DECIMALS
+    has_search_index = _search_index_exists(conn)
+    
+    conn.exec_driver_sql("""
+        CREATE TABLE transactions_new (
+            id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            type VARCHAR(10) NOT NULL,
+            category VARCHAR(50),
+            description TEXT,
+            created_at DATETIME,
+            message_id INTEGER,
+            PRIMARY KEY (id)
+        )
+    """)
+    conn.exec_driver_sql(f"""
+        INSERT INTO transactions_new (id, amount, type, category, description, created_at, message_id)
+        SELECT id, CAST(ROUND(amount * {scale:d}) AS INTEGER), type, category, description, created_at, message_id
+        FROM transactions
+    """)
+    # Dropping the table also drops its indexes and the search index triggers
+    conn.exec_driver_sql("DROP TABLE transactions")
+    conn.exec_driver_sql("ALTER TABLE transactions_new RENAME TO transactions")
+    _create_transaction_indexes(conn, chat_id)
+    if has_search_index:
+        # Rowids are unchanged, so the index content is still valid
+        _create_search_triggers(conn)
+    
+    conn.exec_driver_sql("""
+        CREATE TABLE balances_new (
+            chat_id INTEGER NOT NULL,
+            total_income INTEGER NOT NULL,
+            total_expense INTEGER NOT NULL,
+            income_count INTEGER NOT NULL,
+            expense_count INTEGER NOT NULL,
+            updated_at DATETIME,
+            data_version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (chat_id)
+        )
+    """)
+    # Recompute the ledger from the converted amounts so it matches them exactly;
+    # the new data version invalidates anything cached from float totals
+    conn.exec_driver_sql("""
+        INSERT INTO balances_new
+        SELECT chat_id,
+               (SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE type = 'income'),
+               (SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE type = 'expense'),
+               (SELECT COUNT(*) FROM transactions WHERE type = 'income'),
+               (SELECT COUNT(*) FROM transactions WHERE type = 'expense'),
+               updated_at,
+               data_version + 1
+        FROM balances
+    """)
+    conn.exec_driver_sql("DROP TABLE balances")
+    conn.exec_driver_sql("ALTER TABLE balances_new RENAME TO balances")
+
+def _chat_scoped_keys(conn, chat_id):
+    # Transactions are keyed by (chat_id, id) so many chats can share one
+    # database (STORAGE_MODE = 'shared') while ids stay numbered per chat
+    row_count = conn.exec_driver_sql("SELECT COUNT(*) FROM transactions").scalar()
+    if row_count and chat_id is None:
+        raise RuntimeError("chat_id is required to migrate a database that already has transactions")
+    
+    has_search_index = _search_index_exists(conn)
+    if has_search_index:
+        # The index is recreated below, keyed by the new table's rowid
+        conn.exec_driver_sql("DROP TABLE transactions_fts")
+    
+    conn.exec_driver_sql("""
+        CREATE TABLE transactions_new (
+            chat_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            type VARCHAR(10) NOT NULL,
+            category VARCHAR(50),
+            description TEXT,
+            created_at DATETIME,
+            message_id INTEGER,
+            PRIMARY KEY (chat_id, id)
+        )
+    """)
+    conn.exec_driver_sql("""
+        INSERT INTO transactions_new (rowid, chat_id, id, amount, type, category, description, created_at, message_id)
+        SELECT id, ?, id, amount, type, category, description, created_at, message_id
+        FROM transactions
+    """, (chat_id,))
+    conn.exec_driver_sql("DROP TABLE transactions")
+    conn.exec_driver_sql("ALTER TABLE transactions_new RENAME TO transactions")
+    
+    # chat_id leads every index; created_at + id covers keyset pagination
+    conn.exec_driver_sql("CREATE INDEX ix_transactions_chat_created_at ON transactions (chat_id, created_at, id)")
+    conn.exec_driver_sql("CREATE INDEX ix_transactions_chat_category_created_at ON transactions (chat_id, category, created_at)")
+    conn.exec_driver_sql("CREATE INDEX ix_transactions_chat_type_created_at ON transactions (chat_id, type, created_at)")
+    conn.exec_driver_sql("CREATE INDEX ix_transactions_chat_message_id ON transactions (chat_id, message_id)")
+    conn.exec_driver_sql("ANALYZE transactions")
+    
+    # Ids are handed out from the ledger row now that they aren't the rowid
+    conn.exec_driver_sql("ALTER TABLE balances ADD COLUMN next_transaction_id INTEGER NOT NULL DEFAULT 1")
+    conn.exec_driver_sql("""
+        UPDATE balances SET next_transaction_id = (
+            SELECT COALESCE(MAX(id), 0) + 1 FROM transactions WHERE transactions.chat_id = balances.chat_id
+        )
+    """)
+    
+    if has_search_index:
+        create_search_index(conn)
+
+def rebuild_daily_totals(conn, chat_id=None):
+    """Recompute the daily rollup from the transactions table (one chat, or all of them)"""
+    scope = "AND chat_id = ?" if chat_id is not None else ""
+    parameters = (chat_id,) if chat_id is not None else ()
+    conn.exec_driver_sql(f"DELETE FROM daily_totals WHERE 1 {scope}", parameters)
+    # Rows without a category are kept under ''; rows without a timestamp (only
+    # possible if inserted outside the bot) belong to no day and are left out
+    conn.exec_driver_sql(f"""
+        INSERT INTO daily_totals (chat_id, day, category, type, total, count)
+        SELECT chat_id, date(created_at), COALESCE(category, ''), type, SUM(amount), COUNT(*)
+        FROM transactions
+        WHERE created_at IS NOT NULL {scope}
+        GROUP BY chat_id, date(created_at), COALESCE(category, ''), type
+    """, parameters)
+
+def _create_daily_totals(conn, chat_id):
+    # Clustered on the key, so a date range of one chat is a single contiguous scan
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            chat_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            type VARCHAR(10) NOT NULL,
+            total INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (chat_id, day, category, type)
+        ) WITHOUT ROWID
+    """)
+    rebuild_daily_totals(conn)
+
+def _add_archive_horizon(conn, chat_id):
+    conn.exec_driver_sql("ALTER TABLE balances ADD COLUMN archived_before DATETIME")
+
+# (version, description, upgrade(conn, chat_id)) in the order they must be applied
+MIGRATIONS = [
+    (1, "transactions table", _create_transactions),
+    (2, "balance ledger", _create_balances),
+    (3, "indexes on created_at, category, type and message_id", _create_transaction_indexes),
+    (4, "full-text search index", _create_search_index),
+    (5, "data version counter on the balance ledger", _add_data_version),
+    (6, "integer amounts in minor units", _integer_amounts),
+    (7, "chat_id in the transactions key and indexes", _chat_scoped_keys),
+    (8, "daily totals per category and type", _create_daily_totals),
+    (9, "archive horizon on the balance ledger", _add_archive_horizon),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    """Read the schema version stored in the database file"""
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def migrate(engine, target_version=LATEST_VERSION, chat_id=None):
+    """Bring the database up to `target_version`, returning the versions applied
+    
+    `chat_id` is the chat a per-chat database file belongs to; it is None for
+    the shared database.
+    """
+    applied = []
+
+    # The sqlite3 driver doesn't wrap DDL in transactions by itself, so run the
+    # connection in autocommit mode and issue BEGIN/COMMIT explicitly
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        current_version = get_schema_version(conn)
+
+        for version, description, upgrade in MIGRATIONS:
+            if version <= current_version or version > target_version:
+                continue
+
+            # One transaction per step: a failed step leaves the file at the previous version
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the write lock
+                if get_schema_version(conn) >= version:
+                    conn.exec_driver_sql("COMMIT")
+                    continue
+                upgrade(conn, chat_id)
+                conn.exec_driver_sql(f"PRAGMA user_version = {version:d}")
+                conn.exec_driver_sql("COMMIT")
+            except Exception:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+            applied.append(version)
+
+    return applied
@@ -1,15 +1,76 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from ..config import CURRENCY_DECIMALS
 
 Base = declarative_base()
 
+# Stored amount = amount in currency units * AMOUNT_SCALE
+AMOUNT_SCALE = 10 ** CURRENCY_DECIMALS
+
+def to_minor_units(amount):
+    """Convert an amount in currency units to the integer stored in the database"""
+    if AMOUNT_SCALE == 1 and isinstance(amount, int):
+        return amount
+    # Via str so floats like 1.005 round as written, not as their binary value
+    return int((Decimal(str(amount)) * AMOUNT_SCALE).to_integral_value(ROUND_HALF_UP))
+
+def from_minor_units(value):
+    """Convert a stored integer back to currency units (an int when there are no minor units)"""
+    if AMOUNT_SCALE == 1:
+        return value
+    return Decimal(value).scaleb(-CURRENCY_DECIMALS)
+
+# Largest amount one transaction may have, in minor units. Amounts are stored as
+# SQLite's signed 64-bit INTEGER and the ledger adds them up, so this leaves room
+# for thousands of such transactions in one chat's totals
+MAX_AMOUNT_MINOR_UNITS = 10 ** 15
+MAX_AMOUNT = from_minor_units(MAX_AMOUNT_MINOR_UNITS)
+
+def amount_in_range(amount):
+    """Whether `amount` is finite and within MAX_AMOUNT either way"""
+    try:
+        return abs(to_minor_units(amount)) <= MAX_AMOUNT_MINOR_UNITS
+    except (ArithmeticError, ValueError):
+        # inf / nan
+        return False
+
+def quantize_amount(amount):
+    """Round an amount to what the database can store exactly"""
+    return from_minor_units(to_minor_units(amount))
+
+class Amount(TypeDecorator):
+    """Money column: INTEGER minor units in SQLite, currency units in Python
+    
+    Aggregates such as SUM(amount) keep this type, so they are summed as
+    integers by SQLite and converted once on the way out.
+    """
+    impl = Integer
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_minor_units(value)
+    
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_minor_units(value)
+
 class Transaction(Base):
     __tablename__ = 'transactions'
+    # Created by migration 7 in migrations.py; declared here so the metadata matches the schema
+    __table_args__ = (
+        Index('ix_transactions_chat_created_at', 'chat_id', 'created_at', 'id'),
+        Index('ix_transactions_chat_category_created_at', 'chat_id', 'category', 'created_at'),
+        Index('ix_transactions_chat_type_created_at', 'chat_id', 'type', 'created_at'),
+        Index('ix_transactions_chat_message_id', 'chat_id', 'message_id'),
+    )
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    amount = Column(Float, nullable=False)
+    # Ids are numbered per chat, allocated from Balance.next_transaction_id
+    chat_id = Column(Integer, primary_key=True, autoincrement=False)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    amount = Column(Amount, nullable=False)
     type = Column(String(10), nullable=False)  # 'income' or 'expense'
     category = Column(String(50), nullable=True)
     description = Column(Text, nullable=True)
@@ -25,4 +86,55 @@ class Transaction(Base):
             'description': self.description,
             'created_at': self.created_at,
             'message_id': self.message_id
-        }
\ No newline at end of file
+        }
+
+class Balance(Base):
+    """Running totals per chat, kept in sync with the transactions table"""
+    __tablename__ = 'balances'
+    
+    chat_id = Column(Integer, primary_key=True)
+    total_income = Column(Amount, nullable=False, default=0)
+    total_expense = Column(Amount, nullable=False, default=0)
+    income_count = Column(Integer, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+    # Bumped on every change to the chat's transactions; used to invalidate caches
+    data_version = Column(Integer, nullable=False, default=0)
+    # Id given to the chat's next transaction
+    next_transaction_id = Column(Integer, nullable=False, default=1)
+    # Transactions created before this were moved to the chat's archive database
+    archived_before = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def balance(self):
+        return self.total_income - self.total_expense
+    
+    def to_dict(self):
+        return {
+            'chat_id': self.chat_id,
+            'total_income': self.total_income,
+            'total_expense': self.total_expense,
+            'income_count': self.income_count,
+            'expense_count': self.expense_count,
+            'balance': self.balance,
+            'data_version': self.data_version,
+            'next_transaction_id': self.next_transaction_id,
+            'archived_before': self.archived_before,
+            'updated_at': self.updated_at
+        }
+
+class DailyTotal(Base):
+    """Transactions summed per chat, day (UTC), category and type
+    
+    Kept in sync with the transactions table on every write, so period
+    summaries read a few rows per day instead of every transaction.
+    Transactions without a category are counted under ''.
+    """
+    __tablename__ = 'daily_totals'
+    
+    chat_id = Column(Integer, primary_key=True, autoincrement=False)
+    day = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True)
+    type = Column(String(10), primary_key=True)
+    total = Column(Amount, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,149 @@
+"""
+Transaction line parser
+
+Parses `[kategori] [deskripsi] [+-][jumlah]` lines such as `makan siang 50k`
+or `gaji bulanan +2jt` in a single right-to-left scan: amount suffix, number,
+sign, then category and description. It accepts exactly the lines the old
+pair of regexes in MessageHandler did:
+
+    ^(\\S+)\\s+(.+?)\\s+([+-]?)(\\d+(?:[.,]\\d+)*(?:\\s*(?:k|rb|jt|m))?)$
+    ^(\\S+)\\s+([+-]?)(\\d+(?:[.,]\\d+)*(?:\\s*(?:k|rb|jt|m))?)$
+
+(case-insensitive), and computes the same amounts.
+"""
+from ..config import DEFAULT_TRANSACTION_TYPE
+
+# Suffix -> multiplier (k/rb = ribu, jt/m = juta)
+SUFFIX_MULTIPLIERS = {'jt': 1000000, 'rb': 1000, 'k': 1000, 'm': 1000000}
+
+_ASCII_NUMBER_CHARS = '0123456789.,'
+
+def _suffix_at(text):
+    """Return the amount suffix `text` ends with (case-insensitive), or None"""
+    # Only R/r, B/b, J/j, T/t, K/k/KELVIN SIGN and M/m lowercase to these letters
+    tail = text[-2:].lower()
+    if tail in ('rb', 'jt'):
+        return tail
+    if tail[-1:] in ('k', 'm'):
+        return tail[-1]
+    return None
+
+def _strip_number(text):
+    """Return `text` without its trailing run of decimal digits, dots and commas"""
+    pos = len(text)
+    while pos and (text[pos - 1].isdecimal() or text[pos - 1] in '.,'):
+        pos -= 1
+    return text[:pos]
+
+def _number_to_amount(number, multiplier):
+    """Convert the digits of an amount to an int the way the bot always has
+
+    A comma with no dot is a decimal separator (`1,5jt`); otherwise dots and
+    commas are thousand separators (`1.500.000`).
+    """
+    if ',' in number and '.' not in number:
+        number = number.replace(',', '.')
+    elif '.' in number or ',' in number:
+        number = number.replace('.', '').replace(',', '')
+    # Small whole numbers are exact as floats too, so skip the float round trip
+    if len(number) <= 9 and number.isdecimal():
+        return int(number) * multiplier
+    # Convert to integer since IDR doesn't use decimals
+    return int(float(number) * multiplier)
+
+def parse_amount(amount_str):
+    """Parse an amount string with Indonesian abbreviations (e.g. `50k`, `1,5jt`)"""
+    cleaned = amount_str.lower().strip().replace(' ', '')
+
+    suffix = None
+    if cleaned[-2:] in ('jt', 'rb'):
+        suffix = cleaned[-2:]
+    elif cleaned[-1:] in ('k', 'm'):
+        suffix = cleaned[-1:]
+
+    multiplier = 1
+    if suffix:
+        multiplier = SUFFIX_MULTIPLIERS[suffix]
+        cleaned = cleaned[:-len(suffix)]
+
+    try:
+        return _number_to_amount(cleaned, multiplier)
+    except (ValueError, OverflowError):
+        raise ValueError(f"Tidak bisa parse jumlah: '{amount_str}' (cleaned: '{cleaned}')")
+
+def parse_line(line):
+    """Parse one transaction line, returning a dict or None if it isn't one"""
+    # Like the regex `$`, allow (and ignore) a single trailing newline
+    text = line[:-1] if line.endswith('\n') else line
+
+    # Optional suffix, possibly separated from the number by whitespace
+    multiplier = 1
+    suffix = None if text[-1:] in _ASCII_NUMBER_CHARS else _suffix_at(text)
+    if suffix:
+        multiplier = SUFFIX_MULTIPLIERS[suffix]
+        text = text[:-len(suffix)].rstrip()
+
+    # Number: digit runs joined by single '.' or ','
+    head = text.rstrip(_ASCII_NUMBER_CHARS)
+    if head and head[-1].isdecimal():
+        # Non-ASCII digits (e.g. Arabic-Indic) are rare, take the slow path
+        head = _strip_number(text)
+    number = text[len(head):]
+    if not number:
+        return None
+    if ('.' in number or ',' in number) and (
+            number[0] in '.,' or number[-1] in '.,' or '..' in number.replace(',', '.')):
+        return None
+
+    # Optional sign, which must be preceded by whitespace
+    sign = ''
+    if head and head[-1] in '+-':
+        sign = head[-1]
+        head = head[:-1]
+    if not head or not head[-1].isspace():
+        return None
+
+    # Category is the first word; everything up to the amount is the description
+    if head[0].isspace():
+        return None
+    words = head.split(None, 1)
+    description = words[1].rstrip() if len(words) > 1 else ''
+    if '\n' in description:
+        return None
+
+    try:
+        amount = _number_to_amount(number, multiplier)
+    except (ValueError, OverflowError):
+        return None
+
+    return {
+        'category': words[0].lower(),
+        'description': description,
+        'amount': amount,
+        'type': 'income' if sign == '+' else DEFAULT_TRANSACTION_TYPE,
+        'sign': sign
+    }
+
+def parse_lines(lines):
+    """Parse many lines at once
+
+    Blank lines are skipped. Returns `(transactions, errors)`: the parsed
+    transactions, each with its 1-based 'line' number, and a dict with 'line'
+    and 'text' for every line that couldn't be parsed, both in input order.
+    """
+    transactions = []
+    errors = []
+
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        transaction = parse_line(line)
+        if transaction is None:
+            errors.append({'line': line_num, 'text': line})
+        else:
+            transaction['line'] = line_num
+            transactions.append(transaction)
+
+    return transactions, errors
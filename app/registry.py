@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+from .database import DatabaseManager, dispose_shared_engine
+from .metrics import metrics
+from ..config import DB_MAX_OPEN_CHATS
+
+class DatabaseRegistry:
+    """Process-wide cache of DatabaseManager instances, one per chat.
+
+    Opening a manager creates an engine and initializes the schema, so we keep
+    the most recently used ones around and drop the least recently used one
+    once more than `max_size` chat databases are open. Its engine is disposed
+    when no handler is using it any more.
+    """
+
+    def __init__(self, max_size=DB_MAX_OPEN_CHATS):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self._managers = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, chat_id):
+        """Return the shared DatabaseManager for a chat, opening it if needed"""
+        with self._lock:
+            manager = self._managers.get(chat_id)
+            if manager is not None:
+                self._managers.move_to_end(chat_id)
+                self.hits += 1
+                return manager
+
+            self.misses += 1
+
+        # Open outside the lock so initializing one chat doesn't stall the others
+        manager = DatabaseManager(chat_id)
+
+        with self._lock:
+            existing = self._managers.get(chat_id)
+            if existing is not None:
+                # Another caller opened the same chat in the meantime; keep theirs
+                self._managers.move_to_end(chat_id)
+                duplicate, manager = manager, existing
+            else:
+                self._managers[chat_id] = manager
+                duplicate = None
+
+            evicted = []
+            while len(self._managers) > self.max_size:
+                _, old_manager = self._managers.popitem(last=False)
+                evicted.append(old_manager)
+                self.evictions += 1
+
+        # Dispose outside the lock so a slow close doesn't block other chats
+        if duplicate is not None:
+            duplicate.close()
+        # Handlers may still hold an evicted manager mid-query, so it is only
+        # closed once they are done with it
+        for old_manager in evicted:
+            old_manager.close_when_unused()
+
+        return manager
+
+    def close(self, chat_id):
+        """Close and forget the manager for a single chat"""
+        with self._lock:
+            manager = self._managers.pop(chat_id, None)
+        if manager is not None:
+            manager.close()
+
+    def close_all(self):
+        """Close every open manager (used on shutdown)"""
+        with self._lock:
+            managers = list(self._managers.values())
+            self._managers.clear()
+        for manager in managers:
+            manager.close()
+        dispose_shared_engine()
+
+    def stats(self):
+        """Return registry counters"""
+        with self._lock:
+            return {
+                'open': len(self._managers),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._managers)
+
+    def __contains__(self, chat_id):
+        return chat_id in self._managers
+
+
+# Shared registry used by the bot handlers
+registry = DatabaseRegistry()
+
+metrics.gauge('fintrack_open_chat_databases', 'Chat databases currently open', func=lambda: len(registry))
@@ -0,0 +1,151 @@
+import logging
+from telegram.error import TelegramError
+from .async_database import get_async_database
+from .metrics import instrument_handler
+from .write_queue import write_queues
+
+logger = logging.getLogger(__name__)
+
+class CommandRequest:
+    """One update on its way through a route, plus what the middleware added to it"""
+
+    __slots__ = ('update', 'context', 'route', 'text', 'chat_id', 'db')
+
+    def __init__(self, update, context, route, text):
+        self.update = update
+        self.context = context
+        self.route = route
+        self.text = text
+        self.chat_id = update.effective_chat.id if update.effective_chat else None
+        # The chat's AsyncDatabaseManager, set by inject_database
+        self.db = None
+
+class Route:
+    """A named handler wrapped in the router's middleware
+
+    The pipeline is built once, when the route is added: each middleware is a
+    `middleware(route, call_next)` factory returning the coroutine function
+    that takes its place, so handling an update is just a chain of awaits.
+    """
+
+    def __init__(self, name, handler, middleware, database=True):
+        self.name = name
+        self.database = database
+        call = handler
+        # The first middleware listed ends up outermost
+        for wrap in reversed(middleware):
+            call = wrap(self, call)
+        self._call = call
+
+    async def run(self, update, context, text=''):
+        return await self._call(CommandRequest(update, context, self, text))
+
+    async def handle_update(self, update, context):
+        """python-telegram-bot callback, for routes registered as their own handler"""
+        await self.run(update, context)
+
+def log_errors(route, call_next):
+    """Log an exception escaping the handler and tell the chat, instead of failing silently"""
+    async def call(request):
+        try:
+            return await call_next(request)
+        except Exception:
+            logger.exception("Error in %s handler (chat %s)", route.name, request.chat_id)
+            message = request.update.effective_message
+            if message is not None:
+                try:
+                    await message.reply_text("❌ Terjadi kesalahan, coba lagi nanti")
+                except TelegramError:
+                    pass
+    return call
+
+def record_timing(route, call_next):
+    """Latency and errors under fintrack_handler_seconds{handler="<route name>"}"""
+    return instrument_handler(route.name)(call_next)
+
+def inject_database(route, call_next):
+    """Open the chat's database before the handler runs, for routes that use one"""
+    if not route.database:
+        return call_next
+
+    async def call(request):
+        # Transactions the chat's earlier messages left in the write queue are
+        # committed first, so the handler sees them
+        await write_queues.flush(request.chat_id)
+        request.db = await get_async_database(request.chat_id)
+        return await call_next(request)
+    return call
+
+DEFAULT_MIDDLEWARE = (log_errors, record_timing, inject_database)
+
+class CommandRouter:
+    """Finds the route for a text message with a single dict lookup
+
+    Commands match on the message's first word, with or without this bot's
+    @username (`/chart 90`, `/balance@fintrack_bot`); commands addressed to
+    another bot are left alone. Aliases only match the whole message (`saldo`),
+    so a transaction like `saldo awal +1jt` is still a transaction. Both are
+    case-insensitive. Text that matches nothing goes to the default route.
+    """
+
+    def __init__(self, middleware=DEFAULT_MIDDLEWARE):
+        self.middleware = tuple(middleware)
+        self.default = None
+        self._commands = {}
+        self._aliases = {}
+
+    def route(self, name, handler, database=True):
+        """Wrap `handler(request)` in the middleware without binding it to a command
+
+        For updates other than text messages (documents, callback queries):
+        register `route.handle_update` with the application.
+        """
+        return Route(name, handler, self.middleware, database)
+
+    def add(self, name, handler, aliases=(), database=True):
+        """Route `/name` and the bare-word `aliases` to `handler(request)`
+
+        With database=False the handler gets no `request.db`, for commands
+        that never touch the chat's data.
+        """
+        route = self.route(name, handler, database)
+        self._commands[name.lower()] = route
+        for alias in aliases:
+            self._aliases[alias.lower()] = route
+        return route
+
+    def set_default(self, name, handler, database=True):
+        """Route for text that is neither a command nor an alias"""
+        self.default = self.route(name, handler, database)
+        return self.default
+
+    def match(self, text, bot_username=None):
+        """The route for `text` (already stripped), or None"""
+        if not text.startswith('/'):
+            return self._aliases.get(text.lower())
+        command, _, username = text.split(None, 1)[0][1:].partition('@')
+        if username and username.lower() != (bot_username or '').lower():
+            return None
+        return self._commands.get(command.lower())
+
+    async def dispatch(self, update, context, text):
+        """Run `text` through its command or alias route; False if it has none"""
+        route = self.match(text, context.bot.username)
+        if route is None:
+            return False
+        await route.run(update, context, text)
+        return True
+
+    async def handle_text(self, update, context):
+        """python-telegram-bot callback for every text message, commands included"""
+        if not update.message or not update.message.text:
+            return
+
+        text = update.message.text.strip()
+        route = self.match(text, context.bot.username)
+        if route is None:
+            if text.startswith('/') or self.default is None:
+                # A command we don't have, or one meant for another bot
+                return
+            route = self.default
+        await route.run(update, context, text)
@@ -0,0 +1,120 @@
+import asyncio
+import contextvars
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from .metrics import metrics
+from ..config import UPDATE_WORKERS, UPDATE_MAX_PENDING
+
+# Releases the slots of the update being handled; set by ChatSequentialUpdateProcessor
+_release_slots = contextvars.ContextVar('fintrack_release_slots', default=None)
+
+def release_chat_slot():
+    """Let the current chat's next update start before this handler returns
+
+    For the tail of a handler that no longer depends on order, e.g. waiting for
+    a write that is already queued. Gives back the worker slot too: waiting on
+    a commit shouldn't keep other chats waiting. Does nothing outside the
+    update processor.
+    """
+    release = _release_slots.get()
+    if release is not None:
+        release()
+
+class ChatSequentialUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates of different chats concurrently, each chat's in arrival order
+
+    Up to `max_pending` updates are accepted at once (the limit python-telegram-bot
+    enforces around do_process_update). Of those, updates of the same chat wait
+    for each other, and at most `workers` handlers run at any time. The worker
+    slot is taken only once it's the update's turn in its chat, so a burst in one
+    chat can't hold every slot while other chats wait. A handler may hand both
+    back early with release_chat_slot().
+    """
+
+    def __init__(self, workers=UPDATE_WORKERS, max_pending=UPDATE_MAX_PENDING):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        super().__init__(max(max_pending, workers))
+        self.workers = workers
+        self._worker_slots = asyncio.Semaphore(workers)
+        # chat_id -> [lock, updates waiting for or holding it]
+        self._chats = {}
+        self.running = 0
+
+    @staticmethod
+    def _chat_id(update):
+        if isinstance(update, Update) and update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        chat_id = self._chat_id(update)
+        if chat_id is None:
+            # Not tied to a chat (e.g. inline queries): nothing to keep in order
+            await self._run(coroutine)
+            return
+
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = self._chats[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters first in, first out, so the chat's updates keep their order
+            await entry[0].acquire()
+            await self._run(coroutine, entry[0])
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[chat_id]
+
+    async def _run(self, coroutine, chat_lock=None):
+        """Await the handler holding a worker slot and `chat_lock` (already acquired)"""
+        try:
+            await self._worker_slots.acquire()
+        except BaseException:
+            if chat_lock is not None:
+                chat_lock.release()
+            raise
+        self.running += 1
+        released = False
+
+        def release():
+            nonlocal released
+            if released:
+                return
+            released = True
+            self.running -= 1
+            self._worker_slots.release()
+            if chat_lock is not None:
+                chat_lock.release()
+
+        token = _release_slots.set(release)
+        try:
+            await coroutine
+        finally:
+            _release_slots.reset(token)
+            release()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'workers': self.workers,
+            'in_flight': self.current_concurrent_updates,
+            'max_pending': self.max_concurrent_updates,
+            'chats': len(self._chats),
+        }
+
+# Shared processor used by FinTrackBot.application
+update_processor = ChatSequentialUpdateProcessor()
+
+metrics.gauge('fintrack_updates_running', 'Update handlers currently running', func=lambda: update_processor.running)
+metrics.gauge(
+    'fintrack_updates_in_flight', 'Updates accepted and not finished yet, including those waiting for their chat',
+    func=lambda: update_processor.current_concurrent_updates
+)
@@ -0,0 +1,168 @@
+"""
+Webhook endpoint for Telegram updates
+
+A small HTTP/1.1 server on asyncio streams: Telegram POSTs each update as
+JSON to the webhook path with the secret token given to setWebhook in the
+X-Telegram-Bot-Api-Secret-Token header. Valid updates are put on the
+application's update queue and answered with 200 right away; handling them
+is up to the application's update processor.
+"""
+import asyncio
+import hmac
+import json
+import logging
+from telegram import Update
+from .metrics import metrics
+from ..config import WEBHOOK_MAX_BODY_BYTES
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+
+# Idle keep-alive connections are closed after this many seconds
+READ_TIMEOUT = 60
+MAX_HEADER_LINES = 100
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large', 503: 'Service Unavailable',
+}
+
+webhook_requests = metrics.counter('fintrack_webhook_requests_total', 'Webhook requests by response status', ['status'])
+
+class _HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+async def _read_line(reader):
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        # Longer than the stream's buffer limit (64 KiB)
+        raise _HTTPError(400)
+
+class WebhookServer:
+    """Serves the webhook path on host:port and feeds updates to `application`"""
+
+    def __init__(self, application, host, port, path, secret_token, max_body_bytes=WEBHOOK_MAX_BODY_BYTES):
+        if not secret_token:
+            raise ValueError("A secret token is required so only Telegram can post updates")
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token.encode()
+        self.max_body_bytes = max_body_bytes
+        self._server = None
+        self._connections = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        # Port 0 picks a free port; report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Webhook listening on http://%s:%d%s", self.host, self.port, self.path)
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _serve_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), READ_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except _HTTPError as e:
+                    await self._respond(writer, e.status, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, target, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status = await self._handle(method, target, headers, body)
+                await self._respond(writer, status, keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Return (method, target, headers, body), or None once the client hung up"""
+        request_line = await _read_line(reader)
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split()
+        except ValueError:
+            raise _HTTPError(400)
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await _read_line(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise _HTTPError(400)
+
+        body = b''
+        if method == 'POST':
+            if 'content-length' not in headers:
+                raise _HTTPError(411)
+            try:
+                length = int(headers['content-length'])
+            except ValueError:
+                raise _HTTPError(400)
+            if length > self.max_body_bytes:
+                raise _HTTPError(413)
+            body = await reader.readexactly(length)
+        return method, target, headers, body
+
+    async def _handle(self, method, target, headers, body):
+        """Check one request and queue its update; returns the response status"""
+        if target.split('?', 1)[0] != self.path:
+            status = 404
+        elif method != 'POST':
+            status = 405
+        elif not hmac.compare_digest(headers.get(SECRET_HEADER, '').encode(), self.secret_token):
+            status = 403
+        else:
+            status = await self._queue_update(body)
+        webhook_requests.inc(status=str(status))
+        return status
+
+    async def _queue_update(self, body):
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Rejected malformed webhook update: %s", e)
+            return 400
+        if update is None:
+            return 400
+        if not self.application.running:
+            # Telegram retries non-2xx responses, so nothing is lost while stopping
+            return 503
+        await self.application.update_queue.put(update)
+        return 200
+
+    async def _respond(self, writer, status, keep_alive):
+        body = f"{status} {REASONS[status]}".encode()
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: text/plain\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
@@ -0,0 +1,149 @@
+import asyncio
+from .async_database import get_async_database
+from .metrics import metrics
+from ..config import WRITE_BATCH_MAX_SIZE, WRITE_BATCH_MAX_LATENCY
+
+class ChatWriteQueue:
+    """Coalesces inserts for one chat into group commits
+
+    Transactions submitted within `max_latency` seconds of each other (up to
+    `max_batch_size` at a time) are written with a single add_transactions_bulk
+    call; each caller gets back the id of its own row.
+    """
+
+    def __init__(self, chat_id, max_batch_size=WRITE_BATCH_MAX_SIZE, max_latency=WRITE_BATCH_MAX_LATENCY):
+        self.chat_id = chat_id
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._pending = []
+        self._timer = None
+        self._flush_lock = asyncio.Lock()
+        # Strong references to running flush tasks so they aren't garbage collected
+        self._flushes = set()
+
+        self.batches = 0
+        self.rows = 0
+
+    def enqueue(self, transaction, message_id=None):
+        """Queue one transaction dict; returns a future for its id, set once the batch commits"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((dict(transaction, message_id=message_id), future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_latency, self._schedule_flush)
+
+        return future
+
+    async def submit(self, transaction, message_id=None):
+        """Queue one transaction dict and wait for its id once the batch commits"""
+        return await self.enqueue(transaction, message_id)
+
+    def _schedule_flush(self):
+        task = asyncio.ensure_future(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        """Write everything queued so far"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # One batch in flight per chat keeps commits in submission order
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+                await self._write(batch)
+
+    async def _write(self, batch):
+        try:
+            db = await get_async_database(self.chat_id)
+            ids, failures = await db.add_transactions_bulk([transaction for transaction, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(batch)
+
+        errors = dict(failures)
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in errors:
+                future.set_exception(ValueError(errors[index]))
+            else:
+                future.set_result(ids[index])
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    @property
+    def idle(self):
+        return not self._pending and not self._flush_lock.locked()
+
+class WriteQueueRegistry:
+    """One ChatWriteQueue per chat with pending writes"""
+
+    def __init__(self, max_batch_size=WRITE_BATCH_MAX_SIZE, max_latency=WRITE_BATCH_MAX_LATENCY):
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queues = {}
+        self.batches = 0
+        self.rows = 0
+
+    def enqueue(self, chat_id, transaction, message_id=None):
+        """Queue a transaction for a chat; returns a future for its id, set once committed"""
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = ChatWriteQueue(chat_id, self.max_batch_size, self.max_latency)
+            self._queues[chat_id] = queue
+
+        future = queue.enqueue(transaction, message_id)
+        future.add_done_callback(lambda _: self._collect(chat_id, queue))
+        return future
+
+    async def submit(self, chat_id, transaction, message_id=None):
+        """Queue a transaction for a chat and return its id once committed"""
+        return await self.enqueue(chat_id, transaction, message_id)
+
+    async def flush(self, chat_id):
+        """Commit a chat's queued transactions now, e.g. before reading its data"""
+        queue = self._queues.get(chat_id)
+        if queue is not None:
+            await queue.flush()
+
+    def _collect(self, chat_id, queue):
+        """Fold a finished queue's counters into the totals and forget it"""
+        if queue.idle and self._queues.get(chat_id) is queue:
+            del self._queues[chat_id]
+            self.batches += queue.batches
+            self.rows += queue.rows
+
+    async def flush_all(self):
+        """Write out every pending transaction (used on shutdown)"""
+        for chat_id, queue in list(self._queues.items()):
+            await queue.flush()
+            self._collect(chat_id, queue)
+
+    def stats(self):
+        queues = list(self._queues.values())
+        batches = self.batches + sum(queue.batches for queue in queues)
+        rows = self.rows + sum(queue.rows for queue in queues)
+        return {
+            'active_chats': len(queues),
+            'pending': sum(queue.pending for queue in queues),
+            'batches': batches,
+            'rows': rows,
+            'avg_batch_size': rows / batches if batches else 0.0,
+        }
+
+# Shared queue used by the message handler for single-line transactions
+write_queues = WriteQueueRegistry()
+
+metrics.gauge('fintrack_write_queue_pending', 'Transactions waiting for a group commit', func=lambda: write_queues.stats()['pending'])
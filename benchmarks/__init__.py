@@ -0,0 +1,6 @@
+"""
+FinTrack benchmarks
+
+Run from the directory that contains the fintrack package, e.g.
+`python -m fintrack.benchmarks.async_db`.
+"""
@@ -0,0 +1,142 @@
+"""
+Hot/cold archival: hot file size and query times before and after
+
+Seeds one chat with --rows transactions spread evenly over --years, times
+the bot's queries, archives everything older than --keep-days with
+DatabaseManager.archive_transactions, compacts the hot file with
+compact_database and times the same queries again. Queries that stay within
+the hot window shouldn't touch the archive; a full /history walk, a search
+for a term only old rows contain and the export still have to, and must
+return exactly what they did before. The ledger must still verify.
+
+Usage: python -m fintrack.benchmarks.archive [--rows 200000] [--years 5] [--keep-days 365]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# Keep benchmark databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-bench-'))
+
+from ..app.database import DatabaseManager, compact_database
+
+CHAT_ID = -6_000_000
+CATEGORIES = ['makan', 'transport', 'belanja', 'kopi', 'listrik', 'pulsa', 'gaji']
+DESCRIPTIONS = ['siang', 'ojek ke kantor', 'bulanan', 'susu dan roti', 'token', '']
+# Only in the oldest rows, so searching for it has to reach the archive
+OLD_TERM = 'warisan lama'
+
+
+def seed(db, rows, years, rng, chunk=5000):
+    now = datetime.utcnow()
+    span = timedelta(days=365 * years)
+    for offset in range(0, rows, chunk):
+        batch = []
+        for i in range(offset, min(rows, offset + chunk)):
+            category = rng.choice(CATEGORIES)
+            batch.append({
+                'amount': rng.randint(1, 500) * 1000,
+                'type': 'income' if category == 'gaji' else 'expense',
+                'category': category,
+                'description': OLD_TERM if i < 50 else rng.choice(DESCRIPTIONS),
+                # Oldest first, so the first rows are the oldest
+                'created_at': now - span + span * i / rows,
+            })
+        db.add_transactions_bulk(batch)
+
+
+def _history_walk(db):
+    ids, before = [], None
+    while True:
+        page = db.get_transactions_page(limit=50, before=before)
+        ids += [row['id'] for row in page['transactions']]
+        if not page['has_older']:
+            return ids
+        last = page['transactions'][-1]
+        before = (last['created_at'], last['id'])
+
+
+def _queries(db):
+    month_start = date.today().replace(day=1)
+    return {
+        '/history page 1': lambda: db.get_transactions_page(limit=5),
+        '/category kopi': lambda: db.get_transactions_by_category('kopi', limit=5),
+        '/search token': lambda: db.search_transactions('token', limit=15),
+        '/search (old rows)': lambda: db.search_transactions(OLD_TERM, limit=15),
+        '/report this month': lambda: db.get_category_totals(month_start, None),
+        'full /history walk': lambda: _history_walk(db),
+        'export': lambda: [row[0] for row in db.iter_transactions()],
+    }
+
+
+def time_queries(db, repeat):
+    """{name: (best seconds, result)} over `repeat` runs of each query"""
+    results = {}
+    for name, query in _queries(db).items():
+        # The long walks are run once; they are seconds, not milliseconds
+        runs = 1 if name in ('full /history walk', 'export') else repeat
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = query()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (best, result)
+    return results
+
+
+def _same(before, after):
+    # Archived rows carry an extra 'archived' flag
+    if isinstance(before, list) and before and isinstance(before[0], dict):
+        return [row['id'] for row in before] == [row['id'] for row in after]
+    if isinstance(before, dict):
+        return _same(before['transactions'], after['transactions'])
+    return before == after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--years', type=float, default=5, help="history the rows are spread over")
+    parser.add_argument('--keep-days', type=int, default=365, help="archive transactions older than this")
+    parser.add_argument('--repeat', type=int, default=50, help="runs per short query (best is reported)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    db = DatabaseManager(CHAT_ID, storage_mode='per_chat')
+    try:
+        seed_start = time.perf_counter()
+        seed(db, args.rows, args.years, random.Random(args.seed))
+        print(f"seeded {args.rows} transactions over {args.years:g} years in {time.perf_counter() - seed_start:.1f}s")
+        before = time_queries(db, args.repeat)
+        balance = db.get_balance()
+
+        cutoff = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=args.keep_days)
+        start = time.perf_counter()
+        moved = db.archive_transactions(cutoff)
+        archived = time.perf_counter() - start
+        start = time.perf_counter()
+        size_before, size_after = compact_database(db.engine)
+        compacted = time.perf_counter() - start
+        print(f"archived {moved} rows in {archived:.1f}s, compacted in {compacted:.1f}s: "
+              f"hot file {size_before / 2**20:.1f} MB -> {size_after / 2**20:.1f} MB, "
+              f"archive {os.path.getsize(db.archive_path) / 2**20:.1f} MB")
+
+        after = time_queries(db, args.repeat)
+        print(f"{'query':>20} {'before':>10} {'after':>10}  same result")
+        for name, (elapsed, result) in before.items():
+            elapsed_after, result_after = after[name]
+            print(f"{name:>20} {elapsed * 1000:8.2f}ms {elapsed_after * 1000:8.2f}ms  "
+                  f"{'yes' if _same(result, result_after) else 'NO'}")
+
+        verify = db.verify_balance()
+        print(f"ledger: {'ok' if verify['ok'] and verify['balance'] == balance == db.get_balance() else 'MISMATCH'}")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
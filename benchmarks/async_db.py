@@ -0,0 +1,103 @@
+"""
+Concurrent chats: blocking DatabaseManager calls vs AsyncDatabaseManager
+
+One chat gets an artificially slow commit (simulating a slow fsync). With
+blocking calls every other chat waits behind it; with the async layer the
+other chats keep making progress on the worker pool.
+
+Usage: python -m fintrack.benchmarks.async_db [--chats 20] [--ops 20] [--slow-ms 200]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# Keep benchmark databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-bench-'))
+
+from sqlalchemy import event
+from ..app.registry import DatabaseRegistry
+from ..app.async_database import AsyncDatabaseManager, shutdown_executor
+
+
+def _make_slow(manager, delay):
+    """Sleep on every commit of this chat's engine"""
+    @event.listens_for(manager.engine, 'commit')
+    def _slow_commit(conn):
+        time.sleep(delay)
+
+
+async def _chat_blocking(manager, ops):
+    for i in range(ops):
+        manager.add_transaction(1000 + i, 'expense', 'bench', 'blocking')
+        manager.get_balance()
+        await asyncio.sleep(0)
+
+
+async def _chat_async(manager, ops):
+    db = AsyncDatabaseManager(manager)
+    for i in range(ops):
+        await db.add_transaction(1000 + i, 'expense', 'bench', 'async')
+        await db.get_balance()
+
+
+async def _heartbeat(stop, lags, interval=0.01):
+    """Measure how late the event loop wakes us up"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _run(mode, managers, ops):
+    worker = _chat_blocking if mode == 'blocking' else _chat_async
+    stop = asyncio.Event()
+    lags = []
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+    start = time.perf_counter()
+    finished = {}
+
+    async def chat(index, manager):
+        await worker(manager, ops)
+        finished[index] = time.perf_counter() - start
+
+    await asyncio.gather(*(chat(index, manager) for index, manager in enumerate(managers)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+
+    # Chat 0 is the slow one; report how long the other chats had to wait
+    others = [finished[index] for index in range(1, len(managers))]
+    return elapsed, others, lags or [0.0]
+
+
+def _report(mode, elapsed, others, lags, total_ops):
+    print(f"{mode:>9}: {elapsed:6.2f}s total, {total_ops / elapsed:7.1f} ops/s, "
+          f"other chats done in median {statistics.median(others):6.2f}s / max {max(others):6.2f}s, "
+          f"max loop stall {max(lags) * 1000:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--ops', type=int, default=20)
+    parser.add_argument('--slow-ms', type=float, default=200)
+    args = parser.parse_args()
+
+    print(f"{args.chats} chats x {args.ops} writes, chat 0 commits take +{args.slow_ms:.0f}ms")
+    for offset, mode in enumerate(('blocking', 'async')):
+        registry = DatabaseRegistry(max_size=args.chats)
+        # Separate chat ids per mode so both runs start from empty databases
+        managers = [registry.get(1_000_000 * (offset + 1) + i) for i in range(args.chats)]
+        _make_slow(managers[0], args.slow_ms / 1000)
+        elapsed, others, lags = asyncio.run(_run(mode, managers, args.ops))
+        _report(mode, elapsed, others, lags, args.chats * args.ops)
+        registry.close_all()
+
+    shutdown_executor()
+
+
+if __name__ == '__main__':
+    main()
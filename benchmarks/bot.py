@@ -0,0 +1,180 @@
+"""
+End-to-end throughput of FinTrackBot with synthetic Telegram updates
+
+Builds the real FinTrackBot.application on an offline Bot API stand-in
+(benchmarks/stub.py), seeds every chat with --history transactions and pushes
+fake updates through the full handler chain. Each round sends one update per
+chat concurrently; reports messages/sec and p50/p95/p99 latency per scenario.
+Save results with --json and diff two runs with --compare.
+
+Usage: python -m fintrack.benchmarks.bot [--chats 10] [--history 1000] [--messages 20] [--scenario balance ...]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+# Keep benchmark databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-bench-'))
+
+from telegram import Update
+from ..app.bot import FinTrackBot
+from ..app.registry import registry
+from .stub import BOT_TOKEN, StubRequest, UpdateFactory
+
+CATEGORIES = ['makan', 'transport', 'belanja', 'kopi', 'listrik', 'pulsa', 'gaji']
+DESCRIPTIONS = ['siang', 'ojek ke kantor', 'bulanan', 'susu dan roti', 'token', '']
+AMOUNTS = ['50k', '15rb', '1.500.000', '25000', '1,5 jt', '100 k']
+
+
+def _line(rng):
+    category = rng.choice(CATEGORIES)
+    sign = '+' if category == 'gaji' else ''
+    return ' '.join(filter(None, [category, rng.choice(DESCRIPTIONS), sign + rng.choice(AMOUNTS)]))
+
+
+SCENARIOS = {
+    'single': _line,
+    'multi': lambda rng: '\n'.join(_line(rng) for _ in range(5)),
+    'balance': lambda rng: '/balance',
+    'history': lambda rng: '/history',
+    'search': lambda rng: f'/search {rng.choice(CATEGORIES)}',
+    'summary': lambda rng: '/summary',
+    'chart': lambda rng: '/chart',
+}
+
+
+def seed_history(chat_ids, rows, rng, chunk=1000):
+    """Insert `rows` random transactions into each chat"""
+    for chat_id in chat_ids:
+        db = registry.get(chat_id)
+        for start in range(0, rows, chunk):
+            batch = []
+            for _ in range(min(chunk, rows - start)):
+                category = rng.choice(CATEGORIES)
+                batch.append({
+                    'amount': rng.randint(1, 500) * 1000,
+                    'type': 'income' if category == 'gaji' else 'expense',
+                    'category': category,
+                    'description': rng.choice(DESCRIPTIONS),
+                })
+            db.add_transactions_bulk(batch)
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def _timed(application, update):
+    start = time.perf_counter()
+    await application.process_update(update)
+    return time.perf_counter() - start
+
+
+async def run_scenario(application, factory, make_text, chat_ids, messages, rng):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(messages):
+        updates = [Update.de_json(factory.message(chat_id, make_text(rng)), application.bot) for chat_id in chat_ids]
+        latencies.extend(await asyncio.gather(*(_timed(application, update) for update in updates)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'messages': len(latencies),
+        'seconds': elapsed,
+        'msgs_per_sec': len(latencies) / elapsed,
+        'p50_ms': _percentile(latencies, 0.50) * 1000,
+        'p95_ms': _percentile(latencies, 0.95) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    chat_ids = [-1_000_000 - i for i in range(args.chats)]
+
+    seed_start = time.perf_counter()
+    seed_history(chat_ids, args.history, rng)
+    print(f"seeded {args.chats} chats x {args.history} transactions in {time.perf_counter() - seed_start:.1f}s")
+
+    request = StubRequest(latency=args.api_latency_ms / 1000)
+    bot = FinTrackBot(BOT_TOKEN, request=request)
+    application = bot.application
+    factory = UpdateFactory()
+
+    results = {}
+    await application.initialize()
+    try:
+        print(f"{'scenario':>9} {'msgs':>6} {'msgs/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}  api calls")
+        for name in args.scenario:
+            calls_before = request.calls.copy()
+            result = await run_scenario(application, factory, SCENARIOS[name], chat_ids, args.messages, rng)
+            result['api_calls'] = dict(request.calls - calls_before)
+            results[name] = result
+            calls = ', '.join(f"{method}={count}" for method, count in sorted(result['api_calls'].items()))
+            print(f"{name:>9} {result['messages']:6d} {result['msgs_per_sec']:9.1f} "
+                  f"{result['p50_ms']:7.1f}ms {result['p95_ms']:7.1f}ms {result['p99_ms']:7.1f}ms  {calls}")
+    finally:
+        await application.shutdown()
+        # Flushes write queues and closes pools/databases, as run_polling would on exit
+        await application.post_shutdown(application)
+
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, results):
+    print(f"\nvs {previous.get('commit') or 'previous run'}:")
+    for name, result in results.items():
+        old = previous['results'].get(name)
+        if not old:
+            continue
+        throughput = (result['msgs_per_sec'] / old['msgs_per_sec'] - 1) * 100
+        p95 = (result['p95_ms'] / old['p95_ms'] - 1) * 100 if old['p95_ms'] else 0.0
+        print(f"{name:>9}: msgs/s {throughput:+6.1f}%, p95 {p95:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chats', type=int, default=10)
+    parser.add_argument('--history', type=int, default=1000, help="transactions seeded per chat")
+    parser.add_argument('--messages', type=int, default=20, help="updates per chat in each scenario")
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument('--api-latency-ms', type=float, default=0, help="simulated Bot API round trip")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="write results to this file")
+    parser.add_argument('--compare', help="JSON file from an earlier run to compare against")
+    args = parser.parse_args()
+    args.scenario = args.scenario or list(SCENARIOS)
+
+    results = asyncio.run(run(args))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+    if args.json:
+        config = {key: value for key, value in vars(args).items() if key not in ('json', 'compare')}
+        with open(args.json, 'w') as f:
+            json.dump({'commit': _git_commit(), 'config': config, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+/export: streaming throughput, peak memory, event loop stalls and round trip
+
+Seeds one chat with --rows transactions spread over two years, then for each
+format: writes the export with write_export alone (rows/s, compressed size,
+and peak memory traced with tracemalloc in a second pass, which should stay
+flat as --rows grows), and runs /export through FinTrackBot on the offline
+Bot API stand-in (benchmarks/stub.py) while a ticker task measures the
+longest the event loop went without running. The CSV the bot sent is then
+imported into a fresh chat, which must end up with the same count, balance
+and per-month rollups.
+
+Usage: python -m fintrack.benchmarks.export [--rows 200000] [--format csv ...]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+# Keep benchmark databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-bench-'))
+
+from telegram import Update
+from ..app.bot import FinTrackBot
+from ..app.exporter import EXPORT_FORMATS, write_export
+from ..app.importer import iter_import_chunks
+from ..app.registry import registry
+from .stub import BOT_TOKEN, StubRequest, UpdateFactory
+
+CHAT_ID = -5_000_000
+IMPORT_CHAT_ID = -5_000_001
+CATEGORIES = ['makan', 'transport', 'belanja', 'kopi', 'listrik', 'pulsa', 'gaji', None]
+DESCRIPTIONS = ['siang', 'ojek ke kantor', 'bulanan', 'susu, roti "segar"', 'token', None]
+
+
+def seed(db, rows, rng, chunk=5000):
+    start = datetime(2024, 1, 1)
+    for offset in range(0, rows, chunk):
+        batch = []
+        for i in range(offset, min(rows, offset + chunk)):
+            category = rng.choice(CATEGORIES)
+            batch.append({
+                'amount': rng.randint(1, 500) * 1000,
+                'type': 'income' if category == 'gaji' else 'expense',
+                'category': category,
+                'description': rng.choice(DESCRIPTIONS),
+                'created_at': start + timedelta(seconds=i * 63_072_000 // rows, microseconds=rng.randint(0, 999_999)),
+            })
+        db.add_transactions_bulk(batch)
+
+
+def bench_write(db, export_format, directory):
+    """write_export alone: rows/s and file size, then peak traced memory in a second pass"""
+    path = os.path.join(directory, f"export.{export_format}.gz")
+    start = time.perf_counter()
+    count = write_export(db, path, export_format)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+
+    # tracemalloc slows allocation down a lot, so it's kept out of the timed pass
+    tracemalloc.start()
+    write_export(db, path, export_format)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count / elapsed, size, peak
+
+
+async def _ticker(stop, interval=0.005):
+    """Longest gap between wakeups of a task that asks to run every `interval` seconds"""
+    longest = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        longest = max(longest, now - last - interval)
+        last = now
+    return longest
+
+
+async def bench_bot(formats):
+    """/export through the bot for each format: (seconds, longest loop stall) and the files sent"""
+    request = StubRequest()
+    bot = FinTrackBot(BOT_TOKEN, request=request)
+    application = bot.application
+    factory = UpdateFactory()
+
+    results = {}
+    await application.initialize()
+    try:
+        for export_format in formats:
+            update = Update.de_json(factory.message(CHAT_ID, f"/export {export_format}"), application.bot)
+            stop = asyncio.Event()
+            ticker = asyncio.create_task(_ticker(stop))
+            start = time.perf_counter()
+            await application.process_update(update)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            results[export_format] = (elapsed, await ticker, request.uploads[-1][2])
+    finally:
+        await application.shutdown()
+        # Flushes write queues and closes pools/databases, as run_polling would on exit
+        await application.post_shutdown(application)
+    return results
+
+
+def _totals(db):
+    months = sorted(db.get_monthly_totals(date.min, None))
+    return db.verify_balance()['balance'], sum(count for _, _, _, count in months), months
+
+
+def check_round_trip(content, directory):
+    """Import the exported CSV into another chat; names of the checks that failed"""
+    path = os.path.join(directory, 'roundtrip.csv.gz')
+    with open(path, 'wb') as f:
+        f.write(content)
+    target = registry.get(IMPORT_CHAT_ID)
+    errors = 0
+    for transactions, chunk_errors in iter_import_chunks(path):
+        _, failures = target.add_transactions_bulk(transactions)
+        errors += len(chunk_errors) + len(failures)
+
+    source_balance, source_count, source_months = _totals(registry.get(CHAT_ID))
+    balance, count, months = _totals(target)
+    failed = [f"{errors} import errors"] if errors else []
+    if count != source_count:
+        failed.append(f"{count} of {source_count} rows")
+    if balance != source_balance:
+        failed.append('balance')
+    if months != source_months:
+        failed.append('monthly rollups')
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000, help="transactions in the exported chat")
+    parser.add_argument('--format', action='append', choices=list(EXPORT_FORMATS), help="format (repeatable, default: all)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    formats = args.format or list(EXPORT_FORMATS)
+    directory = tempfile.mkdtemp(prefix='fintrack-export-')
+
+    seed_start = time.perf_counter()
+    db = registry.get(CHAT_ID)
+    seed(db, args.rows, random.Random(args.seed))
+    print(f"seeded {args.rows} transactions in {time.perf_counter() - seed_start:.1f}s")
+
+    written = {export_format: bench_write(db, export_format, directory) for export_format in formats}
+    sent = asyncio.run(bench_bot(formats))
+
+    print(f"{'format':>6} {'rows/s':>8} {'size':>8} {'peak mem':>9} {'/export s':>10} {'max stall':>10}")
+    for export_format in formats:
+        rate, size, peak = written[export_format]
+        elapsed, stall, _ = sent[export_format]
+        print(f"{export_format:>6} {rate:8.0f} {size / 2**20:6.1f}MB {peak / 2**20:7.2f}MB "
+              f"{elapsed:10.2f} {stall * 1000:8.1f}ms")
+
+    if 'csv' in sent:
+        failed = check_round_trip(sent['csv'][2], directory)
+        print(f"CSV round trip: {'ok' if not failed else ', '.join(failed)}")
+    registry.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+File import: parse throughput, peak memory and end-to-end import time
+
+Generates a CSV bank-statement style export and a text file in the chat
+message format with --rows transactions each (plus a few bad lines), then:
+parses them with iter_import_chunks alone, tracking peak memory with
+tracemalloc to show it stays flat as --rows grows; and uploads them to
+FinTrackBot as documents through the offline Bot API stand-in
+(benchmarks/stub.py), timing until the background import finishes. Checks
+the saved row count, the balance ledger and the daily rollups afterwards.
+
+Usage: python -m fintrack.benchmarks.importer [--rows 100000] [--chunk-size 1000] [--format csv ...]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+# Keep benchmark databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-bench-'))
+
+from telegram import Update
+from ..app.bot import FinTrackBot
+from ..app.handlers import active_imports
+from ..app.importer import iter_import_chunks
+from ..app.models import Transaction
+from ..app.registry import registry
+from .stub import BOT_TOKEN, StubRequest, UpdateFactory
+
+CATEGORIES = ['makan', 'transport', 'belanja', 'kopi', 'listrik', 'pulsa', 'gaji']
+DESCRIPTIONS = ['siang', 'ojek ke kantor', 'bulanan', 'susu dan roti', 'token', '']
+AMOUNTS = ['50k', '15rb', '1.500.000', '25000', '1,5 jt', '100 k']
+# One malformed line per this many rows
+BAD_EVERY = 1000
+
+
+def write_csv(path, rows, rng):
+    """Semicolon-separated export with debit/kredit columns; returns the number of valid rows"""
+    valid = 0
+    start = datetime(2024, 1, 1)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('Tanggal;Keterangan;Kategori;Debit;Kredit\n')
+        for i in range(rows):
+            when = (start + timedelta(minutes=7 * i)).strftime('%d/%m/%Y %H:%M')
+            category = rng.choice(CATEGORIES)
+            amount = f"{rng.randint(1, 500) * 1000:,}.00"
+            if i % BAD_EVERY == BAD_EVERY - 1:
+                f.write(f"{when};rusak;{category};abc;\n")
+                continue
+            debit, credit = ('', amount) if category == 'gaji' else (amount, '')
+            f.write(f"{when};{rng.choice(DESCRIPTIONS)};{category};{debit};{credit}\n")
+            valid += 1
+    return valid
+
+
+def write_text(path, rows, rng):
+    """One chat-format line per transaction; returns the number of valid rows"""
+    valid = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(rows):
+            if i % BAD_EVERY == BAD_EVERY - 1:
+                f.write("catatan tanpa jumlah\n")
+                continue
+            category = rng.choice(CATEGORIES)
+            sign = '+' if category == 'gaji' else ''
+            f.write(' '.join(filter(None, [category, rng.choice(DESCRIPTIONS), sign + rng.choice(AMOUNTS)])) + '\n')
+            valid += 1
+    return valid
+
+
+FORMATS = {
+    'csv': ('mutasi.csv', write_csv),
+    'text': ('catatan.txt', write_text),
+}
+
+
+def _parse_all(path, chunk_size):
+    parsed = 0
+    for transactions, errors in iter_import_chunks(path, chunk_size):
+        parsed += len(transactions) + len(errors)
+    return parsed
+
+
+def bench_parse(path, chunk_size):
+    """iter_import_chunks alone: rows/s, then peak traced memory in a second pass"""
+    start = time.perf_counter()
+    parsed = _parse_all(path, chunk_size)
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc slows allocation down a lot, so it's kept out of the timed pass
+    tracemalloc.start()
+    _parse_all(path, chunk_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return parsed / elapsed, peak
+
+
+async def bench_upload(application, request, factory, path, file_name, chat_id):
+    """Send the file to the bot as a document and wait for the import to finish"""
+    with open(path, 'rb') as f:
+        request.files[file_name] = f.read()
+    edits_before = request.calls['editMessageText']
+
+    update = factory.document(chat_id, file_name, file_name, len(request.files[file_name]))
+    start = time.perf_counter()
+    await application.process_update(Update.de_json(update, application.bot))
+    await active_imports[chat_id]
+    elapsed = time.perf_counter() - start
+    return elapsed, request.calls['editMessageText'] - edits_before
+
+
+def check_chat(chat_id, expected_rows):
+    """Names of the checks that failed for the imported chat"""
+    db = registry.get(chat_id)
+    session = db.Session()
+    try:
+        rows = session.query(Transaction).filter(Transaction.chat_id == chat_id).count()
+    finally:
+        session.close()
+
+    failed = []
+    if rows != expected_rows:
+        failed.append(f"{rows} rows")
+    verify = db.verify_balance()
+    if not verify['ok']:
+        failed.append('ledger')
+    rollup = 0
+    for _, transaction_type, total, _ in db.get_monthly_totals(date.min, None):
+        rollup += total if transaction_type == 'income' else -total
+    if rollup != verify['balance']:
+        failed.append('rollups')
+    return failed
+
+
+async def run(args, files):
+    request = StubRequest()
+    bot = FinTrackBot(BOT_TOKEN, request=request)
+    application = bot.application
+    factory = UpdateFactory()
+
+    results = {}
+    await application.initialize()
+    try:
+        for index, (name, path, file_name) in enumerate(files):
+            chat_id = -4_000_000 - index
+            results[name] = (chat_id,) + await bench_upload(application, request, factory, path, file_name, chat_id)
+    finally:
+        await application.shutdown()
+        # Flushes write queues and closes pools/databases, as run_polling would on exit
+        await application.post_shutdown(application)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000, help="lines per generated file")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="lines parsed per chunk in the parse test")
+    parser.add_argument('--format', action='append', choices=list(FORMATS), help="file format (repeatable, default: all)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='fintrack-import-')
+    files, parsed = [], {}
+    for name in args.format or list(FORMATS):
+        file_name, write = FORMATS[name]
+        path = os.path.join(directory, file_name)
+        valid = write(path, args.rows, random.Random(args.seed))
+        files.append((name, path, file_name))
+        parsed[name] = (valid, os.path.getsize(path)) + bench_parse(path, args.chunk_size)
+
+    uploads = asyncio.run(run(args, files))
+
+    print(f"{'format':>6} {'size':>8} {'parse rows/s':>13} {'peak mem':>9} {'import s':>9} {'rows/s':>8} {'edits':>6}  checks")
+    for name, (valid, size, parse_rate, peak) in parsed.items():
+        chat_id, elapsed, edits = uploads[name]
+        failed = check_chat(chat_id, valid)
+        print(f"{name:>6} {size / 2**20:6.1f}MB {parse_rate:13.0f} {peak / 2**20:7.2f}MB {elapsed:9.2f} "
+              f"{valid / elapsed:8.0f} {edits:6d}  {'ok' if not failed else ', '.join(failed)}")
+    registry.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Transaction line parser: single-pass scanner vs the old regex pair
+
+Times both over a realistic multi-line message. The old regexes are kept here
+as the reference tests/test_parser.py checks app.parser against.
+
+Usage: python -m fintrack.benchmarks.parser [--seed 1] [--lines 50] [--repeat 2000]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+
+from ..app.parser import parse_lines
+from ..config import DEFAULT_TRANSACTION_TYPE
+
+# The parser MessageHandler used before app.parser, kept verbatim as the reference
+LEGACY_PATTERN = re.compile(r'^(\S+)\s+(.+?)\s+([+-]?)(\d+(?:[.,]\d+)*(?:\s*(?:k|rb|jt|m))?)$', re.IGNORECASE)
+LEGACY_FALLBACK = re.compile(r'^(\S+)\s+([+-]?)(\d+(?:[.,]\d+)*(?:\s*(?:k|rb|jt|m))?)$', re.IGNORECASE)
+
+
+def legacy_parse_amount(amount_str):
+    amount_str_clean = amount_str.lower().strip().replace(' ', '')
+
+    multiplier = 1
+    suffix = None
+    if amount_str_clean.endswith('jt'):
+        multiplier, suffix = 1000000, 'jt'
+    elif amount_str_clean.endswith('rb'):
+        multiplier, suffix = 1000, 'rb'
+    elif amount_str_clean.endswith('k'):
+        multiplier, suffix = 1000, 'k'
+    elif amount_str_clean.endswith('m'):
+        multiplier, suffix = 1000000, 'm'
+    if suffix:
+        amount_str_clean = amount_str_clean[:-len(suffix)]
+
+    if ',' in amount_str_clean and '.' not in amount_str_clean:
+        amount_str_clean = amount_str_clean.replace(',', '.')
+    else:
+        amount_str_clean = amount_str_clean.replace('.', '').replace(',', '')
+
+    try:
+        return int(float(amount_str_clean) * multiplier)
+    except ValueError:
+        raise ValueError(f"Tidak bisa parse jumlah: '{amount_str}'")
+
+
+def legacy_parse_line(line):
+    match = LEGACY_PATTERN.match(line)
+    if match:
+        category, description, sign, amount_str = match.group(1).lower(), match.group(2).strip(), match.group(3), match.group(4).strip()
+    else:
+        match = LEGACY_FALLBACK.match(line)
+        if not match:
+            return None
+        category, description, sign, amount_str = match.group(1).lower(), "", match.group(2), match.group(3).strip()
+
+    try:
+        amount = legacy_parse_amount(amount_str)
+    except (ValueError, OverflowError):
+        # The old parser let OverflowError (e.g. 400 digits) escape; the new one rejects the line
+        return None
+
+    return {
+        'category': category,
+        'description': description,
+        'amount': amount,
+        'type': 'income' if sign == '+' else DEFAULT_TRANSACTION_TYPE,
+        'sign': sign
+    }
+
+
+def _message(lines, seed):
+    rng = random.Random(seed)
+    categories = ['makan', 'transport', 'belanja', 'gaji', 'kopi', 'listrik']
+    descriptions = ['', 'siang', 'ojek ke kantor', 'bulanan', 'susu dan roti']
+    amounts = ['50k', '15rb', '1.500.000', '+2jt', '25000', '1,5 jt', '100 k']
+    return [' '.join(filter(None, [rng.choice(categories), rng.choice(descriptions), rng.choice(amounts)]))
+            for _ in range(lines)]
+
+
+def _time(func, lines, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(lines)
+    return time.perf_counter() - start
+
+
+def _legacy_batch(lines):
+    return [legacy_parse_line(line.strip()) for line in lines if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--lines', type=int, default=50, help="lines per benchmark message")
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    lines = _message(args.lines, args.seed)
+    total = args.lines * args.repeat
+    for name, func in (('regex', _legacy_batch), ('parser', parse_lines)):
+        elapsed = _time(func, lines, args.repeat)
+        print(f"{name:>7}: {elapsed:6.2f}s, {total / elapsed:10.0f} lines/s, {elapsed / total * 1e6:6.2f} µs/line")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
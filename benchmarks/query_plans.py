@@ -0,0 +1,102 @@
+"""
+Query plans and timings before and after the index migration
+
+Builds a chat database at schema version 2 (no indexes), fills it with
+synthetic transactions, then prints EXPLAIN QUERY PLAN and timings for the
+bot's hot queries before and after migrating to the latest version.
+
+Usage: python -m fintrack.benchmarks.query_plans [--rows 200000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from ..app.migrations import migrate, LATEST_VERSION
+
+CATEGORIES = ['makan', 'transport', 'belanja', 'listrik', 'gaji', 'hiburan', 'pulsa', 'kesehatan']
+
+CHAT_ID = -1001
+
+# Same shape as the statements DatabaseManager issues; {scope} becomes the
+# chat_id filter once the schema has one (migration 7)
+QUERIES = {
+    'get_transactions': (
+        "SELECT * FROM transactions WHERE {scope} 1 ORDER BY created_at DESC LIMIT 10", {}),
+    'get_transactions_by_category': (
+        "SELECT * FROM transactions WHERE {scope} category = :category ORDER BY created_at DESC LIMIT 10",
+        {'category': 'transport'}),
+    'expenses_since (chart)': (
+        "SELECT * FROM transactions WHERE {scope} type = 'expense' AND created_at >= :since ORDER BY created_at DESC",
+        {'since': None}),
+    'search_transactions': (
+        "SELECT * FROM transactions WHERE {scope} (lower(category) LIKE lower(:term) OR lower(description) LIKE lower(:term)) "
+        "ORDER BY created_at DESC LIMIT 20", {'term': '%siang%'}),
+}
+
+
+def _fill(engine, rows):
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=3 * 365)
+    data = []
+    for i in range(rows):
+        category = rng.choice(CATEGORIES)
+        data.append((
+            rng.randint(1, 500) * 1000,
+            'income' if category == 'gaji' else 'expense',
+            category,
+            f"{category} {rng.choice(['pagi', 'siang', 'malam'])} {i}",
+            start + timedelta(seconds=rng.randint(0, 3 * 365 * 86400)),
+            i,
+        ))
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO transactions (amount, type, category, description, created_at, message_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)", data)
+
+
+def _measure(engine, repeat, chat_scoped):
+    since = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+    scope = "chat_id = :chat_id AND" if chat_scoped else ""
+    with engine.connect() as conn:
+        for name, (sql, params) in QUERIES.items():
+            sql = sql.format(scope=scope)
+            if 'since' in params:
+                params = dict(params, since=since)
+            if chat_scoped:
+                params = dict(params, chat_id=CHAT_ID)
+            plan = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql), params).all()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"  {name:<30} {elapsed:9.2f} ms")
+            for row in plan:
+                print(f"      {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='fintrack-bench-'), 'expenses_bench.db')
+    engine = create_engine(f'sqlite:///{path}')
+    migrate(engine, target_version=2)
+    _fill(engine, args.rows)
+
+    print(f"{args.rows:,} transactions, schema version 2 (no indexes)")
+    _measure(engine, args.repeat, chat_scoped=False)
+
+    migrate(engine, chat_id=CHAT_ID)
+    print(f"\nschema version {LATEST_VERSION}")
+    _measure(engine, args.repeat, chat_scoped=True)
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Import-time profile of the bot process
+
+Runs a fresh interpreter with `python -X importtime`, importing the modules a
+bot start needs, and reports the total plus the slowest modules (cumulative
+time). Use --max-ms to fail (exit 1) when startup regresses past a budget and
+--json to save the numbers for comparison between commits.
+
+Usage: python -m fintrack.benchmarks.startup [--target fintrack.app.bot] [--top 15] [--max-ms 800]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PACKAGE = __package__.split('.')[0]
+
+
+def profile_imports(target, runs=3):
+    """Import `target` in fresh interpreters; return {module: (self_us, cumulative_us)} of the fastest run"""
+    # Run from the directory containing the package so it is importable by name
+    package_parent = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    best = None
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+            cwd=package_parent, capture_output=True, text=True, check=True
+        )
+        modules = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+
+        total = sum(self_us for self_us, _ in modules.values())
+        if best is None or total < best[0]:
+            best = (total, modules)
+
+    return best[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', default=f'{PACKAGE}.app.bot', help="module to import")
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--runs', type=int, default=3, help="fresh interpreters to run; the fastest is reported")
+    parser.add_argument('--max-ms', type=float, help="exit with status 1 if total import time exceeds this")
+    parser.add_argument('--json', help="write per-module timings to this file")
+    args = parser.parse_args()
+
+    modules = profile_imports(args.target, args.runs)
+    total_ms = sum(self_us for self_us, _ in modules.values()) / 1000
+
+    print(f"import {args.target}: {total_ms:.1f} ms total, {len(modules)} modules")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{cumulative_us / 1000:10.1f}ms {self_us / 1000:8.1f}ms  {name}")
+
+    own = {name: times for name, times in modules.items() if name.split('.')[0] == PACKAGE}
+    print(f"\n{PACKAGE} modules:")
+    for name, (self_us, cumulative_us) in sorted(own.items(), key=lambda item: item[1][1], reverse=True):
+        print(f"{cumulative_us / 1000:10.1f}ms {self_us / 1000:8.1f}ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'target': args.target,
+                'total_ms': total_ms,
+                'modules': {name: {'self_us': s, 'cumulative_us': c} for name, (s, c) in modules.items()},
+            }, f, indent=2)
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"\n❌ startup import time {total_ms:.1f} ms exceeds budget of {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
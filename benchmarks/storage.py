@@ -0,0 +1,151 @@
+"""
+Insert and query throughput for each SQLite storage profile
+
+Runs the same workload against a fresh chat database per profile in
+config.STORAGE_PROFILES, plus plain SQLite defaults (rollback journal,
+synchronous=FULL) as the baseline: single-row commits, bulk inserts, the
+bot's read queries, and readers running while a writer commits. fsync cost
+depends on the disk, so set DB_DIR to a directory on the one the bot uses.
+
+Usage: python -m fintrack.benchmarks.storage [--rows 20000] [--commits 500] [--seconds 3] [--profile fast ...]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Keep benchmark databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-bench-'))
+
+from sqlalchemy.exc import OperationalError
+from ..app.database import DatabaseManager
+from ..config import STORAGE_PROFILES
+
+BASELINE = 'sqlite-defaults'
+CATEGORIES = ['makan', 'transport', 'belanja', 'kopi', 'listrik', 'pulsa', 'gaji']
+DESCRIPTIONS = ['siang', 'ojek ke kantor', 'bulanan', 'susu dan roti', 'token', '']
+
+
+def _row(rng):
+    category = rng.choice(CATEGORIES)
+    return {
+        'amount': rng.randint(1, 500) * 1000,
+        'type': 'income' if category == 'gaji' else 'expense',
+        'category': category,
+        'description': rng.choice(DESCRIPTIONS),
+    }
+
+
+def _open(profile, chat_id):
+    return DatabaseManager(chat_id, storage_mode='per_chat', storage_profile=profile)
+
+
+def bench_commits(db, commits, rng):
+    """One add_transaction (one commit) per row"""
+    start = time.perf_counter()
+    for _ in range(commits):
+        row = _row(rng)
+        db.add_transaction(row['amount'], row['type'], row['category'], row['description'])
+    return commits / (time.perf_counter() - start)
+
+
+def bench_bulk(db, rows, rng, batch=500):
+    """add_transactions_bulk in batches of `batch` rows"""
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        db.add_transactions_bulk([_row(rng) for _ in range(min(batch, rows - offset))])
+    return rows / (time.perf_counter() - start)
+
+
+def _read_round(db, since):
+    db.get_transactions_page(limit=5)
+    db.get_category_totals(since, None, 'expense')
+    db.search_transactions('makan')
+    db.get_balance()
+
+
+def bench_reads(db, rounds):
+    """The queries behind /history, /summary, /search and /balance"""
+    since = datetime.utcnow() - timedelta(days=30)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        _read_round(db, since)
+    return rounds * 4 / (time.perf_counter() - start)
+
+
+def bench_mixed(db, seconds, readers, rng):
+    """Reader threads querying while one writer commits single rows"""
+    stop = threading.Event()
+    since = datetime.utcnow() - timedelta(days=30)
+    counts = {'reads': 0, 'writes': 0, 'busy': 0}
+    lock = threading.Lock()
+
+    def reader():
+        done = 0
+        while not stop.is_set():
+            try:
+                _read_round(db, since)
+                done += 4
+            except OperationalError:
+                with lock:
+                    counts['busy'] += 1
+        with lock:
+            counts['reads'] += done
+
+    def writer():
+        while not stop.is_set():
+            row = _row(rng)
+            try:
+                db.add_transaction(row['amount'], row['type'], row['category'], row['description'])
+                counts['writes'] += 1
+            except OperationalError:
+                with lock:
+                    counts['busy'] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts['reads'] / seconds, counts['writes'] / seconds, counts['busy']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20_000, help="rows inserted by the bulk test")
+    parser.add_argument('--commits', type=int, default=500, help="single-row commits")
+    parser.add_argument('--rounds', type=int, default=200, help="read rounds (4 queries each)")
+    parser.add_argument('--seconds', type=float, default=3.0, help="duration of the mixed test")
+    parser.add_argument('--readers', type=int, default=4, help="reader threads in the mixed test")
+    parser.add_argument('--profile', action='append', choices=[BASELINE] + list(STORAGE_PROFILES),
+                        help="profile to run (repeatable, default: all)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Baseline: no PRAGMAs at all, i.e. what the bot ran with before profiles existed
+    STORAGE_PROFILES.setdefault(BASELINE, {})
+    profiles = args.profile or [BASELINE] + [name for name in STORAGE_PROFILES if name != BASELINE]
+
+    print(f"{'profile':>16} {'commits/s':>10} {'bulk rows/s':>12} {'queries/s':>10} "
+          f"{'mixed reads/s':>14} {'mixed writes/s':>15} {'busy':>5}")
+    for index, profile in enumerate(profiles):
+        rng = random.Random(args.seed)
+        db = _open(profile, -2_000_000 - index)
+        try:
+            bulk = bench_bulk(db, args.rows, rng)
+            commits = bench_commits(db, args.commits, rng)
+            reads = bench_reads(db, args.rounds)
+            mixed_reads, mixed_writes, busy = bench_mixed(db, args.seconds, args.readers, rng)
+        finally:
+            db.close()
+        print(f"{profile:>16} {commits:10.1f} {bulk:12.0f} {reads:10.1f} "
+              f"{mixed_reads:14.1f} {mixed_writes:15.1f} {busy:5d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Offline stand-ins for the Telegram Bot API
+
+StubRequest answers Bot API calls locally (getMe, sendMessage, sendPhoto, ...)
+so FinTrackBot.application can be initialized and fed updates without a
+network. It serves documents users upload from its `files` dict and keeps
+the ones the bot sends in `uploads`. UpdateFactory
+builds the Update payloads Telegram would send.
+"""
+import asyncio
+import json
+import time
+from collections import Counter
+
+from telegram.request import BaseRequest
+
+BOT_TOKEN = '123456:BENCHMARK'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'FinTrack', 'username': 'fintrack_bench_bot'}
+
+# Bot API methods that return True instead of a Message
+BOOLEAN_METHODS = {
+    'answerCallbackQuery', 'deleteMessage', 'sendChatAction', 'setMyCommands', 'setWebhook', 'deleteWebhook'
+}
+
+
+class StubRequest(BaseRequest):
+    """BaseRequest that never touches the network; counts calls per Bot API method"""
+
+    def __init__(self, latency=0.0):
+        # Optional simulated round trip to Telegram, in seconds
+        self.latency = latency
+        self.calls = Counter()
+        self._message_id = 0
+        # file_id -> bytes, served by getFile and the file download URL
+        self.files = {}
+        # (Bot API method, file name, bytes) of every file the bot sent
+        self.uploads = []
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        if '/file/bot' in url:
+            # File download: the body is the file itself, not a JSON result
+            self.calls['download'] += 1
+            return 200, self.files[api_method]
+        self.calls[api_method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        parameters = request_data.parameters if request_data else {}
+        if request_data and request_data.contains_files:
+            for file_name, content, _ in request_data.multipart_data.values():
+                self.uploads.append((api_method, file_name, content if isinstance(content, bytes) else content.read()))
+        if api_method == 'getMe':
+            result = BOT_USER
+        elif api_method == 'getFile':
+            file_id = parameters['file_id']
+            result = {
+                'file_id': file_id, 'file_unique_id': file_id,
+                'file_size': len(self.files[file_id]), 'file_path': file_id,
+            }
+        elif api_method in BOOLEAN_METHODS:
+            result = True
+        else:
+            result = self._message(parameters)
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    def _message(self, parameters):
+        self._message_id += 1
+        message = {
+            'message_id': parameters.get('message_id', self._message_id),
+            'date': int(time.time()),
+            'chat': {'id': int(parameters.get('chat_id', 0)), 'type': 'group', 'title': 'Benchmark'},
+            'from': BOT_USER,
+        }
+        if 'text' in parameters:
+            message['text'] = parameters['text']
+        return message
+
+
+class UpdateFactory:
+    """Builds Telegram Update payloads for group chat messages"""
+
+    def __init__(self):
+        self._update_id = 0
+        self._message_id = 0
+
+    def _next(self, chat_id, user_id):
+        self._update_id += 1
+        self._message_id += 1
+        return {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'group', 'title': 'Benchmark'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'Member {user_id}'},
+        }
+
+    def message(self, chat_id, text, user_id=1):
+        """Update dict for a text message; a leading /command gets its bot_command entity"""
+        message = self._next(chat_id, user_id)
+        message['text'] = text
+        if text.startswith('/'):
+            command = text.split(None, 1)[0]
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return {'update_id': self._update_id, 'message': message}
+
+    def document(self, chat_id, file_id, file_name, file_size, user_id=1):
+        """Update dict for a message with an attached file (put its bytes in StubRequest.files)"""
+        message = self._next(chat_id, user_id)
+        message['document'] = {
+            'file_id': file_id, 'file_unique_id': file_id, 'file_name': file_name, 'file_size': file_size,
+        }
+        return {'update_id': self._update_id, 'message': message}
@@ -0,0 +1,136 @@
+"""
+Webhook mode: throughput with concurrent chats and per-chat ordering
+
+Starts FinTrackBot.run_webhook on a local port with the offline Bot API
+stand-in (benchmarks/stub.py) and POSTs synthetic updates to it over HTTP the
+way Telegram does, all chats at once but each chat's messages in order. Each
+--workers value runs in its own process (UPDATE_WORKERS). Checks that
+requests without the secret token are refused and that every chat's
+transactions were saved in the order they were sent.
+
+Usage: python -m fintrack.benchmarks.webhook [--chats 20] [--messages 10] [--api-latency-ms 50] [--workers 1 --workers 16]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Keep benchmark databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-bench-'))
+
+import httpx
+from ..app.bot import FinTrackBot
+from ..app.registry import registry
+from ..app.updates import update_processor
+from .stub import BOT_TOKEN, StubRequest, UpdateFactory
+
+SECRET = 'benchmark-secret'
+WEBHOOK_PATH = '/telegram'
+
+
+async def _wait_until_serving(bot, task):
+    while bot.webhook_server is None or bot.webhook_server._server is None or not bot.application.running:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return f"http://127.0.0.1:{bot.webhook_server.port}{WEBHOOK_PATH}"
+
+
+async def _check_rejections(client, url):
+    """Requests Telegram wouldn't send must not reach the bot"""
+    body = json.dumps(UpdateFactory().message(-1, 'makan 1k'))
+    checks = {
+        'no secret': (await client.post(url, content=body)).status_code == 403,
+        'wrong secret': (await client.post(url, content=body, headers={'X-Telegram-Bot-Api-Secret-Token': 'x'})).status_code == 403,
+        'wrong path': (await client.post(url + 'x', content=body, headers={'X-Telegram-Bot-Api-Secret-Token': SECRET})).status_code == 404,
+        'GET': (await client.get(url)).status_code == 405,
+        'bad JSON': (await client.post(url, content=b'{', headers={'X-Telegram-Bot-Api-Secret-Token': SECRET})).status_code == 400,
+    }
+    return [name for name, ok in checks.items() if not ok]
+
+
+async def _send_chat(client, url, factory, chat_id, messages):
+    for i in range(messages):
+        payload = factory.message(chat_id, f"makan m{i:04d} {i + 1}k")
+        response = await client.post(url, json=payload, headers={'X-Telegram-Bot-Api-Secret-Token': SECRET})
+        response.raise_for_status()
+
+
+def _out_of_order_chats(chat_ids, messages):
+    bad = []
+    for chat_id in chat_ids:
+        rows = sorted(registry.get(chat_id).get_transactions(limit=messages), key=lambda row: row['id'])
+        if [row['description'] for row in rows] != [f"m{i:04d}" for i in range(messages)]:
+            bad.append(chat_id)
+    return bad
+
+
+async def run_once(args):
+    request = StubRequest(latency=args.api_latency_ms / 1000)
+    bot = FinTrackBot(BOT_TOKEN, request=request)
+    stop = asyncio.Event()
+    task = asyncio.create_task(bot.run_webhook(
+        url=f"https://bot.example{WEBHOOK_PATH}", host='127.0.0.1', port=0, secret_token=SECRET, stop_event=stop
+    ))
+    url = await _wait_until_serving(bot, task)
+
+    chat_ids = [-3_000_000 - i for i in range(args.chats)]
+    factory = UpdateFactory()
+    # Telegram opens up to 40 connections to a webhook by default
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=40)) as client:
+        rejected = await _check_rejections(client, url)
+        start = time.perf_counter()
+        await asyncio.gather(*(_send_chat(client, url, factory, chat_id, args.messages) for chat_id in chat_ids))
+        accepted = time.perf_counter() - start
+        await bot.application.update_queue.join()
+        elapsed = time.perf_counter() - start
+
+    out_of_order = await asyncio.get_running_loop().run_in_executor(None, _out_of_order_chats, chat_ids, args.messages)
+    stop.set()
+    await task
+
+    total = args.chats * args.messages
+    return {
+        'workers': update_processor.workers,
+        'updates': total,
+        'seconds': elapsed,
+        'updates_per_sec': total / elapsed,
+        'accept_seconds': accepted,
+        'failed_rejection_checks': rejected,
+        'out_of_order_chats': len(out_of_order),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=10, help="updates sent per chat")
+    parser.add_argument('--api-latency-ms', type=float, default=50, help="simulated Bot API round trip")
+    parser.add_argument('--workers', type=int, action='append', help="UPDATE_WORKERS to compare (repeatable, default: 1 and 16)")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_once(args))))
+        return
+
+    print(f"{args.chats} chats x {args.messages} updates, Bot API latency {args.api_latency_ms:g}ms")
+    print(f"{'workers':>8} {'updates/s':>10} {'seconds':>8} {'in order':>9} {'auth checks':>12}")
+    for workers in args.workers or [1, 16]:
+        # The DB pool and update processor are per process, so each setting gets a fresh one
+        command = [sys.executable, '-m', __spec__.name, '--child', '--chats', str(args.chats),
+                   '--messages', str(args.messages), '--api-latency-ms', str(args.api_latency_ms)]
+        env = dict(os.environ, UPDATE_WORKERS=str(workers), DB_DIR=tempfile.mkdtemp(prefix='fintrack-bench-'), METRICS_PORT='0')
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        in_order = 'yes' if not result['out_of_order_chats'] else f"{result['out_of_order_chats']} bad"
+        checks = 'ok' if not result['failed_rejection_checks'] else ','.join(result['failed_rejection_checks'])
+        print(f"{result['workers']:8d} {result['updates_per_sec']:10.1f} {result['seconds']:8.2f} {in_order:>9} {checks:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Bursty single-line inserts: one commit per message vs the per-chat write queue
+
+Simulates family groups where several members post an expense in the same
+instant, repeated in bursts, and reports committed rows per second. The
+"bot" mode sends the same bursts as Telegram updates through FinTrackBot's
+update queue and per-chat update processor (benchmarks/stub.py stands in for
+the Bot API), which is where handlers of one chat wait for each other; its
+group commits use the configured WRITE_BATCH_MAX_LATENCY.
+
+Usage: python -m fintrack.benchmarks.write_queue [--chats 10] [--members 8] [--bursts 20]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Keep benchmark databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-bench-'))
+
+from telegram import Update
+from ..app.async_database import get_async_database, shutdown_executor
+from ..app.bot import FinTrackBot
+from ..app.registry import registry
+from ..app.write_queue import WriteQueueRegistry, write_queues
+from .stub import BOT_TOKEN, StubRequest, UpdateFactory
+
+
+def _transaction(member, burst):
+    return {'amount': 1000 * (member + 1), 'type': 'expense', 'category': 'bench', 'description': f'burst {burst}'}
+
+
+async def _direct(chat_id, member, burst):
+    db = await get_async_database(chat_id)
+    data = _transaction(member, burst)
+    return await db.add_transaction(data['amount'], data['type'], data['category'], data['description'])
+
+
+async def _run(mode, chat_ids, members, bursts, queues):
+    start = time.perf_counter()
+    for burst in range(bursts):
+        if mode == 'direct':
+            calls = [_direct(chat_id, member, burst) for chat_id in chat_ids for member in range(members)]
+        else:
+            calls = [queues.submit(chat_id, _transaction(member, burst))
+                     for chat_id in chat_ids for member in range(members)]
+        await asyncio.gather(*calls)
+    return time.perf_counter() - start
+
+
+async def _run_bot(chat_ids, members, bursts):
+    request = StubRequest()
+    application = FinTrackBot(BOT_TOKEN, request=request).application
+    factory = UpdateFactory()
+    await application.initialize()
+    await application.start()
+    try:
+        start = time.perf_counter()
+        for burst in range(bursts):
+            sent = request.calls['sendMessage']
+            for chat_id in chat_ids:
+                for member in range(members):
+                    data = _transaction(member, burst)
+                    text = f"{data['category']} {data['description']} {data['amount']}"
+                    update = factory.message(chat_id, text, user_id=member + 1)
+                    await application.update_queue.put(Update.de_json(update, application.bot))
+            # A burst is done once every message got its confirmation
+            while request.calls['sendMessage'] - sent < len(chat_ids) * members:
+                await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - start
+    finally:
+        await application.stop()
+        await application.shutdown()
+        # Also stops the DB pool, so this mode runs last
+        await application.post_shutdown(application)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chats', type=int, default=10)
+    parser.add_argument('--members', type=int, default=8, help="messages per chat in each burst")
+    parser.add_argument('--bursts', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    rows = args.chats * args.members * args.bursts
+    print(f"{args.chats} chats x {args.members} simultaneous messages x {args.bursts} bursts = {rows} rows")
+
+    for offset, mode in enumerate(('direct', 'queued', 'bot')):
+        # Separate chat ids per mode so every run starts from empty databases
+        chat_ids = [1_000_000 * (offset + 1) + i for i in range(args.chats)]
+        if mode == 'bot':
+            elapsed = asyncio.run(_run_bot(chat_ids, args.members, args.bursts))
+            commits = write_queues.stats()['batches']
+        else:
+            queues = WriteQueueRegistry(max_latency=args.latency_ms / 1000)
+            elapsed = asyncio.run(_run(mode, chat_ids, args.members, args.bursts, queues))
+            commits = rows if mode == 'direct' else queues.stats()['batches']
+        print(f"{mode:>7}: {elapsed:6.2f}s, {rows / elapsed:8.1f} rows/s, {commits} commits")
+
+    shutdown_executor()
+    registry.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,15 +8,139 @@ load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
 # Database path
-DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "db")
-os.makedirs(DB_DIR, exist_ok=True)
+DB_DIR = os.getenv('DB_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), "db"))
+
+def ensure_db_dir():
+    """Create DB_DIR on first use instead of as an import side effect"""
+    os.makedirs(DB_DIR, exist_ok=True)
+
+# Storage layout: "per_chat" keeps one SQLite file per chat (DB_FILE_PATTERN),
+# "shared" keeps every chat in one database (SHARED_DB_FILE) keyed by chat_id.
+# Move existing per-chat files over with `maintenance merge-shared`.
+STORAGE_MODE = os.getenv('STORAGE_MODE', 'per_chat')
+
+# SQLite tuning applied to every new connection, by profile name:
+#   durable  - WAL, fsync on every commit (survives power loss)
+#   balanced - WAL, fsync at checkpoints only (a crash can't corrupt the file,
+#              a power cut may lose the last commits)
+#   fast     - no fsync at all; for throwaway or easily rebuilt data
+# cache_size is in KiB when negative (SQLite's convention), busy_timeout in ms
+STORAGE_PROFILE = os.getenv('STORAGE_PROFILE', 'balanced')
+STORAGE_PROFILES = {
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -8 * 1024,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16 * 1024,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -64 * 1024,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+}
 
 # Database file pattern
 DB_FILE_PATTERN = "expenses_{chat_id}.db"
 
+# Database file used when STORAGE_MODE is "shared"
+SHARED_DB_FILE = "expenses.db"
+
+# Archive: `maintenance archive` moves transactions older than ARCHIVE_AFTER_DAYS
+# into one ARCHIVE_FILE_PATTERN file per chat, ARCHIVE_BATCH_SIZE rows per transaction
+ARCHIVE_FILE_PATTERN = "archive_{chat_id}.db"
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 5000
+
+# Maximum number of chat databases kept open at once (least recently used are closed)
+DB_MAX_OPEN_CHATS = 64
+
+# How updates arrive: "polling" (getUpdates) or "webhook" (Telegram POSTs them to
+# WEBHOOK_URL, which must reach WEBHOOK_HOST:WEBHOOK_PORT, e.g. via a reverse proxy)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+# Token Telegram sends with every webhook request; a random one is used for each run when unset
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_MAX_BODY_BYTES = 1024 * 1024
+
+# Concurrent update handling: a chat's updates always run one at a time and in
+# order; up to UPDATE_WORKERS chats are handled at once and up to
+# UPDATE_MAX_PENDING updates may be accepted and waiting
+UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', '16'))
+UPDATE_MAX_PENDING = int(os.getenv('UPDATE_MAX_PENDING', '256'))
+
+# Worker threads used to run database calls off the bot's event loop
+DB_WORKER_THREADS = 8
+
+# Group commit for single-line transactions: inserts arriving within this many
+# seconds of each other in a chat share one commit (up to the max batch size)
+WRITE_BATCH_MAX_SIZE = 50
+WRITE_BATCH_MAX_LATENCY = 0.02
+
+# Chart rendering: worker processes, max charts queued at once and per-render timeout (seconds)
+CHART_WORKERS = 2
+CHART_MAX_PENDING = 8
+CHART_RENDER_TIMEOUT = 30
+
+# Rendered chart cache: memory budget in bytes, plus an optional on-disk tier (None disables it)
+CHART_CACHE_MAX_BYTES = 32 * 1024 * 1024
+CHART_CACHE_DIR = None
+CHART_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024
+
+# Memory budget in bytes for cached /balance, /summary and /history replies
+RESPONSE_CACHE_MAX_BYTES = 4 * 1024 * 1024
+
+# Seconds between re-reads of a chat's data version from disk, so cached replies
+# also notice changes written by another process (the maintenance CLI)
+DATA_VERSION_REFRESH_INTERVAL = 1.0
+
+# File import: accepted extensions, largest upload (bots can only download files
+# up to 20 MB), rows per insert transaction and seconds between progress updates
+IMPORT_EXTENSIONS = ('.csv', '.txt', '.csv.gz', '.txt.gz')
+IMPORT_MAX_FILE_BYTES = 20 * 1024 * 1024
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_PROGRESS_INTERVAL = 2.0
+
+# /export: rows fetched per batch while streaming, gzip level (1 fastest, 9 smallest)
+# and largest file sent back (bots can upload documents up to 50 MB)
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COMPRESS_LEVEL = 6
+EXPORT_MAX_FILE_BYTES = 50 * 1024 * 1024
+
+# Transactions shown per /history page
+HISTORY_PAGE_SIZE = 5
+
 # Currency settings
 CURRENCY = "IDR"
 CURRENCY_SYMBOL = "Rp"
 
+# Digits after the decimal point kept for amounts. Amounts are stored as
+# integers in minor units (amount * 10**CURRENCY_DECIMALS); rupiah are whole
+# numbers, so IDR uses 0. Existing databases are converted with the value in
+# effect when they are migrated, so don't change it afterwards.
+CURRENCY_DECIMALS = 0
+
 # Default transaction type (when no sign is specified)
-DEFAULT_TRANSACTION_TYPE = "expense"
\ No newline at end of file
+DEFAULT_TRANSACTION_TYPE = "expense"
+
+# Prometheus metrics endpoint, served at http://METRICS_HOST:METRICS_PORT/metrics (port 0 disables it)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))
+
+# Telegram user ids allowed to use admin commands such as /stats (comma separated)
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
\ No newline at end of file
@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+# Keep test databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-test-'))
+
+import pytest
+from ..app.database import DatabaseManager
+from ..app.models import MAX_AMOUNT, amount_in_range
+from ..app.parser import parse_lines
+
+
+@pytest.fixture
+def db():
+    manager = DatabaseManager(-1, storage_mode='per_chat')
+    yield manager
+    manager.close()
+    os.remove(manager.db_path)
+
+
+def test_amount_range():
+    assert amount_in_range(MAX_AMOUNT)
+    assert amount_in_range(-MAX_AMOUNT)
+    assert not amount_in_range(MAX_AMOUNT + 1)
+    assert not amount_in_range(float('inf'))
+    assert not amount_in_range(float('nan'))
+
+
+def test_bulk_insert_rejects_only_the_oversized_row(db):
+    transactions, unparsed = parse_lines(['makan 50k', 'kopi 99999999999999999999', 'gaji +2jt'])
+    assert not unparsed
+
+    ids, failures = db.add_transactions_bulk(transactions)
+
+    assert ids[0] is not None and ids[2] is not None and ids[1] is None
+    assert [index for index, _ in failures] == [1]
+    assert failures[0][1].startswith("Jumlah terlalu besar")
+    assert db.get_balance() == 1_950_000
+    assert db.verify_balance()['ok']
+
+
+def test_single_insert_and_edit_reject_oversized_amounts(db):
+    with pytest.raises(ValueError, match="Jumlah terlalu besar"):
+        db.add_transaction(MAX_AMOUNT + 1, 'expense', 'kopi')
+
+    transaction_id = db.add_transaction(MAX_AMOUNT, 'income', 'gaji')
+    with pytest.raises(ValueError, match="Jumlah terlalu besar"):
+        db.update_transaction(transaction_id, amount=10 ** 20)
+    assert db.get_balance() == MAX_AMOUNT
@@ -0,0 +1,48 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# Keep test databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-test-'))
+
+import pytest
+from sqlalchemy import create_engine
+from ..app.database import DatabaseManager
+
+
+@pytest.fixture
+def db():
+    manager = DatabaseManager(-2, storage_mode='per_chat')
+    yield manager
+    manager.close()
+    for path in (manager.db_path, manager.archive_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_repeated_archive_run_keeps_search_index_in_sync(db, monkeypatch):
+    db.add_transaction(5000, 'expense', 'kopi', 'kopi susu')
+    db.add_transaction(20000, 'expense', 'makan', 'nasi goreng')
+    before = datetime.utcnow() + timedelta(seconds=1)
+
+    # Interrupted run: the batch is committed to the archive but never deleted
+    def crash(*args):
+        raise RuntimeError("interrupted")
+    monkeypatch.setattr(db, '_delete_archived', crash)
+    with pytest.raises(RuntimeError):
+        db.archive_transactions(before)
+    monkeypatch.undo()
+
+    db.update_transaction(1, category='teh', description='teh manis')
+    assert db.archive_transactions(before) == 2
+
+    assert [row['id'] for row in db.search_transactions('kopi')] == []
+    assert [row['description'] for row in db.search_transactions('teh')] == ['teh manis']
+    engine = create_engine(f'sqlite:///{db.archive_path}')
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('integrity-check', 1)"
+            )
+    finally:
+        engine.dispose()
@@ -0,0 +1,45 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+
+# Keep test databases out of the real DB_DIR (must be set before importing the app)
+os.environ.setdefault('DB_DIR', tempfile.mkdtemp(prefix='fintrack-test-'))
+
+import pytest
+from ..app.database import DatabaseManager
+from ..app.exporter import write_export
+
+
+@pytest.fixture
+def db():
+    manager = DatabaseManager(-3, storage_mode='per_chat')
+    manager.add_transaction(150001, 'expense', 'makan', 'nasi goreng')
+    manager.add_transaction(2_000_000, 'income')
+    yield manager
+    manager.close()
+    os.remove(manager.db_path)
+
+
+def test_jsonl_amounts_are_numbers_and_missing_values_null(db, tmp_path):
+    path = tmp_path / 'export.jsonl.gz'
+    assert write_export(db, path, 'jsonl') == 2
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+
+    assert rows[0]['amount'] == 150001 and rows[0]['category'] == 'makan'
+    assert rows[1]['amount'] == 2_000_000
+    assert rows[1]['category'] is None and rows[1]['description'] is None
+
+
+def test_csv_amounts_are_numbers_and_missing_values_empty(db, tmp_path):
+    path = tmp_path / 'export.csv.gz'
+    assert write_export(db, path, 'csv') == 2
+
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+
+    assert [row['amount'] for row in rows] == ['150001', '2000000']
+    assert rows[1]['category'] == '' and rows[1]['description'] == ''
@@ -0,0 +1,26 @@
+from ..app.importer import iter_import_chunks
+
+
+def _import(tmp_path, content):
+    path = tmp_path / 'mutasi.csv'
+    path.write_text(content, encoding='utf-8')
+    transactions, errors = [], []
+    for chunk, chunk_errors in iter_import_chunks(str(path)):
+        transactions += chunk
+        errors += chunk_errors
+    return transactions, errors
+
+
+def test_amounts_with_more_decimals_than_the_currency_are_rejected(tmp_path):
+    transactions, errors = _import(tmp_path, (
+        "tanggal;keterangan;debit;kredit\n"
+        "01/09/2026;gaji;;2.000.000,00\n"
+        "02/09/2026;belanja;150.000,50;\n"
+        "03/09/2026;listrik;350.000;\n"
+    ))
+
+    assert [(t['description'], t['amount'], t['type']) for t in transactions] == [
+        ('gaji', 2_000_000, 'income'), ('listrik', 350_000, 'expense'),
+    ]
+    assert [line for line, _ in errors] == [3]
+    assert "150.000,50" in errors[0][1]
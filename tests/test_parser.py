@@ -0,0 +1,69 @@
+import random
+
+import pytest
+from ..app.parser import parse_amount, parse_line
+from ..benchmarks.parser import legacy_parse_amount, legacy_parse_line
+
+# Random lines compared against the old regexes; fixed seed so failures reproduce
+CASES = 20000
+SEED = 1
+
+EXAMPLES = [
+    "makan siang 50k", "gaji bulanan +2jt", "transport 15rb", "belanja 1.500.000", "kopi 1,5k",
+    "bensin 100 k", "bonus +1,5 JT", "a 5", "a  5", "a   5", "a b 5 6", "a 5 k", "5 k", "k", "",
+    "makan +-5", "makan 1..5", "makan 1.", "makan .5", "makan 5km", "Makan Siang 5M", "x\t\t7rb",
+    "x y\nz 5", "x\n5", "x 5\n", "x 5\n\n", " x 5", "x 1,2,3", "x 1,2.3", "x ٣٤ rb", "x 5K",
+    "x " + "9" * 400, "x -0", "x y -12,5", "x y +7",
+]
+
+ALPHABET = [' ', ' ', ' ', '\t', '\n', ' ', '+', '-', '.', ',', '0', '1', '5', '9', '٣',
+            'k', 'K', 'r', 'R', 'b', 'j', 't', 'T', 'm', 'M', 'K', 'x', 'é']
+WORDS = ['makan', 'gaji', 'kopi', 'rb', 'jt', 'k', 'm', '+5', '-5', '1.000', '2,5', '10k', '3 jt']
+
+
+def _random_line(rng):
+    if rng.random() < 0.5:
+        return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 12)))
+    # Word-shaped lines hit the interesting paths far more often than random characters
+    words = [rng.choice(WORDS) for _ in range(rng.randint(1, 5))]
+    return ''.join(word + rng.choice([' ', ' ', '', '  ', '\t', '\n']) for word in words).rstrip(rng.choice(['', ' ']))
+
+
+def _amount_or_error(parse, text):
+    try:
+        return parse(text)
+    except (ValueError, OverflowError):
+        return ValueError
+
+
+@pytest.mark.parametrize('text, amount', [
+    # Suffixes, any case, with or without a space
+    ('50k', 50_000), ('50K', 50_000), ('15rb', 15_000), ('15 rb', 15_000),
+    ('2jt', 2_000_000), ('2 JT', 2_000_000), ('5m', 5_000_000), ('75000', 75_000),
+    # A lone comma is the decimal point, otherwise '.' and ',' are thousands separators
+    ('1,5jt', 1_500_000), ('1,5k', 1_500), ('2.5k', 25_000), ('1.5jt', 15_000_000),
+    ('1.500.000', 1_500_000), ('1.500,50', 150_050), ('1,2.3', 123),
+])
+def test_amount_suffixes_and_separators(text, amount):
+    assert parse_amount(text) == amount
+    assert legacy_parse_amount(text) == amount
+
+
+@pytest.mark.parametrize('text', ['', 'abc', 'k', '1,500,000'])
+def test_unparseable_amounts(text):
+    with pytest.raises(ValueError):
+        parse_amount(text)
+
+
+def test_lines_parse_like_the_legacy_regexes():
+    rng = random.Random(SEED)
+    lines = EXAMPLES + [_random_line(rng) for _ in range(CASES)]
+
+    mismatches = [line for line in lines if parse_line(line) != legacy_parse_line(line)]
+
+    assert not mismatches, [(line, parse_line(line), legacy_parse_line(line)) for line in mismatches[:10]]
+
+
+def test_amounts_parse_like_the_legacy_parser():
+    for text in EXAMPLES + ['75000', '75 k', '1,5jt', '', 'abc', '2 RB']:
+        assert _amount_or_error(parse_amount, text) == _amount_or_error(legacy_parse_amount, text), text